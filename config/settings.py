@@ -11,7 +11,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -97,6 +101,45 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Версия справочников (ETag) хранится в кэше — файловый кэш общий для всех
+# воркеров gunicorn на сервере, в отличие от кэша в памяти процесса.
+
+_cache_dir = os.getenv('CACHE_DIR', '.cache')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(BASE_DIR / _cache_dir) if not os.path.isabs(_cache_dir) else _cache_dir,
+    }
+}
+
+# Готовые картинки предпросмотра рамы (frames/preview.py)
+PREVIEW_CACHE_DIR = os.path.join(CACHES['default']['LOCATION'], 'previews')
+
+# manage.py test: кэш в памяти и предпросмотры во временном каталоге — тесты
+# не читают и не портят кэш dev-сервера (версии справочников, готовые ответы)
+TESTING = sys.argv[1:2] == ['test']
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    PREVIEW_CACHE_DIR = tempfile.mkdtemp(prefix='tea-a-tet-previews-')
+    atexit.register(shutil.rmtree, PREVIEW_CACHE_DIR, ignore_errors=True)
+# Предел размера этого каталога, МБ: сверх него удаляются давно не запрошенные картинки
+PREVIEW_CACHE_MAX_MB = int(os.getenv('PREVIEW_CACHE_MAX_MB', '200'))
+
+# Сколько дней хранятся отметки об удалении строк справочников (/api/catalog/changes/);
+# клиент, не синхронизировавшийся дольше, получает справочники целиком
+CATALOG_TOMBSTONE_DAYS = int(os.getenv('CATALOG_TOMBSTONE_DAYS', '30'))
+
+# Кэш расчётов цены в памяти каждого процесса (frames/quotes.py): число записей и срок жизни, сек
+QUOTE_CACHE_SIZE = int(os.getenv('QUOTE_CACHE_SIZE', '2000'))
+QUOTE_CACHE_TTL = int(os.getenv('QUOTE_CACHE_TTL', '600'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -15,7 +15,7 @@ class BaguetteAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Основная информация', {
-            'fields': ('name', 'width', 'price', 'stock_quantity', 'image')
+            'fields': ('name', 'barcode', 'width', 'price', 'stock_quantity', 'image')
         }),
         ('Системная информация', {
             'fields': ('created_at',),
@@ -1,308 +1,249 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from decimal import Decimal
-import json
-from django.db.models import Q
-from django.http import HttpResponse
+import datetime
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q, Sum
+from django.db.models.functions import TruncDate
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import condition
 
 from .models import (
     Baguette, Glass, Backing, Hardware, Podramnik, Package,
     Molding, Trosik, Podveski, Passepartout, Stretch, Foamboard, TechOperation
 )
+from . import catalog, preview, quotes, search
 from .services import (
-    PriceCalculator, StockDeduction, OrderExtrasCalculator,
-    _floor, MIN_GLASS_PRICE, MIN_BACKING_PRICE,
+    PriceCalculator, StockDeduction, QuoteContext, QuoteEngine, QuoteParts, BaguettePriceList,
+    _collect_backing_ids, _collect_passepartouts,
 )
-from orders.models import Order
+from orders.models import Order, OrderBacking, OrderFrame, OrderPassepartout
 
 
-def _collect_backing_ids(data, frames):
-    """Собирает id подкладок (несколько) из запроса и/или сохранённых frames_data."""
-    ids = []
+# Сколько багетов отдаёт поиск (?search=) по умолчанию и максимум (?limit=)
+SEARCH_LIMIT = 50
+SEARCH_LIMIT_MAX = 500
 
-    def _add(seq):
-        if isinstance(seq, list):
-            for b in seq:
-                bid = b.get('backing_id') if isinstance(b, dict) else b
-                if bid:
-                    ids.append(bid)
 
-    _add(data.get('backings'))
-    if frames and isinstance(frames[0], dict):
-        _add(frames[0].get('backings'))
-    if not ids and data.get('backing_id'):
-        ids.append(data.get('backing_id'))
-
-    seen, out = set(), []
-    for i in ids:
-        if i not in seen:
-            seen.add(i)
-            out.append(i)
-    return out
-
-
-def _collect_passepartouts(passepartouts_data, frames):
-    """Собирает список паспарту из нового формата и legacy-данных рам."""
-    items = []
-
-    if isinstance(passepartouts_data, list):
-        for pp in passepartouts_data:
-            if isinstance(pp, dict) and pp.get('passepartout_id'):
-                items.append(pp)
-
-    if frames:
-        # Новый формат может храниться внутри первой рамы в frames_data
-        embedded = frames[0].get('passepartouts') if isinstance(frames[0], dict) else None
-        if isinstance(embedded, list):
-            for pp in embedded:
-                if isinstance(pp, dict) and pp.get('passepartout_id'):
-                    items.append(pp)
-
-        # Legacy: паспарту было привязано к каждой раме
-        for frame in frames:
-            if isinstance(frame, dict) and frame.get('passepartout_id'):
-                items.append({
-                    'passepartout_id': frame.get('passepartout_id'),
-                    'passepartout_length': frame.get('passepartout_length'),
-                    'passepartout_width': frame.get('passepartout_width'),
-                })
-
-    return items
-
-
-# Похожие латинские/кириллические буквы приводим к одному виду,
-# чтобы «M59» находил «М59» (кириллица) и наоборот.
-_LOOKALIKE = str.maketrans({
-    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
-    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у',
-})
-
-
-def _norm_search(s):
-    """Нормализация для поиска: без пробелов, в нижнем регистре, латиница→кириллица."""
-    return (s or '').replace(' ', '').lower().translate(_LOOKALIKE)
+def _int_param(request, name):
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _catalog_list(request, name):
+    """
+    Справочник name целиком (готовый ответ из кэша) или, если заданы параметры,
+    только нужные поля (?fields=id,name) и/или страница (?limit=, ?after=).
+    """
+    params = request.GET
+    if not any(p in params for p in ('fields', 'limit', 'after')):
+        return catalog.cached_response(request, name, lambda: catalog.serialize(name, request))
+    try:
+        fields = catalog.parse_fields(name, params.get('fields'))
+        if 'limit' in params or 'after' in params:
+            data = catalog.page(name, request, fields, _int_param(request, 'limit'), params.get('after'))
+        else:
+            data = catalog.serialize(name, request, fields=fields)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    return catalog.json_response(request, catalog.encode(data))
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_baguettes(request):
-    """API для получения списка багетов с поддержкой поиска"""
+    """
+    API для получения списка багетов: поиск (?search=, ?limit=),
+    страницы (?limit=, ?after=) и выбор полей (?fields=)
+    """
     query = request.GET.get('search', '').strip()
-
-    baguettes = list(Baguette.objects.all())
+    if not query:
+        return _catalog_list(request, 'baguettes')
 
     # Поиск по названию или штрихкоду — без учёта пробелов, регистра и латиница/кириллица
-    if query:
-        q = _norm_search(query)
-        baguettes = [
-            b for b in baguettes
-            if q in _norm_search(b.name) or q in _norm_search(b.barcode or '')
-        ]
+    try:
+        fields = catalog.parse_fields('baguettes', request.GET.get('fields'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+    limit = min(max(_int_param(request, 'limit') or SEARCH_LIMIT, 1), SEARCH_LIMIT_MAX)
+    baguettes = Baguette.search(query, limit=limit)
+    return catalog.json_response(
+        request, catalog.encode(catalog.serialize('baguettes', request, baguettes, fields))
+    )
 
-    data = []
-    for baguette in baguettes:
-        image_url = None
-        if baguette.image:
-            image_url = request.build_absolute_uri(baguette.image.url)
-        data.append({
-            'id': baguette.pk,
-            'name': baguette.name,
-            'barcode': baguette.barcode or '',
-            'width': float(baguette.width),
-            'price': float(baguette.price),
-            'stock_quantity': float(baguette.stock_quantity),
-            'image': image_url,
-        })
-    return Response(data)
+
+@api_view(['GET'])
+def get_baguette_by_barcode(request, code):
+    """API для сканера штрихкодов: один багет (с остатком) по точному штрихкоду"""
+    baguette = Baguette.by_barcode(code)
+    if baguette is None:
+        return Response({'error': 'Багет с таким штрихкодом не найден'}, status=404)
+    return Response(catalog.serialize_one('baguettes', baguette, request))
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_glasses(request):
     """API для получения списка стекол"""
-    glasses = Glass.objects.all()
-    data = []
-    for glass in glasses:
-        data.append({
-            'id': glass.pk,
-            'name': glass.name,
-            'price_per_sqm': float(glass.price_per_sqm),
-        })
-    return Response(data)
+    return _catalog_list(request, 'glasses')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_backings(request):
     """API для получения списка подкладок"""
-    backings = Backing.objects.all()
-    data = []
-    for backing in backings:
-        data.append({
-            'id': backing.pk,
-            'name': backing.name,
-            'price': float(backing.price),
-        })
-    return Response(data)
+    return _catalog_list(request, 'backings')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_hardware(request):
     """API для получения списка фурнитуры"""
-    hardware_list = Hardware.objects.all()
-    data = []
-    for hardware in hardware_list:
-        data.append({
-            'id': hardware.pk,
-            'name': hardware.name,
-            'price_per_unit': float(hardware.price_per_unit),
-        })
-    return Response(data)
+    return _catalog_list(request, 'hardware')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_podramniki(request):
     """API для получения списка подрамников"""
-    podramniki = Podramnik.objects.all()
-    data = []
-    for podramnik in podramniki:
-        data.append({
-            'id': podramnik.pk,
-            'name': podramnik.name,
-            'price': float(podramnik.price),
-        })
-    return Response(data)
+    return _catalog_list(request, 'podramniki')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_packages(request):
     """API для получения списка упаковок"""
-    packages = Package.objects.all()
-    data = []
-    for package in packages:
-        data.append({
-            'id': package.pk,
-            'name': package.name,
-            'price': float(package.price),
-        })
-    return Response(data)
+    return _catalog_list(request, 'packages')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_moldings(request):
     """API для получения списка молдингов"""
-    moldings = Molding.objects.all()
-    data = []
-    for molding in moldings:
-        data.append({
-            'id': molding.pk,
-            'name': molding.name,
-            'price_per_meter': float(molding.price_per_meter),
-        })
-    return Response(data)
+    return _catalog_list(request, 'moldings')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_trosiki(request):
     """API для получения списка тросиков"""
-    trosiki = Trosik.objects.all()
-    data = []
-    for trosik in trosiki:
-        data.append({
-            'id': trosik.pk,
-            'name': trosik.name,
-            'price_per_meter': float(trosik.price_per_meter),
-        })
-    return Response(data)
+    return _catalog_list(request, 'trosiki')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_podveski(request):
     """API для получения списка подвесок"""
-    podveski = Podveski.objects.all()
-    data = []
-    for podveska in podveski:
-        data.append({
-            'id': podveska.pk,
-            'name': podveska.name,
-            'price_per_unit': float(podveska.price_per_unit),
-        })
-    return Response(data)
+    return _catalog_list(request, 'podveski')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_passepartout(request):
     """API для получения списка паспарту"""
-    passepartout_list = Passepartout.objects.all()
-    data = []
-    for passepartout in passepartout_list:
-        image_url = None
-        if passepartout.image:
-            image_url = request.build_absolute_uri(passepartout.image.url)
-        data.append({
-            'id': passepartout.pk,
-            'name': passepartout.name,
-            'price': float(passepartout.price),
-            'image': image_url,
-        })
-    return Response(data)
+    return _catalog_list(request, 'passepartout')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_stretches(request):
     """API для получения списка натяжек"""
-    stretches = Stretch.objects.all()
-    data = []
-    for stretch in stretches:
-        data.append({
-            'id': stretch.pk,
-            'name': stretch.name,
-            'price_per_meter': float(stretch.price_per_meter),
-        })
-    return Response(data)
+    return _catalog_list(request, 'stretches')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_foamboards(request):
     """API для получения списка пенокартона (накатка)"""
-    data = []
-    for fb in Foamboard.objects.all():
-        data.append({
-            'id': fb.pk,
-            'name': fb.name,
-            'price': float(fb.price),
-        })
-    return Response(data)
+    return _catalog_list(request, 'foamboards')
 
 
+@condition(etag_func=catalog.version_etag)
 @api_view(['GET'])
 def get_works(request):
     """API для получения справочника технологических операций (работ)"""
-    data = []
-    for op in TechOperation.objects.all():
-        data.append({
-            'id': op.pk,
-            'code': op.code,
-            'operation_type': op.operation_type,
-            'name': op.name,
-            'size_from': float(op.size_from) if op.size_from is not None else None,
-            'size_to': float(op.size_to) if op.size_to is not None else None,
-            'rate': float(op.rate) if op.rate is not None else None,
-        })
-    return Response(data)
+    return _catalog_list(request, 'works')
 
 
-@api_view(['POST'])
-def calculate_price_api(request):
-    """API для расчета цены заказа"""
+@condition(etag_func=catalog.version_etag)
+@api_view(['GET'])
+def get_catalog(request):
+    """
+    API для получения всех справочников одним запросом.
+    ?include=baguettes,glasses — только перечисленные (по умолчанию — все).
+    """
+    names, unknown = catalog.parse_include(request.GET.get('include'))
+    if unknown:
+        return Response({'error': f"Неизвестные справочники: {', '.join(unknown)}"}, status=400)
+    return catalog.cached_response(
+        request, 'bulk:' + ','.join(names),
+        lambda: {name: catalog.serialize(name, request) for name in names},
+    )
+
+
+@condition(etag_func=catalog.version_etag)
+@api_view(['GET'])
+def get_catalog_changes(request):
+    """
+    API синхронизации справочников: только строки, изменённые и удалённые после
+    версии ?since= (version из предыдущего ответа; 0 — всё). ?include= — как у /api/catalog/.
+    """
+    names, unknown = catalog.parse_include(request.GET.get('include'))
+    if unknown:
+        return Response({'error': f"Неизвестные справочники: {', '.join(unknown)}"}, status=400)
+    since = _int_param(request, 'since')
+    if since is None or since < 0:
+        return Response({'error': 'Укажите версию since (целое число)'}, status=400)
+    return catalog.json_response(request, catalog.encode(catalog.changes(request, since, names)))
+
+
+@condition(etag_func=catalog.version_etag)
+@api_view(['GET'])
+def search_catalog(request):
+    """
+    Поиск по всем справочникам (FTS5, по релевантности).
+    ?q=м59&types=baguettes,passepartout,moldings&limit=50
+    """
+    query = request.GET.get('q', '').strip()
+    kinds, unknown = catalog.parse_include(request.GET.get('types'))
+    if unknown:
+        return Response({'error': f"Неизвестные справочники: {', '.join(unknown)}"}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_LIMIT)), 1), SEARCH_LIMIT_MAX)
+    except ValueError:
+        limit = SEARCH_LIMIT
+
+    hits = search.search(query, kinds=kinds, limit=limit)
+    ids_by_kind = {}
+    for kind, pk in hits:
+        ids_by_kind.setdefault(kind, []).append(pk)
+    objects = {
+        kind: catalog.CATALOGS[kind][0].objects.in_bulk(ids)
+        for kind, ids in ids_by_kind.items()
+    }
+    data = []
+    for kind, pk in hits:
+        obj = objects[kind].get(pk)
+        if obj is not None:
+            data.append({'type': kind, **catalog.serialize_one(kind, obj, request)})
+    return catalog.json_response(request, catalog.encode(data))
+
+
+def _calculate_price(data, ctx=None, parts=None):
+    """
+    Расчёт цены по данным запроса calculate_price_api.
+    Возвращает (тело ответа, HTTP-статус). ctx — общий QuoteContext (пакетный расчёт),
+    parts — части предыдущего расчёта (пересчёт по изменённым полям).
+    """
     try:
-        data = request.data
-        
-        # Получаем данные для расчета
         x1 = Decimal(str(data.get('x1', 0))) if data.get('x1') else Decimal('0')
         x2 = Decimal(str(data.get('x2', 0))) if data.get('x2') else Decimal('0')
-        
-        # Проверяем, есть ли массив рамок
         frames = data.get('frames', [])
-        passepartouts = _collect_passepartouts(data.get('passepartouts', []), frames)
-        backing_ids = _collect_backing_ids(data, frames)
 
         if frames and len(frames) > 0:
             # Для нескольких рам — x1, x2 могут быть в каждой раме
@@ -313,207 +254,152 @@ def calculate_price_api(request):
                 for frame in frames if frame.get('baguette_id')
             )
             if not has_valid_sizes and not frames_have_sizes:
-                return Response({'error': 'Необходимо указать размеры x1 и x2 (глобально или для каждой рамы)'}, status=400)
+                return {'error': 'Необходимо указать размеры x1 и x2 (глобально или для каждой рамы)'}, 400
         elif not x1 or not x2 or x1 <= 0 or x2 <= 0:
-            return Response({'error': 'Необходимо указать размеры x1 и x2'}, status=400)
-        
-        # Если есть массив рамок, рассчитываем для каждой
-        if frames and len(frames) > 0:
-            result = {
-                'components': {},
-                'total_price': Decimal('0')
-            }
-            
-            # Рассчитываем цену для каждой рамы (багет, паспарту, работа привязаны к раме)
-            for idx, frame in enumerate(frames):
-                if frame.get('baguette_id'):
-                    # Используем размеры рамы, если заданы; иначе — глобальные x1, x2
-                    fx1 = Decimal(str(frame.get('x1', x1))) if frame.get('x1') else x1
-                    fx2 = Decimal(str(frame.get('x2', x2))) if frame.get('x2') else x2
-                    if not fx1 or not fx2 or fx1 <= 0 or fx2 <= 0:
-                        fx1, fx2 = x1, x2
-                    frame_calculation = PriceCalculator.calculate_total_price(
-                        x1=fx1,
-                        x2=fx2,
-                        baguette_id=frame.get('baguette_id'),
-                        work_id=frame.get('work_id'),
-                    )
-                    
-                    # Добавляем компоненты рамы с префиксом номера (багет, паспарту, работа)
-                    frame_num = idx + 1
-                    for key, value in frame_calculation.get('components', {}).items():
-                        if key in ['baguette', 'passepartout', 'work']:
-                            component_key = f'{key}_frame{frame_num}'
-                            result['components'][component_key] = {
-                                **value,
-                                'name': f"{value.get('name', key)} (Рама {frame_num})"
-                            }
-                            result['total_price'] += Decimal(str(value.get('total_price', 0)))
-
-            # Паспарту: независимая группировка (до 3 шт)
-            for pp_idx, pp_data in enumerate(passepartouts):
-                pp_id = pp_data.get('passepartout_id')
-                if not pp_id:
-                    continue
-                passepartout = Passepartout.objects.get(pk=pp_id)
-                pp_length = Decimal(str(pp_data.get('passepartout_length'))) if pp_data.get('passepartout_length') else x1
-                pp_width = Decimal(str(pp_data.get('passepartout_width'))) if pp_data.get('passepartout_width') else x2
-                pp_area = PriceCalculator.calculate_glass_area(pp_length, pp_width)
-                pp_price = pp_area * passepartout.price
-                result['components'][f'passepartout_{pp_idx + 1}'] = {
-                    'name': f'{passepartout.name} (Паспарту {pp_idx + 1})',
-                    'length': float(pp_length),
-                    'width': float(pp_width),
-                    'area': float(pp_area),
-                    'unit_price': float(passepartout.price),
-                    'total_price': float(pp_price),
-                }
-                result['total_price'] += pp_price
-            
-            # Для стекла/натяжки: при разных размерах рам суммируем площади
-            # Определяем размеры для расчёта общих компонентов
-            frame_sizes = []
-            for frame in frames:
-                if frame.get('baguette_id'):
-                    fx1 = Decimal(str(frame.get('x1', x1))) if frame.get('x1') else x1
-                    fx2 = Decimal(str(frame.get('x2', x2))) if frame.get('x2') else x2
-                    if fx1 and fx2 and fx1 > 0 and fx2 > 0:
-                        frame_sizes.append((fx1, fx2))
-            if not frame_sizes:
-                frame_sizes = [(x1, x2)] if x1 and x2 else []
-
-            # Используем первую пару размеров только для компонентов, которые не зависят от суммирования рам
-            eff_x1, eff_x2 = frame_sizes[0] if frame_sizes else (x1, x2)
-            other_calculation = PriceCalculator.calculate_total_price(
-                x1=eff_x1,
-                x2=eff_x2,
-                glass_id=None,
-                backing_id=None,
-                hardware_id=data.get('hardware_id'),
-                hardware_quantity=data.get('hardware_quantity', 1),
-                podramnik_id=data.get('podramnik_id'),
-                package_id=data.get('package_id'),
-                package_quantity=data.get('package_quantity', 1),
-                molding_id=data.get('molding_id'),
-                molding_consumption=Decimal(str(data.get('molding_consumption'))) if data.get('molding_consumption') else None,
-                trosik_id=data.get('trosik_id'),
-                trosik_length=Decimal(str(data.get('trosik_length'))) if data.get('trosik_length') else None,
-                podveski_id=data.get('podveski_id'),
-                podveski_quantity=data.get('podveski_quantity'),
-                stretch_id=None,
-            )
+            return {'error': 'Необходимо указать размеры x1 и x2'}, 400
 
-            # Стекло — по суммарной площади, если рам несколько с разными размерами.
-            # Натяжка здесь НЕ считается: это работа мастера по периметру,
-            # учитывается в OrderExtrasCalculator (ниже, через apply()).
-            from frames.models import Glass
-            total_glass_area = sum(
-                PriceCalculator.calculate_glass_area(fx1, fx2) for fx1, fx2 in frame_sizes
-            )
-            if data.get('glass_id') and total_glass_area > 0:
-                glass = Glass.objects.get(pk=data['glass_id'])
-                glass_calc = {
-                    'area': float(total_glass_area),
-                    'unit_price': float(glass.price_per_sqm),
-                    'total_price': float(_floor(total_glass_area * glass.price_per_sqm, MIN_GLASS_PRICE))
-                }
-                result['components']['glass'] = {
-                    'name': glass.name,
-                    **glass_calc
-                }
-                result['total_price'] += Decimal(str(glass_calc['total_price']))
-
-            # Подкладка/подрамник — «на картину», один раз по раме меньшего размера
-            pic_x1, pic_x2 = min(frame_sizes, key=lambda s: s[0] * s[1]) if frame_sizes else (x1, x2)
-            pic_area = PriceCalculator.calculate_glass_area(pic_x1, pic_x2)
-
-            # Подкладки (несколько) — по площади рамы меньшего размера
-            if backing_ids and pic_area > 0:
-                b_comps, b_total = PriceCalculator.price_backings(backing_ids, pic_area)
-                result['components'].update(b_comps)
-                result['total_price'] += b_total
-
-            # Подрамник — один раз по раме меньшего размера
-            if data.get('podramnik_id'):
-                podramnik = Podramnik.objects.get(pk=data['podramnik_id'])
-                podramnik_qty = PriceCalculator.calculate_baguette_quantity(pic_x1, pic_x2, Decimal('0'))
-                podramnik_price = podramnik_qty * podramnik.price
-                result['components']['podramnik'] = {
-                    'name': podramnik.name,
-                    'quantity': float(podramnik_qty),
-                    'unit_price': float(podramnik.price),
-                    'total_price': float(podramnik_price),
-                }
-                result['total_price'] += Decimal(str(podramnik_price))
-
-            # Добавляем остальные компоненты (без glass и stretch — они уже добавлены)
-            for key, value in other_calculation.get('components', {}).items():
-                if key not in ('glass', 'stretch', 'backing', 'podramnik'):
-                    result['components'][key] = value
-                    result['total_price'] += Decimal(str(value.get('total_price', 0)))
-            
-            result['total_price'] = float(result['total_price'])
-            extras = OrderExtrasCalculator.compute(
-                frames=frames, passepartouts=passepartouts, x1=eff_x1, x2=eff_x2, data=data
-            )
-            OrderExtrasCalculator.apply(result, extras, quantity=data.get('quantity', 1))
-            return Response(result)
-        else:
-            # Обратная совместимость: расчет для одной рамы
-            calculation = PriceCalculator.calculate_total_price(
-                x1=x1,
-                x2=x2,
-                baguette_id=data.get('baguette_id'),
-                glass_id=data.get('glass_id'),
-                backing_id=data.get('backing_id'),
-                backing_ids=backing_ids,
-                hardware_id=data.get('hardware_id'),
-                hardware_quantity=data.get('hardware_quantity', 1),
-                podramnik_id=data.get('podramnik_id'),
-                package_id=data.get('package_id'),
-                package_quantity=data.get('package_quantity', 1),
-                molding_id=data.get('molding_id'),
-                molding_consumption=Decimal(str(data.get('molding_consumption'))) if data.get('molding_consumption') else None,
-                trosik_id=data.get('trosik_id'),
-                trosik_length=Decimal(str(data.get('trosik_length'))) if data.get('trosik_length') else None,
-                podveski_id=data.get('podveski_id'),
-                podveski_quantity=data.get('podveski_quantity'),
-                passepartout_id=data.get('passepartout_id'),
-                passepartout_length=Decimal(str(data.get('passepartout_length'))) if data.get('passepartout_length') else None,
-                passepartout_width=Decimal(str(data.get('passepartout_width'))) if data.get('passepartout_width') else None,
-                stretch_id=data.get('stretch_id'),
-                work_id=data.get('work_id'),
-            )
-            if passepartouts:
-                for pp_idx, pp_data in enumerate(passepartouts):
-                    pp_id = pp_data.get('passepartout_id')
-                    if not pp_id:
-                        continue
-                    passepartout = Passepartout.objects.get(pk=pp_id)
-                    pp_length = Decimal(str(pp_data.get('passepartout_length'))) if pp_data.get('passepartout_length') else x1
-                    pp_width = Decimal(str(pp_data.get('passepartout_width'))) if pp_data.get('passepartout_width') else x2
-                    pp_area = PriceCalculator.calculate_glass_area(pp_length, pp_width)
-                    pp_price = pp_area * passepartout.price
-                    calculation['components'][f'passepartout_{pp_idx + 1}'] = {
-                        'name': f'{passepartout.name} (Паспарту {pp_idx + 1})',
-                        'length': float(pp_length),
-                        'width': float(pp_width),
-                        'area': float(pp_area),
-                        'unit_price': float(passepartout.price),
-                        'total_price': float(pp_price),
-                    }
-                    calculation['total_price'] += float(pp_price)
-
-            single_frames = [{'baguette_id': data.get('baguette_id'), 'x1': x1, 'x2': x2}] if data.get('baguette_id') else []
-            extras = OrderExtrasCalculator.compute(
-                frames=single_frames, passepartouts=passepartouts, x1=x1, x2=x2, data=data
-            )
-            OrderExtrasCalculator.apply(calculation, extras, quantity=data.get('quantity', 1))
-            return Response(calculation)
+        return QuoteEngine.quote(data, ctx, parts).calculation(), 200
 
     except Exception as e:
+        return {'error': str(e)}, 400
+
+
+def _quote_ok(result):
+    # В кэш — только успешные расчёты: ошибка может быть временной (база занята и т.п.)
+    return result[1] == 200
+
+
+@api_view(['POST'])
+def calculate_price_api(request):
+    """
+    API для расчета цены заказа (повторный расчёт тех же данных — из quotes.cache).
+    В ответе — quote_token; {"base_token": ..., "changes": {...}} считает данные этого
+    расчёта с изменёнными полями, заново — только затронутые части (QuoteParts).
+    """
+    data = request.data
+    draft = None
+    if isinstance(data, dict) and 'base_token' in data:
+        draft = quotes.drafts.get(data.get('base_token'))
+        if draft is None:
+            return Response({'error': 'Предыдущий расчёт не найден, отправьте данные полностью'}, status=409)
+        changes = data.get('changes') or {}
+        if not isinstance(changes, dict):
+            return Response({'error': 'changes — объект с изменёнными полями'}, status=400)
+        data = quotes.merge(draft.data, changes)
+
+    version = catalog.get_price_version()
+    if draft is not None and draft.version == version:
+        parts = QuoteParts(draft.parts)
+    else:
+        parts = QuoteParts()
+    (body, status), hit = quotes.cached(
+        data, lambda: _calculate_price(data, parts=parts), version, keep=_quote_ok
+    )
+
+    token = None
+    if status == 200 and isinstance(data, dict):
+        token = quotes.make_key(data, version)
+        if not hit:
+            quotes.drafts.set(token, quotes.Draft(data, version, parts.current))
+        elif token not in quotes.drafts:
+            quotes.drafts.set(token, quotes.Draft(data, version))
+        body = {**body, 'quote_token': token}
+    response = Response(body, status=status)
+    response['X-Quote-Cache'] = 'HIT' if hit else 'MISS'
+    if not hit and draft is not None:
+        response['X-Quote-Reused'] = str(parts.reused)
+    return response
+
+
+@api_view(['GET'])
+def calculate_price_cache_stats(request):
+    """Счётчики кэша расчётов этого процесса: попадания, промахи, размер (и черновиков по quote_token)."""
+    return Response({**quotes.cache.stats(), 'drafts': quotes.drafts.stats()})
+
+
+CALCULATE_BATCH_LIMIT = 100
+
+
+@api_view(['POST'])
+def calculate_price_batch_api(request):
+    """
+    Пакетный расчёт: список данных в формате calculate_price_api (или {"items": [...]}).
+    Все варианты считаются по одному снимку справочников (один QuoteContext).
+    Ответ: {"results": [...]} в том же порядке; ошибка варианта — {"error": ...} на его месте.
+    """
+    items = request.data.get('items') if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list):
+        return Response({'error': 'Ожидается список вариантов расчёта'}, status=400)
+    if len(items) > CALCULATE_BATCH_LIMIT:
+        return Response({'error': f'Не больше {CALCULATE_BATCH_LIMIT} вариантов за запрос'}, status=400)
+
+    # Сначала кэш расчётов; снимок справочников нужен только для непосчитанных вариантов
+    version = catalog.get_price_version()
+    keys = [quotes.make_key(data, version) if isinstance(data, dict) else None for data in items]
+    cached = [quotes.cache.get(key) if key else None for key in keys]
+
+    misses = any(isinstance(data, dict) and hit is None for data, hit in zip(items, cached))
+    ctx = QuoteContext() if misses else None
+
+    results = []
+    for data, key, hit in zip(items, keys, cached):
+        if not isinstance(data, dict):
+            results.append({'error': 'Ожидается объект с данными расчёта'})
+            continue
+        if hit is None:
+            hit = _calculate_price(data, ctx)
+            if _quote_ok(hit):
+                quotes.cache.set(key, hit)
+        results.append(hit[0])
+    return Response({'results': results})
+
+
+@api_view(['GET'])
+def get_baguette_prices(request):
+    """
+    Цена размера x1×x2 во всех багетах — для сортировки подбора по итоговой цене.
+    ?x1=50&x2=70[&glass_id=&backing_ids=1,2&passepartout_id=][&min_price=&max_price=][&order=desc][&limit=]
+    ?details=1 — у каждой строки ещё baguette: строка справочника (фото, штрихкод) для выбора в мастере.
+    """
+    params = request.GET
+    try:
+        x1, x2 = Decimal(params['x1']), Decimal(params['x2'])
+        if not (x1.is_finite() and x2.is_finite() and x1 > 0 and x2 > 0):
+            raise ValueError('размеры должны быть больше нуля')
+        min_price = Decimal(params['min_price']) if params.get('min_price') else None
+        max_price = Decimal(params['max_price']) if params.get('max_price') else None
+        data = BaguettePriceList.compute(
+            x1, x2,
+            glass_id=params.get('glass_id') or None,
+            backing_ids=_id_list(params.get('backing_ids')),
+            passepartout_id=params.get('passepartout_id') or None,
+            min_price=min_price,
+            max_price=max_price,
+            descending=params.get('order') == 'desc',
+        )
+    except KeyError:
+        return Response({'error': 'Необходимо указать размеры x1 и x2'}, status=400)
+    except (ValueError, ArithmeticError) as e:
+        return Response({'error': f'Некорректные параметры: {e}'}, status=400)
+    except ObjectDoesNotExist as e:
         return Response({'error': str(e)}, status=400)
 
+    data['count'] = len(data['results'])
+    limit = _int_param(request, 'limit')
+    if limit is not None and limit > 0:
+        data['results'] = data['results'][:limit]
+    if params.get('details'):
+        queryset = Baguette.objects.filter(pk__in=[row['id'] for row in data['results']])
+        rows = {row['id']: row for row in catalog.serialize('baguettes', request, queryset)}
+        for row in data['results']:
+            row['baguette'] = rows.get(row['id'])
+    return Response(data)
+
+
+def _size_or_none(value):
+    """Размер рамы/паспарту из запроса: пустое и нулевое — None (берутся размеры заказа)."""
+    return Decimal(str(value)) if value else None
+
 
 @api_view(['POST'])
 def create_order_api(request):
@@ -525,6 +411,7 @@ def create_order_api(request):
         frames = data.get('frames', [])
         passepartouts = _collect_passepartouts(data.get('passepartouts', []), frames)
         backing_ids = _collect_backing_ids(data, frames)
+        ctx = QuoteContext()
 
         # Определяем данные для заказа
         # Если есть массив рамок, берем первую раму для сохранения в Order (модель поддерживает только одну раму)
@@ -565,7 +452,7 @@ def create_order_api(request):
             'x2': Decimal(str(ord_x2 or 0)),
             'baguette_id': baguette_id,
             'glass_id': data.get('glass_id'),
-            # В Order сохраняется первая подкладка (FK), полный список — в frames_data
+            # В Order сохраняется первая подкладка (FK), полный список — в OrderBacking
             'backing_id': backing_ids[0] if backing_ids else None,
         }
         
@@ -614,131 +501,18 @@ def create_order_api(request):
             order_data['podveski_id'] = data.get('podveski_id')
             order_data['podveski_quantity'] = data.get('podveski_quantity')
         
-        # Рассчитываем цену с учетом всех рамок
-        if frames and len(frames) > 0:
-            # Используем ту же логику, что и в calculate_price_api
-            result = {
-                'components': {},
-                'total_price': Decimal('0')
-            }
-            
-            x1 = order_data['x1']
-            x2 = order_data['x2']
-            frame_sizes = []
-            for idx, frame in enumerate(frames):
-                if frame.get('baguette_id'):
-                    fx1 = Decimal(str(frame.get('x1', x1))) if frame.get('x1') else x1
-                    fx2 = Decimal(str(frame.get('x2', x2))) if frame.get('x2') else x2
-                    if not fx1 or not fx2 or fx1 <= 0 or fx2 <= 0:
-                        fx1, fx2 = x1, x2
-                    frame_sizes.append((fx1, fx2))
-                    frame_calculation = PriceCalculator.calculate_total_price(
-                        x1=fx1,
-                        x2=fx2,
-                        baguette_id=frame.get('baguette_id'),
-                        work_id=frame.get('work_id'),
-                    )
-                    frame_num = idx + 1
-                    for key, value in frame_calculation.get('components', {}).items():
-                        if key in ['baguette', 'passepartout', 'work']:
-                            result['total_price'] += Decimal(str(value.get('total_price', 0)))
-                            result['components'][f'{key}_frame{frame_num}'] = {
-                                **value,
-                                'name': f"{value.get('name', key)} (Рама {frame_num})"
-                            }
-            for pp_data in passepartouts:
-                pp_id = pp_data.get('passepartout_id')
-                if not pp_id:
-                    continue
-                passepartout = Passepartout.objects.get(pk=pp_id)
-                pp_length = Decimal(str(pp_data.get('passepartout_length'))) if pp_data.get('passepartout_length') else x1
-                pp_width = Decimal(str(pp_data.get('passepartout_width'))) if pp_data.get('passepartout_width') else x2
-                pp_area = PriceCalculator.calculate_glass_area(pp_length, pp_width)
-                result['total_price'] += pp_area * passepartout.price
-            if not frame_sizes:
-                frame_sizes = [(x1, x2)]
-            eff_x1, eff_x2 = frame_sizes[0]
-            total_glass_area = sum(PriceCalculator.calculate_glass_area(fx1, fx2) for fx1, fx2 in frame_sizes)
-            # Подкладка/подрамник — «на картину», считаются один раз по раме меньшего размера
-            pic_x1, pic_x2 = min(frame_sizes, key=lambda s: s[0] * s[1])
-            pic_area = PriceCalculator.calculate_glass_area(pic_x1, pic_x2)
-            other_calculation = PriceCalculator.calculate_total_price(
-                x1=eff_x1,
-                x2=eff_x2,
-                glass_id=None,
-                backing_id=None,
-                hardware_id=order_data.get('hardware_id'),
-                hardware_quantity=order_data.get('hardware_quantity', 1),
-                podramnik_id=order_data.get('podramnik_id'),
-                package_id=order_data.get('package_id'),
-                package_quantity=order_data.get('package_quantity', 1),
-                molding_id=order_data.get('molding_id'),
-                molding_consumption=order_data.get('molding_consumption'),
-                trosik_id=order_data.get('trosik_id'),
-                trosik_length=order_data.get('trosik_length'),
-                podveski_id=order_data.get('podveski_id'),
-                podveski_quantity=order_data.get('podveski_quantity'),
-            )
-            for key, value in other_calculation.get('components', {}).items():
-                if key not in ('glass', 'stretch', 'backing', 'podramnik'):
-                    result['total_price'] += Decimal(str(value.get('total_price', 0)))
-
-            if backing_ids and pic_area > 0:
-                _b_comps, _b_total = PriceCalculator.price_backings(backing_ids, pic_area)
-                result['total_price'] += _b_total
-
-            if order_data.get('podramnik_id'):
-                podramnik = Podramnik.objects.get(pk=order_data['podramnik_id'])
-                podramnik_qty = PriceCalculator.calculate_baguette_quantity(pic_x1, pic_x2, Decimal('0'))
-                result['total_price'] += podramnik_qty * podramnik.price
-            if order_data.get('glass_id') and total_glass_area > 0:
-                from frames.models import Glass
-                glass = Glass.objects.get(pk=order_data['glass_id'])
-                gp = _floor(total_glass_area * glass.price_per_sqm, MIN_GLASS_PRICE)
-                result['total_price'] += gp
-            # Натяжка — работа мастера по периметру, учитывается в OrderExtrasCalculator ниже.
-
-            calculation = result
-        else:
-            # Обратная совместимость: расчет для одной рамы
-            calculation = PriceCalculator.calculate_total_price(
-                x1=order_data['x1'],
-                x2=order_data['x2'],
-                baguette_id=order_data.get('baguette_id'),
-                glass_id=order_data.get('glass_id'),
-                backing_id=order_data.get('backing_id'),
-                backing_ids=backing_ids,
-                hardware_id=order_data.get('hardware_id'),
-                hardware_quantity=order_data.get('hardware_quantity', 1),
-                podramnik_id=order_data.get('podramnik_id'),
-                package_id=order_data.get('package_id'),
-                package_quantity=order_data.get('package_quantity', 1),
-                molding_id=order_data.get('molding_id'),
-                molding_consumption=order_data.get('molding_consumption'),
-                trosik_id=order_data.get('trosik_id'),
-                trosik_length=order_data.get('trosik_length'),
-                podveski_id=order_data.get('podveski_id'),
-                podveski_quantity=order_data.get('podveski_quantity'),
-                passepartout_id=order_data.get('passepartout_id'),
-                passepartout_length=order_data.get('passepartout_length'),
-                passepartout_width=order_data.get('passepartout_width'),
-                work_id=order_data.get('work_id'),
-            )
-        
         # Ручная сложность (доп. сумма) — сохраняем на заказе
         if data.get('manual_complexity'):
             order_data['manual_complexity'] = Decimal(str(data.get('manual_complexity')))
 
-        # Работы (в цену) + ручная сложность
-        extras = OrderExtrasCalculator.compute(
-            frames=frames, passepartouts=passepartouts,
-            x1=order_data['x1'], x2=order_data['x2'], data=data
-        )
-        order_quantity = int(data.get('quantity') or 1) or 1
+        # Цена — тем же расчётом, что и calculate_price_api (материалы, работы, копии)
+        quote = QuoteEngine.quote(data, ctx)
+        order_quantity = quote.quantity
         order_data['quantity'] = order_quantity
-        OrderExtrasCalculator.apply(calculation, extras, quantity=order_quantity)
 
-        order_data['total_price'] = Decimal(str(calculation['total_price']))
+        order_data['total_price'] = Decimal(str(quote.total_price))
+        # Снимок расчёта — детализация и квитанции не пересчитывают заказ по новым ценам
+        order_data['price_snapshot'] = quote.snapshot()
         order_data['status'] = 'new'
         
         # Данные клиента
@@ -758,31 +532,47 @@ def create_order_api(request):
             order_data['advance_payment'] = Decimal('0')
             order_data['debt'] = order_data['total_price']
         
-        # Сохраняем все рамы в JSON
-        if frames and len(frames) > 0:
-            frames_to_save = [dict(frame) for frame in frames]
-            if passepartouts:
-                frames_to_save[0]['passepartouts'] = passepartouts
-            if backing_ids:
-                frames_to_save[0]['backings'] = backing_ids
-            order_data['frames_data'] = json.dumps(frames_to_save)
-
-        # Создаем заказ
-        order = Order.objects.create(**order_data)
+        # Рамы, паспарту и подкладки заказа (строки пишутся после создания заказа)
+        frame_rows = [
+            OrderFrame(position=i, baguette_id=frame.get('baguette_id') or None,
+                       x1=_size_or_none(frame.get('x1')), x2=_size_or_none(frame.get('x2')))
+            for i, frame in enumerate(frames or [])
+        ]
+        passepartout_rows = [
+            OrderPassepartout(position=i, passepartout_id=pp['passepartout_id'],
+                              length=_size_or_none(pp.get('passepartout_length')),
+                              width=_size_or_none(pp.get('passepartout_width')))
+            for i, pp in enumerate(passepartouts)
+        ]
+        backing_rows = [OrderBacking(position=i, backing_id=bid) for i, bid in enumerate(backing_ids)]
 
-        # Списание материалов со склада
+        # Заказ, его строки и списание со склада — одной транзакцией
         deduct_data = dict(order_data)
         deduct_data['backing_ids'] = backing_ids
         if data.get('stretch_id'):
             deduct_data['stretch_id'] = data['stretch_id']
-        try:
-            StockDeduction.deduct_from_order(deduct_data, frames or [], passepartouts=passepartouts, quantity=order_quantity)
-        except Exception as deduct_err:
-            # Логируем, но не отменяем заказ — заказ уже создан
-            import logging
-            logging.getLogger(__name__).warning(
-                'Ошибка списания со склада для заказа %s: %s', order.pk, deduct_err
-            )
+        with transaction.atomic():
+            order = Order.objects.create(**order_data)
+            for rows in (frame_rows, passepartout_rows, backing_rows):
+                for row in rows:
+                    row.order = order
+            OrderFrame.objects.bulk_create(frame_rows)
+            OrderPassepartout.objects.bulk_create(passepartout_rows)
+            OrderBacking.objects.bulk_create(backing_rows)
+
+            # Списание материалов со склада: по UPDATE на справочник, в точке сохранения —
+            # ошибка списания откатывает только его
+            try:
+                with transaction.atomic():
+                    StockDeduction.deduct_from_order(
+                        deduct_data, frames or [], passepartouts=passepartouts, quantity=order_quantity, ctx=ctx
+                    )
+            except Exception as deduct_err:
+                # Логируем, но не отменяем заказ
+                import logging
+                logging.getLogger(__name__).warning(
+                    'Ошибка списания со склада для заказа %s: %s', order.pk, deduct_err
+                )
         
         return Response({
             'success': True,
@@ -799,140 +589,241 @@ def create_order_api(request):
         return Response({'error': str(e), 'traceback': traceback.format_exc()}, status=400)
 
 
+# Страница списка заказов (?limit=) по умолчанию и максимум
+ORDERS_LIMIT = 50
+ORDERS_LIMIT_MAX = 200
+
+ORDER_LIST_FIELDS = (
+    'id', 'x1', 'x2', 'total_price', 'status', 'created_at',
+    'customer_name', 'customer_phone', 'advance_payment', 'debt',
+)
+
+
+def _date_param(request, name):
+    """Дата YYYY-MM-DD из параметра запроса → начало этого дня (текущий часовой пояс)."""
+    value = request.GET.get(name)
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f'Некорректная дата {name}: ожидается ГГГГ-ММ-ДД')
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _order_filters(request):
+    """
+    Фильтры списка и сводки заказов: ?status=new,in_progress, ?date_from= и ?date_to= (включительно,
+    ГГГГ-ММ-ДД), ?debt=1 (есть долг), ?phone= (начало номера), ?customer= (часть имени).
+    """
+    params = request.GET
+    q = Q()
+    statuses = [s for s in params.get('status', '').split(',') if s]
+    if statuses:
+        known = dict(Order.STATUS_CHOICES)
+        unknown = [s for s in statuses if s not in known]
+        if unknown:
+            raise ValueError(f"Неизвестные статусы: {', '.join(unknown)}")
+        q &= Q(status__in=statuses)
+    date_from = _date_param(request, 'date_from')
+    if date_from is not None:
+        q &= Q(created_at__gte=date_from)
+    date_to = _date_param(request, 'date_to')
+    if date_to is not None:
+        q &= Q(created_at__lt=date_to + datetime.timedelta(days=1))
+    if params.get('debt') in ('1', 'true'):
+        q &= Q(debt__gt=0)
+    if params.get('phone', '').strip():
+        # Начало номера диапазоном, а не startswith: LIKE в SQLite без учёта регистра
+        # и не использует индекс order_customer_phone_idx
+        phone = params['phone'].strip()
+        q &= Q(customer_phone__gte=phone, customer_phone__lt=phone + '\U0010ffff')
+    if params.get('customer', '').strip():
+        q &= Q(customer_name__icontains=params['customer'].strip())
+    return q
+
+
+def _orders_after(cursor):
+    """Условие «заказ старше последнего на предыдущей странице» (курсор — created_at и id)."""
+    created_at, pk = catalog._decode_cursor(cursor, 2)
+    created_at = parse_datetime(created_at) if isinstance(created_at, str) else None
+    if created_at is None or not isinstance(pk, int):
+        raise ValueError('Некорректный курсор after')
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+
+
 @api_view(['GET'])
 def get_orders(request):
-    """API для получения краткого списка всех заказов"""
+    """
+    API для получения краткого списка заказов: новые сначала, страницами по (created_at, id).
+    Ответ: {'results': [...], 'next': курсор для ?after= или None}; фильтры — см. _order_filters.
+    """
     try:
-        orders = Order.objects.all().order_by('-created_at')
-        
-        data = []
-        for order in orders:
-            order_data = {
-                'id': order.pk,
-                'x1': float(order.x1),
-                'x2': float(order.x2),
-                'total_price': float(order.total_price),
-                'status': order.status,
-                'status_display': order.get_status_display(),
-                'created_at': order.created_at.strftime('%d.%m.%Y %H:%M'),
-                'customer_name': order.customer_name,
-                'customer_phone': order.customer_phone,
-                'advance_payment': float(order.advance_payment) if order.advance_payment else 0,
-                'debt': float(order.debt) if order.debt else 0,
-            }
-            data.append(order_data)
-        
-        return Response(data)
-    
-    except Exception as e:
+        queryset = Order.objects.filter(_order_filters(request))
+        after = request.GET.get('after')
+        if after:
+            queryset = queryset.filter(_orders_after(after))
+    except ValueError as e:
         return Response({'error': str(e)}, status=400)
 
+    limit = min(max(_int_param(request, 'limit') or ORDERS_LIMIT, 1), ORDERS_LIMIT_MAX)
+    rows = list(queryset.order_by('-created_at', '-id').values(*ORDER_LIST_FIELDS)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = catalog._encode_cursor([rows[-1]['created_at'].isoformat(), rows[-1]['id']])
+
+    status_display = dict(Order.STATUS_CHOICES)
+    return Response({
+        'results': [{
+            'id': row['id'],
+            'x1': float(row['x1']),
+            'x2': float(row['x2']),
+            'total_price': float(row['total_price']),
+            'status': row['status'],
+            'status_display': status_display.get(row['status'], row['status']),
+            'created_at': row['created_at'].strftime('%d.%m.%Y %H:%M'),
+            'customer_name': row['customer_name'],
+            'customer_phone': row['customer_phone'],
+            'advance_payment': float(row['advance_payment']) if row['advance_payment'] else 0,
+            'debt': float(row['debt']) if row['debt'] else 0,
+        } for row in rows],
+        'next': next_cursor,
+    })
+
+
+def _money_totals(count=0, total_price=None, advance_payment=None, debt=None):
+    return {
+        'count': count,
+        'total_price': total_price or Decimal('0'),
+        'advance_payment': advance_payment or Decimal('0'),
+        'debt': debt or Decimal('0'),
+    }
+
+
+def _add_totals(target, row):
+    for key in ('count', 'total_price', 'advance_payment', 'debt'):
+        target[key] += row[key] or 0
+
+
+def _totals_json(totals):
+    return {key: value if key == 'count' else float(value) for key, value in totals.items()}
+
 
 @api_view(['GET'])
-def get_order_detail(request, order_id):
-    """API для получения детальной информации о заказе с расчетами"""
+def get_orders_summary(request):
+    """
+    Сводка по заказам: количество и суммы (стоимость, аванс, долг) — всего, по статусам,
+    по дням и по месяцам. Фильтры те же, что у списка заказов (?date_from=, ?date_to= и т.д.).
+    Считается одним запросом GROUP BY (статус, день); статусы и месяцы — сложением его строк.
+    """
     try:
-        order = Order.objects.get(pk=order_id)
+        queryset = Order.objects.filter(_order_filters(request))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
 
-        # Список подкладок из frames_data (несколько), иначе одна из заказа
-        order_backing_ids = []
-        if order.frames_data:
-            try:
-                _sf = json.loads(order.frames_data)
-                if isinstance(_sf, list) and _sf and isinstance(_sf[0], dict):
-                    _emb = _sf[0].get('backings')
-                    if isinstance(_emb, list):
-                        order_backing_ids = [(b.get('backing_id') if isinstance(b, dict) else b)
-                                             for b in _emb if b]
-            except (json.JSONDecodeError, TypeError):
-                pass
-        if not order_backing_ids and order.backing_id:
-            order_backing_ids = [order.backing_id]
-
-        # Пересчитываем цену для получения детализации
-        calculation = PriceCalculator.calculate_total_price(
-            x1=order.x1,
-            x2=order.x2,
-            baguette_id=order.baguette.id if order.baguette else None,
-            glass_id=order.glass.id if order.glass else None,
-            backing_id=order.backing.id if order.backing else None,
-            backing_ids=order_backing_ids,
-            hardware_id=order.hardware.id if order.hardware else None,
-            hardware_quantity=order.hardware_quantity or 1,
-            podramnik_id=order.podramnik.id if order.podramnik else None,
-            package_id=order.package.id if order.package else None,
-            package_quantity=order.package_quantity or 1,
-            molding_id=order.molding.id if order.molding else None,
-            molding_consumption=order.molding_consumption,
-            trosik_id=order.trosik.id if order.trosik else None,
-            trosik_length=order.trosik_length,
-            podveski_id=order.podveski.id if order.podveski else None,
-            podveski_quantity=order.podveski_quantity,
-            passepartout_id=order.passepartout.id if order.passepartout else None,
-            passepartout_length=order.passepartout_length,
-            passepartout_width=order.passepartout_width,
+    rows = (
+        queryset
+        .annotate(day=TruncDate('created_at'))
+        .values('status', 'day')
+        .annotate(
+            count=Count('id'),
+            total_price=Sum('total_price'),
+            advance_payment=Sum('advance_payment'),
+            debt=Sum('debt'),
         )
-        
-        # Формируем информацию о рамах
-        frames = []
-        passepartouts_data = []
-        
-        # Если есть сохраненные данные о всех рамах, восстанавливаем их
-        if order.frames_data:
-            try:
-                saved_frames = json.loads(order.frames_data)
-                if isinstance(saved_frames, list) and saved_frames:
-                    embedded_pp = saved_frames[0].get('passepartouts') if isinstance(saved_frames[0], dict) else []
-                    if isinstance(embedded_pp, list):
-                        passepartouts_data = embedded_pp
-                for frame_data in saved_frames:
-                    frame = {}
-                    
-                    # Восстанавливаем багет
-                    if frame_data.get('baguette_id'):
-                        try:
-                            baguette = Baguette.objects.get(pk=frame_data['baguette_id'])
-                            frame['baguette'] = {
-                                'id': baguette.id,
-                                'name': baguette.name,
-                                'width': float(baguette.width),
-                                'price': float(baguette.price),
-                                'image': baguette.image.url if (baguette.image and hasattr(baguette.image, 'url')) else None,
-                            }
-                        except Baguette.DoesNotExist:
-                            pass
-                    
-                    # Восстанавливаем паспарту
-                    if frame_data.get('passepartout_id'):
-                        try:
-                            passepartout = Passepartout.objects.get(pk=frame_data['passepartout_id'])
-                            pp_image_url = None
-                            if passepartout.image and hasattr(passepartout.image, 'url'):
-                                pp_image_url = request.build_absolute_uri(passepartout.image.url)
-                            frame['passepartout'] = {
-                                'id': passepartout.id,
-                                'name': passepartout.name,
-                                'price': float(passepartout.price),
-                                'image': pp_image_url,
-                                'length': float(frame_data['passepartout_length']) if frame_data.get('passepartout_length') else None,
-                                'width': float(frame_data['passepartout_width']) if frame_data.get('passepartout_width') else None,
-                            }
-                        except Passepartout.DoesNotExist:
-                            pass
-
-                    # Сохраняем собственные размеры рамы (для корректного расчёта каждой)
-                    frame['x1'] = frame_data.get('x1') or float(order.x1)
-                    frame['x2'] = frame_data.get('x2') or float(order.x2)
-
-                    if frame.get('baguette') or frame.get('passepartout'):
-                        frames.append(frame)
-            except (json.JSONDecodeError, KeyError) as e:
-                # Если не удалось распарсить, используем старую логику
-                pass
-        
-        # Если не удалось восстановить рамы из frames_data, используем старую логику (одна рама)
+        .order_by('day', 'status')
+    )
+
+    total = _money_totals()
+    by_status = {status: _money_totals() for status, _ in Order.STATUS_CHOICES}
+    by_day, by_month = {}, {}
+    for row in rows:
+        _add_totals(total, row)
+        _add_totals(by_status.setdefault(row['status'], _money_totals()), row)
+        _add_totals(by_day.setdefault(row['day'], _money_totals()), row)
+        _add_totals(by_month.setdefault(row['day'].strftime('%Y-%m'), _money_totals()), row)
+
+    status_display = dict(Order.STATUS_CHOICES)
+    return Response({
+        'date_from': request.GET.get('date_from') or None,
+        'date_to': request.GET.get('date_to') or None,
+        'total': _totals_json(total),
+        'by_status': [
+            {'status': status, 'status_display': status_display.get(status, status), **_totals_json(totals)}
+            for status, totals in by_status.items()
+        ],
+        'by_day': [{'date': day.isoformat(), **_totals_json(totals)} for day, totals in by_day.items()],
+        'by_month': [{'month': month, **_totals_json(totals)} for month, totals in by_month.items()],
+    })
+
+
+# Все внешние ключи заказа — для детализации они читаются вместе с заказом
+ORDER_DETAIL_RELATED = (
+    'baguette', 'passepartout', 'glass', 'backing', 'stretch', 'hardware',
+    'podramnik', 'package', 'molding', 'trosik', 'podveski',
+)
+# Рамы, паспарту и подкладки заказа — вместе со своими строками справочников
+ORDER_DETAIL_PREFETCH = (
+    Prefetch('frames', queryset=OrderFrame.objects.select_related('baguette')),
+    Prefetch('passepartouts', queryset=OrderPassepartout.objects.select_related('passepartout')),
+    Prefetch('backings', queryset=OrderBacking.objects.select_related('backing')),
+)
+
+
+def _image_url(obj, request=None):
+    """Адрес фото строки справочника (абсолютный, если передан request) или None."""
+    if not (obj.image and hasattr(obj.image, 'url')):
+        return None
+    return request.build_absolute_uri(obj.image.url) if request else obj.image.url
+
+
+def _passepartout_detail(request, passepartout, length, width):
+    return {
+        'id': passepartout.id,
+        'name': passepartout.name,
+        'price': float(passepartout.price),
+        'image': _image_url(passepartout, request),
+        'length': float(length) if length else None,
+        'width': float(width) if width else None,
+    }
+
+
+@api_view(['GET'])
+def get_order_detail(request, order_id):
+    """
+    API для получения детальной информации о заказе с расчетами.
+    Число запросов не зависит от заказа: заказ со всеми внешними ключами — один запрос,
+    рамы, паспарту и подкладки (с их справочниками) — по одному запросу на таблицу,
+    детализация — из снимка цены.
+    """
+    try:
+        order = (
+            Order.objects.select_related(*ORDER_DETAIL_RELATED)
+            .prefetch_related(*ORDER_DETAIL_PREFETCH)
+            .get(pk=order_id)
+        )
+        order_passepartouts = list(order.passepartouts.all())
+        order_backings = [b.backing for b in order.backings.all()]
+        if not order_backings and order.backing:
+            order_backings = [order.backing]
+
+        # Формируем информацию о рамах (с багетом; паспарту заказа — отдельным списком)
+        frames = [{
+            'baguette': {
+                'id': f.baguette.id,
+                'name': f.baguette.name,
+                'width': float(f.baguette.width),
+                'price': float(f.baguette.price),
+                'image': _image_url(f.baguette),
+            },
+            # Собственные размеры рамы (для корректного расчёта каждой)
+            'x1': float(f.x1 or order.x1),
+            'x2': float(f.x2 or order.x2),
+        } for f in order.frames.all() if f.baguette]
+
+        # Заказ без сохранённых рам (старая структура): одна рама из полей заказа
         if not frames and order.baguette:
-            frame_from_order = {
+            frames.append({
                 'x1': float(order.x1),
                 'x2': float(order.x2),
                 'baguette': {
@@ -940,183 +831,21 @@ def get_order_detail(request, order_id):
                     'name': order.baguette.name,
                     'width': float(order.baguette.width),
                     'price': float(order.baguette.price),
-                    'image': order.baguette.image.url if (order.baguette.image and hasattr(order.baguette.image, 'url')) else None,
+                    'image': _image_url(order.baguette),
                 },
-                'passepartout': {
-                    'id': order.passepartout.id,
-                    'name': order.passepartout.name,
-                    'price': float(order.passepartout.price),
-                    'image': request.build_absolute_uri(order.passepartout.image.url) if (order.passepartout.image and hasattr(order.passepartout.image, 'url')) else None,
-                    'length': float(order.passepartout_length) if order.passepartout_length else None,
-                    'width': float(order.passepartout_width) if order.passepartout_width else None,
-                } if order.passepartout else None,
-            }
-            frames.append(frame_from_order)
-
-        restored_passepartouts = []
-        for pp in passepartouts_data:
-            pp_id = pp.get('passepartout_id')
-            if not pp_id:
-                continue
-            try:
-                pp_obj = Passepartout.objects.get(pk=pp_id)
-            except Passepartout.DoesNotExist:
-                continue
-            pp_image_url = None
-            if pp_obj.image and hasattr(pp_obj.image, 'url'):
-                pp_image_url = request.build_absolute_uri(pp_obj.image.url)
-            restored_passepartouts.append({
-                'id': pp_obj.id,
-                'name': pp_obj.name,
-                'price': float(pp_obj.price),
-                'image': pp_image_url,
-                'length': float(pp.get('passepartout_length')) if pp.get('passepartout_length') else None,
-                'width': float(pp.get('passepartout_width')) if pp.get('passepartout_width') else None,
+                'passepartout': _passepartout_detail(
+                    request, order.passepartout, order.passepartout_length, order.passepartout_width,
+                ) if order.passepartout and not order_passepartouts else None,
             })
-        
-        # Пересчитываем цену с учетом всех рамок
-        if frames and len(frames) > 0:
-            # Используем ту же логику, что и в calculate_price_api
-            result = {
-                'components': {},
-                'total_price': Decimal('0')
-            }
-            
-            # Рассчитываем цену для каждой рамы — по её собственному размеру
-            for idx, frame in enumerate(frames):
-                if frame.get('baguette') and frame['baguette'].get('id'):
-                    f_x1 = Decimal(str(frame.get('x1') or order.x1))
-                    f_x2 = Decimal(str(frame.get('x2') or order.x2))
-                    frame_calculation = PriceCalculator.calculate_total_price(
-                        x1=f_x1,
-                        x2=f_x2,
-                        baguette_id=frame['baguette']['id'],
-                        passepartout_id=frame.get('passepartout', {}).get('id'),
-                        passepartout_length=Decimal(str(frame.get('passepartout', {}).get('length'))) if frame.get('passepartout', {}).get('length') else None,
-                        passepartout_width=Decimal(str(frame.get('passepartout', {}).get('width'))) if frame.get('passepartout', {}).get('width') else None,
-                        work_id=frame.get('work_id'),
-                    )
-                    
-                    # Добавляем компоненты рамы с префиксом номера (багет, паспарту, работа)
-                    frame_num = idx + 1
-                    for key, value in frame_calculation.get('components', {}).items():
-                        if key in ['baguette', 'passepartout', 'work']:
-                            component_key = f'{key}_frame{frame_num}'
-                            result['components'][component_key] = {
-                                **value,
-                                'name': f"{value.get('name', key)} (Рама {frame_num})"
-                            }
-                            result['total_price'] += Decimal(str(value.get('total_price', 0)))
-
-            for pp_idx, pp_data in enumerate(restored_passepartouts):
-                pp_obj = Passepartout.objects.get(pk=pp_data['id'])
-                pp_length = Decimal(str(pp_data.get('length'))) if pp_data.get('length') else order.x1
-                pp_width = Decimal(str(pp_data.get('width'))) if pp_data.get('width') else order.x2
-                pp_area = PriceCalculator.calculate_glass_area(pp_length, pp_width)
-                pp_price = pp_area * pp_obj.price
-                result['components'][f'passepartout_{pp_idx + 1}'] = {
-                    'name': f"{pp_obj.name} (Паспарту {pp_idx + 1})",
-                    'length': float(pp_length),
-                    'width': float(pp_width),
-                    'area': float(pp_area),
-                    'unit_price': float(pp_obj.price),
-                    'total_price': float(pp_price),
-                }
-                result['total_price'] += pp_price
-            
-            # Добавляем остальные компоненты (стекло, подкладка и т.д.) только один раз (работа привязана к раме)
-            other_calculation = PriceCalculator.calculate_total_price(
-                x1=order.x1,
-                x2=order.x2,
-                glass_id=order.glass.id if order.glass else None,
-                backing_id=order.backing.id if order.backing else None,
-                backing_ids=order_backing_ids,
-                hardware_id=order.hardware.id if order.hardware else None,
-                hardware_quantity=order.hardware_quantity or 1,
-                podramnik_id=order.podramnik.id if order.podramnik else None,
-                package_id=order.package.id if order.package else None,
-                package_quantity=order.package_quantity or 1,
-                molding_id=order.molding.id if order.molding else None,
-                molding_consumption=order.molding_consumption,
-                trosik_id=order.trosik.id if order.trosik else None,
-                trosik_length=order.trosik_length,
-                podveski_id=order.podveski.id if order.podveski else None,
-                podveski_quantity=order.podveski_quantity,
-                stretch_id=order.stretch.id if order.stretch else None,
-            )
-
-            # Добавляем остальные компоненты
-            for key, value in other_calculation.get('components', {}).items():
-                result['components'][key] = value
-                result['total_price'] += Decimal(str(value.get('total_price', 0)))
 
-            calculation = result
-        else:
-            # Обратная совместимость: расчет для одной рамы
-            calculation = PriceCalculator.calculate_total_price(
-                x1=order.x1,
-                x2=order.x2,
-                baguette_id=order.baguette.id if order.baguette else None,
-                glass_id=order.glass.id if order.glass else None,
-                backing_id=order.backing.id if order.backing else None,
-                backing_ids=order_backing_ids,
-                hardware_id=order.hardware.id if order.hardware else None,
-                hardware_quantity=order.hardware_quantity or 1,
-                podramnik_id=order.podramnik.id if order.podramnik else None,
-                package_id=order.package.id if order.package else None,
-                package_quantity=order.package_quantity or 1,
-                molding_id=order.molding.id if order.molding else None,
-                molding_consumption=order.molding_consumption,
-                trosik_id=order.trosik.id if order.trosik else None,
-                trosik_length=order.trosik_length,
-                podveski_id=order.podveski.id if order.podveski else None,
-                podveski_quantity=order.podveski_quantity,
-                passepartout_id=order.passepartout.id if order.passepartout else None,
-                passepartout_length=order.passepartout_length,
-                passepartout_width=order.passepartout_width,
-                stretch_id=order.stretch.id if order.stretch else None,
-            )
+        restored_passepartouts = [
+            _passepartout_detail(request, pp.passepartout, pp.length, pp.width)
+            for pp in order_passepartouts
+        ]
 
-        # Работы + сложность — пересчёт для детализации.
-        # Рамы берём из сырого frames_data (включая рамы без багета).
-        extras_frames = []
-        if order.frames_data:
-            try:
-                for f in json.loads(order.frames_data):
-                    if isinstance(f, dict):
-                        extras_frames.append({
-                            'baguette_id': f.get('baguette_id'),
-                            'x1': f.get('x1') or order.x1,
-                            'x2': f.get('x2') or order.x2,
-                        })
-            except (json.JSONDecodeError, TypeError):
-                pass
-        if not extras_frames and order.baguette_id:
-            extras_frames = [{'baguette_id': order.baguette_id, 'x1': order.x1, 'x2': order.x2}]
-        extras_pps = [{'passepartout_id': p['id']} for p in restored_passepartouts]
-        for fr in frames:
-            pp = fr.get('passepartout')
-            if pp and pp.get('id'):
-                extras_pps.append({'passepartout_id': pp['id']})
-        extras_data = {
-            'baguette_id': order.baguette_id,
-            'glass_id': order.glass_id,
-            'backing_id': order.backing_id,
-            'backing_ids': order_backing_ids,
-            'hardware_id': order.hardware_id,
-            'hardware_quantity': order.hardware_quantity,
-            'podramnik_id': order.podramnik_id,
-            'molding_id': order.molding_id,
-            'package_id': order.package_id,
-            'stretch_id': order.stretch_id,
-            'manual_complexity': order.manual_complexity,
-            'quantity': 1,
-        }
-        extras = OrderExtrasCalculator.compute(
-            frames=extras_frames, passepartouts=extras_pps,
-            x1=order.x1, x2=order.x2, data=extras_data,
-        )
-        OrderExtrasCalculator.apply(calculation, extras, quantity=order.quantity)
+        # Детализация — из снимка, сделанного при создании (у старых заказов — пересчёт)
+        quote = QuoteEngine.for_order(order)
+        calculation = quote.calculation()
 
         order_data = {
             'id': order.pk,
@@ -1136,8 +865,7 @@ def get_order_detail(request, order_id):
             } if order.backing else None,
             'backings': [
                 {'id': _bk.id, 'name': _bk.name, 'price': float(_bk.price)}
-                for _bk in (Backing.objects.filter(pk=_bid).first() for _bid in order_backing_ids)
-                if _bk
+                for _bk in order_backings
             ],
             'stretch': {
                 'id': order.stretch.id,
@@ -1186,6 +914,9 @@ def get_order_detail(request, order_id):
             'created_at': order.created_at.strftime('%d.%m.%Y %H:%M'),
             'updated_at': order.updated_at.strftime('%d.%m.%Y %H:%M') if order.updated_at else None,
             'calculation': calculation,  # Детализация расчетов
+            # Когда и по какой версии справочников посчитана цена; None — снимка нет, расчёт по текущим ценам
+            'priced_at': quote.priced_at,
+            'catalog_version': quote.catalog_version,
             # Данные клиента
             'customer_name': order.customer_name,
             'customer_phone': order.customer_phone,
@@ -1230,6 +961,30 @@ def update_order_status(request, order_id):
         return Response({'error': str(e)}, status=400)
 
 
+@api_view(['POST'])
+def reprice_order(request, order_id):
+    """API для пересчёта цены заказа по текущим ценам справочников (новый снимок, итог и долг)"""
+    try:
+        order = Order.objects.get(pk=order_id)
+        old_total = order.total_price
+        quote = QuoteEngine.reprice(order)
+
+        return Response({
+            'success': True,
+            'order_id': order.pk,
+            'old_total_price': float(old_total),
+            'total_price': float(order.total_price),
+            'debt': float(order.debt),
+            'priced_at': quote.priced_at,
+            'calculation': quote.calculation(),
+        })
+
+    except Order.DoesNotExist:
+        return Response({'error': 'Заказ не найден'}, status=404)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+
 @api_view(['GET'])
 def generate_receipt(request, order_id):
     """API для генерации Word документа квитанции"""
@@ -1278,3 +1033,60 @@ def receipt_print(request, order_id):
         error_traceback = traceback.format_exc()
         logger.error(f"Ошибка при генерации HTML квитанции для заказа {order_id}: {str(e)}\n{error_traceback}")
         return Response({'error': str(e), 'traceback': error_traceback}, status=400)
+
+
+def _id_list(value):
+    """'1,2,3' → [1, 2, 3]; пустая строка — пустой список."""
+    return [int(v) for v in (value or '').split(',') if v.strip()]
+
+
+def _preview_params_for_order(order):
+    """Рамы, паспарту и размер картины заказа — для предпросмотра (в т.ч. в квитанции)."""
+    frames = list(order.frames.all())
+    if frames:
+        baguette_ids = [f.baguette_id for f in frames if f.baguette_id]
+        x1 = frames[0].x1 or order.x1
+        x2 = frames[0].x2 or order.x2
+    else:
+        baguette_ids = [order.baguette_id] if order.baguette_id else []
+        x1, x2 = order.x1, order.x2
+    passepartout_ids = [pp.passepartout_id for pp in order.passepartouts.all()]
+    if not passepartout_ids and not frames and order.passepartout_id:
+        passepartout_ids = [order.passepartout_id]
+    return baguette_ids, x1, x2, passepartout_ids
+
+
+@api_view(['GET'])
+def frame_preview(request):
+    """
+    PNG-предпросмотр рамы (как FramePreview.jsx), нарисованный на сервере и закэшированный на диске.
+    ?baguettes=1,2&widths=5,&passepartouts=3&x1=40&x2=30&size=400 — рамы от внутренней к внешней;
+    ?order=<id> — по сохранённому заказу (для квитанций).
+    """
+    params = request.GET
+    try:
+        size = int(params.get('size', preview.DEFAULT_SIZE))
+        widths = None
+        if params.get('order'):
+            order = Order.objects.filter(pk=int(params['order'])).first()
+            if order is None:
+                return Response({'error': 'Заказ не найден'}, status=404)
+            baguette_ids, x1, x2, passepartout_ids = _preview_params_for_order(order)
+        else:
+            baguette_ids = _id_list(params.get('baguettes'))
+            passepartout_ids = _id_list(params.get('passepartouts'))
+            x1, x2 = params.get('x1'), params.get('x2')
+            if params.get('widths'):
+                widths = [Decimal(w) if w.strip() else None for w in params['widths'].split(',')]
+                if any(w is not None and not w > 0 for w in widths):
+                    raise ValueError('Ширины рам должны быть больше нуля')
+        x1, x2 = Decimal(str(x1)), Decimal(str(x2))
+        if x1 <= 0 or x2 <= 0:
+            raise ValueError('Размеры должны быть больше нуля')
+        path = preview.preview_file(baguette_ids, x1, x2, passepartout_ids, widths, size)
+    except (ValueError, ArithmeticError, TypeError) as e:
+        return Response({'error': f'Некорректные параметры предпросмотра: {e}'}, status=400)
+
+    response = FileResponse(open(path, 'rb'), content_type='image/png')
+    response['Cache-Control'] = 'max-age=3600'
+    return response
@@ -0,0 +1,416 @@
+"""
+Справочники (каталоги) мастерской: единый реестр моделей и их представления в API.
+
+Используется и отдельными эндпоинтами (/api/glasses/ и т.д.), и общим /api/catalog/,
+чтобы формат строк справочника был описан в одном месте.
+"""
+import base64
+import datetime
+import gzip
+import json
+import operator
+import time
+from functools import reduce
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import F, Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+
+from . import images
+from .models import (
+    Baguette, Glass, Backing, Hardware, Podramnik, Package,
+    Molding, Trosik, Podveski, Passepartout, Stretch, Foamboard, TechOperation,
+    CatalogTombstone,
+)
+
+
+# Версия справочников: растёт при любом изменении моделей frames (сигналы в signals.py,
+# списание со склада). Хранится в кэше Django, чтобы проверка If-None-Match
+# не обращалась к базе и была общей для всех воркеров.
+VERSION_KEY = 'catalog:version'
+# Версия цен: то же, но только изменения, влияющие на расчёт цены (не остатки склада).
+# По ней перестраиваются снимок справочников (pricebook) и ключи кэша расчётов (quotes)
+PRICE_VERSION_KEY = 'catalog:price_version'
+
+# Поля, изменение только которых (save(update_fields=...)) не меняет цены
+STOCK_FIELDS = frozenset({'stock_quantity', 'updated_at'})
+
+
+def _now_version():
+    return time.time_ns() // 1000
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Кэш очищен/перезапущен — начинаем с текущего времени, чтобы версия
+        # не совпала ни с одной из выданных раньше.
+        cache.add(key, _now_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_version():
+    """Текущая версия справочников (целое, монотонно растёт)."""
+    return _get_version(VERSION_KEY)
+
+
+def get_price_version():
+    """Версия справочников, с которой не менялись цены (целое, монотонно растёт)."""
+    return _get_version(PRICE_VERSION_KEY)
+
+
+def bump_version(prices=True):
+    """
+    Помечает справочники изменёнными; возвращает новую версию.
+    prices=False — изменились только остатки, версия цен остаётся прежней.
+    """
+    version = max(_now_version(), (cache.get(VERSION_KEY) or 0) + 1)
+    cache.set(VERSION_KEY, version, timeout=None)
+    if prices:
+        cache.set(PRICE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def _accepts_gzip(request):
+    """
+    Принимает ли клиент gzip: по весам q из Accept-Encoding. «gzip;q=0» — отказ,
+    без явного gzip решает «*». Поиск слова gzip в заголовке (как re_accepts_gzip
+    в GZipMiddleware) отказ не учитывает.
+    """
+    weights = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = item.split(';')
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    q = weights.get('gzip', weights.get('x-gzip', weights.get('*', 0.0)))
+    return q > 0
+
+
+def version_etag(request, *args, **kwargs):
+    """
+    etag_func для django.views.decorators.http.condition.
+    Сжатый и несжатый ответы — разные представления, у них разные (сильные) ETag.
+    """
+    version = str(get_version())
+    return f'{version}-gzip' if _accepts_gzip(request) else version
+
+
+def _float(value, request):
+    return float(value) if value is not None else None
+
+
+def _text(value, request):
+    return value or ''
+
+
+def _image(value, request):
+    # value — FieldFile (у объекта) или имя файла (из .values())
+    name = getattr(value, 'name', value)
+    if not name:
+        return None
+    return request.build_absolute_uri(default_storage.url(name))
+
+
+def _derivative(size, ext):
+    def convert(value, request):
+        name = getattr(value, 'name', value)
+        if not name:
+            return None
+        return request.build_absolute_uri(default_storage.url(images.derivative_name(name, size, ext)))
+    return convert
+
+
+# Колонки справочника: поле модели (= ключ в API) → преобразование значения (None — как есть).
+# По ним строятся и строки из объектов, и выборки .values() только нужных полей.
+# Производные колонки берут значение из поля, указанного в _SOURCES.
+_IMAGES = {
+    f'image_{size}' + ('' if ext == 'jpg' else f'_{ext}'): _derivative(size, ext)
+    for size in images.SIZES for ext in images.FORMATS
+}
+_SOURCES = {key: 'image' for key in _IMAGES}
+_BAGUETTE = {
+    'id': None,
+    'name': None,
+    'barcode': _text,
+    'width': _float,
+    'price': _float,
+    'stock_quantity': _float,
+    'image': _image,
+    **_IMAGES,
+}
+_GLASS = {'id': None, 'name': None, 'price_per_sqm': _float}
+_PRICED = {'id': None, 'name': None, 'price': _float}
+_PER_UNIT = {'id': None, 'name': None, 'price_per_unit': _float}
+_PER_METER = {'id': None, 'name': None, 'price_per_meter': _float}
+_PASSEPARTOUT = {'id': None, 'name': None, 'price': _float, 'image': _image, **_IMAGES}
+_WORK = {
+    'id': None,
+    'code': None,
+    'operation_type': None,
+    'name': None,
+    'size_from': _float,
+    'size_to': _float,
+    'rate': _float,
+}
+
+
+# Имя справочника в API → (модель, колонки).
+# Имена совпадают с адресами отдельных эндпоинтов (/api/<имя>/).
+CATALOGS = {
+    'baguettes': (Baguette, _BAGUETTE),
+    'glasses': (Glass, _GLASS),
+    'backings': (Backing, _PRICED),
+    'hardware': (Hardware, _PER_UNIT),
+    'podramniki': (Podramnik, _PRICED),
+    'packages': (Package, _PRICED),
+    'moldings': (Molding, _PER_METER),
+    'trosiki': (Trosik, _PER_METER),
+    'podveski': (Podveski, _PER_UNIT),
+    'passepartout': (Passepartout, _PASSEPARTOUT),
+    'stretches': (Stretch, _PER_METER),
+    'foamboards': (Foamboard, _PRICED),
+    'works': (TechOperation, _WORK),
+}
+
+NAME_BY_MODEL = {model: name for name, (model, _) in CATALOGS.items()}
+
+
+def parse_include(value):
+    """
+    Разбирает параметр include=baguettes,glasses.
+    Возвращает (имена, неизвестные); пустой параметр — все справочники.
+    """
+    requested = [n.strip() for n in (value or '').split(',') if n.strip()]
+    if not requested:
+        return list(CATALOGS), []
+    names, unknown = [], []
+    for name in requested:
+        if name not in CATALOGS:
+            unknown.append(name)
+        elif name not in names:
+            names.append(name)
+    return names, unknown
+
+
+def parse_fields(name, value):
+    """
+    Разбирает параметр fields=id,name,price для справочника name.
+    Пустой параметр — все колонки; id возвращается всегда. Неизвестные поля — ValueError.
+    """
+    columns = CATALOGS[name][1]
+    requested = [f.strip() for f in (value or '').split(',') if f.strip()]
+    if not requested:
+        return list(columns)
+    unknown = [f for f in requested if f not in columns]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    return [f for f in columns if f == 'id' or f in requested]
+
+
+def _sources(fields):
+    """Поля модели, нужные для колонок fields."""
+    return list(dict.fromkeys(_SOURCES.get(f, f) for f in fields))
+
+
+def _convert(columns, fields, get, request):
+    row = {}
+    for field in fields:
+        value = get(_SOURCES.get(field, field))
+        convert = columns[field]
+        row[field] = convert(value, request) if convert else value
+    return row
+
+
+def serialize_one(name, obj, request, fields=None):
+    """Одна строка справочника name в формате API."""
+    columns = CATALOGS[name][1]
+    return _convert(columns, fields or list(columns), lambda f: getattr(obj, f), request)
+
+
+def serialize(name, request, queryset=None, fields=None):
+    """
+    Список строк справочника name в формате API.
+    Без queryset читает из базы только нужные колонки (.values()).
+    """
+    model, columns = CATALOGS[name]
+    fields = fields or list(columns)
+    if queryset is None:
+        return [_convert(columns, fields, values.get, request)
+                for values in model.objects.values(*_sources(fields))]
+    return [serialize_one(name, obj, request, fields) for obj in queryset]
+
+
+# ---------- Постраничная выдача (курсор) ----------
+#
+# Страницы идут в порядке Meta.ordering модели + pk (keyset: без OFFSET, устойчиво
+# к вставкам). Курсор after — непрозрачная строка со значениями ключа последней
+# строки страницы; клиент берёт её из поля next предыдущего ответа.
+
+PAGE_LIMIT = 100
+PAGE_LIMIT_MAX = 1000
+
+
+def _page_ordering(model):
+    return [f for f in model._meta.ordering if f != 'pk'] + ['pk']
+
+
+def _encode_cursor(values):
+    raw = json.dumps(values, default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Некорректный курсор after')
+    return values
+
+
+def _after(ordering, values):
+    """Условие «строка после values» для сортировки ordering (NULL — в начале)."""
+    parts, equal = [], {}
+    for field, value in zip(ordering, values):
+        greater = Q(**{f'{field}__isnull': False}) if value is None else Q(**{f'{field}__gt': value})
+        parts.append(Q(**equal) & greater)
+        # field=None Django превращает в IS NULL
+        equal[field] = value
+    return reduce(operator.or_, parts)
+
+
+def page(name, request, fields=None, limit=None, after=None):
+    """
+    Страница справочника name: {'results': [...], 'next': курсор или None}.
+    Из базы читаются только колонки fields и ключ сортировки.
+    """
+    model, columns = CATALOGS[name]
+    fields = fields or list(columns)
+    limit = min(max(limit or PAGE_LIMIT, 1), PAGE_LIMIT_MAX)
+    ordering = _page_ordering(model)
+
+    queryset = model.objects.order_by(*[F(f).asc(nulls_first=True) for f in ordering])
+    if after:
+        queryset = queryset.filter(_after(ordering, _decode_cursor(after, len(ordering))))
+    rows = list(queryset.values(*_sources(fields + ordering))[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor([rows[-1][f] for f in ordering])
+    return {
+        'results': [_convert(columns, fields, values.get, request) for values in rows],
+        'next': next_cursor,
+    }
+
+
+# ---------- Синхронизация (только изменения) ----------
+#
+# Версия — время последнего изменения в микросекундах, поэтому её можно сравнивать
+# с updated_at строк и deleted_at отметок об удалении (CatalogTombstone).
+
+# Запас при выборке: строка из транзакции, зафиксированной уже после того, как клиент
+# получил версию, может иметь updated_at чуть раньше версии. Повтор строки безвреден.
+SYNC_OVERLAP = datetime.timedelta(seconds=5)
+
+# Отметки об удалении старше этого срока удаляются (prune_tombstones при запросе
+# изменений); изменения с более ранней версии уже не восстановить — клиенту
+# отдаются справочники целиком
+TOMBSTONE_RETENTION = datetime.timedelta(days=settings.CATALOG_TOMBSTONE_DAYS)
+
+
+def version_time(version):
+    """Момент времени, соответствующий версии справочников."""
+    return datetime.datetime.fromtimestamp(version / 1_000_000, tz=datetime.timezone.utc)
+
+
+def prune_tombstones():
+    """Удаляет отметки об удалении старше TOMBSTONE_RETENTION."""
+    CatalogTombstone.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()
+
+
+def changes(request, since, names):
+    """
+    Изменения справочников names после версии since:
+    {'version': текущая, 'full': bool, 'changes': {имя: [строки]}, 'deleted': {имя: [id]}}.
+    Клиент сначала убирает deleted, затем записывает changes поверх своей копии.
+    full — since = 0 или старше срока хранения отметок об удалении: в changes все строки,
+    копию клиента нужно заменить целиком.
+    """
+    # Версию берём до выборки — то, что изменится во время запроса, придёт в следующий раз
+    version = get_version()
+    after = version_time(since) - SYNC_OVERLAP
+    full = after < timezone.now() - TOMBSTONE_RETENTION
+    changed = {}
+    for name in names:
+        model, columns = CATALOGS[name]
+        rows = model.objects.all() if full else model.objects.filter(updated_at__gt=after)
+        rows = rows.values(*_sources(columns))
+        changed[name] = [_convert(columns, list(columns), values.get, request) for values in rows]
+    # Старые отметки чистим здесь, одним запросом, а не при каждом удалении строки
+    prune_tombstones()
+    deleted = {name: [] for name in names}
+    if not full:
+        tombstones = CatalogTombstone.objects.filter(catalog__in=names, deleted_at__gt=after)
+        for name, object_id in tombstones.values_list('catalog', 'object_id'):
+            deleted[name].append(object_id)
+    return {'version': version, 'full': full, 'changes': changed, 'deleted': deleted}
+
+
+# ---------- Готовые (сериализованные и сжатые) ответы ----------
+#
+# Ответ справочника целиком (JSON-байты + gzip-копия) строится один раз на версию
+# и хранится в кэше Django (общий для воркеров) и в памяти процесса. Изменение
+# справочника меняет версию — следующий запрос перестраивает ответ.
+
+BLOB_TIMEOUT = 60 * 60 * 24
+_local_blobs = {}
+
+
+def encode(data):
+    """JSON-байты в формате JSONRenderer DRF (компактно, без \\u-экранирования)."""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(request, body, gzipped=None):
+    """HttpResponse с готовым JSON; отдаёт gzip-вариант, если клиент его принимает."""
+    if _accepts_gzip(request):
+        response = HttpResponse(gzipped if gzipped is not None else gzip.compress(body),
+                                content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def cached_response(request, key, build):
+    """
+    Ответ справочника key из кэша текущей версии; build() строит данные при промахе.
+    Абсолютные URL картинок зависят от хоста — он входит в ключ.
+    """
+    version = get_version()
+    cache_key = f'catalog:blob:{key}:{request.scheme}://{request.get_host()}'
+    blob = _local_blobs.get(cache_key)
+    if blob is None or blob[0] != version:
+        blob = cache.get(cache_key)
+        if blob is None or blob[0] != version:
+            body = encode(build())
+            blob = (version, body, gzip.compress(body, compresslevel=9))
+            cache.set(cache_key, blob, BLOB_TIMEOUT)
+        _local_blobs[cache_key] = blob
+    return json_response(request, blob[1], blob[2])
@@ -0,0 +1,104 @@
+"""
+Целочисленная арифметика расчёта цены (фиксированная точка).
+
+Все цены и размеры в справочниках — с двумя знаками после запятой, поэтому
+калькуляторы считают в целых числах:
+  деньги — копейки;
+  длины — единицы 0,01 см (0,1 мм), в метре их METER;
+  площади — произведение двух длин, в квадратном метре их AREA.
+Произведения длин и цен точные; в копейки сумма приводится один раз —
+округлением половины вверх, как 1С при записи суммы в реквизит с двумя знаками.
+В Decimal и float значения переводятся только на границе: ввод данных запроса
+и справочников (to_units), ответ API (rub).
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+KOPECK = 100                # копеек в рубле
+LENGTH = 100                # единиц длины в сантиметре
+METER = 100 * LENGTH        # единиц длины в метре
+AREA = METER * METER        # единиц площади в квадратном метре
+
+
+def to_units(value, scale: int) -> int:
+    """Число (Decimal, float, str, int) в целых единицах 1/scale; пустое и нечисловое — 0."""
+    kind = type(value)
+    if kind is int:
+        return value * scale
+    if kind is Decimal and value.is_finite():
+        # Значения справочников (2 знака) переводятся точно, без округления
+        units = value * scale
+        whole = int(units)
+        if whole == units:
+            return whole
+        return int(units.to_integral_value(rounding=ROUND_HALF_UP))
+    if kind is float and -1e12 < value < 1e12:
+        # float из ответа расчёта (рубли с копейками): ближайшее целое, если число им и было
+        units = value * scale
+        whole = round(units)
+        if abs(units - whole) < 1e-6:
+            return whole
+    if value is None or value == '':
+        return 0
+    try:
+        value = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return 0
+    if not value.is_finite():
+        return 0
+    return int((value * scale).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def kopecks(rubles) -> int:
+    return to_units(rubles, KOPECK)
+
+
+def length(cm) -> int:
+    return to_units(cm, LENGTH)
+
+
+def meters(m) -> int:
+    """Длина, заданная в метрах (ширина багета, расход молдинга, тросик)."""
+    return to_units(m, METER)
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """Целое от деления с округлением половины от нуля (1С Окр())."""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if 2 * remainder >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def by_length(units: int, price: int) -> int:
+    """Стоимость в копейках: длина в единицах × цена за метр в копейках."""
+    return div_round(units * price, METER)
+
+
+def by_area(units: int, price: int) -> int:
+    """Стоимость в копейках: площадь в единицах × цена за кв.м в копейках."""
+    return div_round(units * price, AREA)
+
+
+def at_least(amount: int, minimum: int) -> int:
+    """Порог снизу (как в 1С: > порог ? сумма : порог)."""
+    return amount if amount > minimum else minimum
+
+
+def okr(amount: int, divisor: int = 1) -> int:
+    """Окр(amount / divisor) до целых рублей; amount и результат — в копейках."""
+    return div_round(amount, KOPECK * divisor) * KOPECK
+
+
+def rub(amount: int) -> float:
+    """Копейки → рубли для ответа API (int / int в Python округляется корректно)."""
+    return amount / KOPECK
+
+
+def rub_decimal(amount: int) -> Decimal:
+    """Копейки → рубли для записи в DecimalField."""
+    return Decimal(amount).scaleb(-2)
+
+
+def to_float(units: int, scale: int) -> float:
+    """Длина (scale=METER) или площадь (scale=AREA) для ответа API."""
+    return units / scale
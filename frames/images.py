@@ -0,0 +1,91 @@
+"""
+Производные изображения багетов и паспарту: миниатюра для списков и полоска
+для предпросмотра рамы, каждая в JPEG и WebP.
+
+Файлы лежат рядом с оригиналом, имена выводятся из имени оригинала:
+baguettes/photo.jpg → baguettes/photo.thumb.jpg, baguettes/photo.strip.webp, ...
+Поэтому в базе ничего не хранится, а URL можно отдавать без обращения к диску.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Вид → максимальные (ширина, высота); пропорции сохраняются
+SIZES = {
+    'thumb': (160, 160),    # миниатюра в списках
+    'strip': (2048, 128),   # полоска багета для FramePreview: толщина 128 px, длина по пропорции
+}
+
+# Расширение → (формат Pillow, параметры сохранения)
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+}
+
+
+def derivative_name(name, size, ext):
+    """Имя производного файла для оригинала name."""
+    root, _ = os.path.splitext(name)
+    return f'{root}.{size}.{ext}'
+
+
+def _flatten(image):
+    """RGB без прозрачности (прозрачное — на белом фоне), с учётом EXIF-поворота."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate(name, storage=default_storage, force=False):
+    """
+    Создаёт производные для файла name (недостающие или все при force).
+    Возвращает число созданных файлов.
+    """
+    targets = [
+        (size, ext, derivative_name(name, size, ext))
+        for size in SIZES for ext in FORMATS
+    ]
+    if not force:
+        targets = [t for t in targets if not storage.exists(t[2])]
+    if not targets:
+        return 0
+
+    with storage.open(name, 'rb') as f, Image.open(f) as original:
+        source = _flatten(original)
+
+    resized = {}
+    for size, ext, target in targets:
+        if size not in resized:
+            resized[size] = source.copy()
+            resized[size].thumbnail(SIZES[size], Image.Resampling.LANCZOS)
+        fmt, params = FORMATS[ext]
+        buf = BytesIO()
+        resized[size].save(buf, fmt, **params)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(buf.getvalue()))
+    return len(targets)
+
+
+def generate_for(image):
+    """
+    Производные для поля ImageField после сохранения модели.
+    Ошибка картинки (битый файл и т.п.) не должна мешать сохранению — только пишем в лог.
+    """
+    if not image:
+        return 0
+    try:
+        return generate(image.name, image.storage)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("Не удалось построить миниатюры для %s: %s", image.name, e)
+        return 0
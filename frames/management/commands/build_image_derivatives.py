@@ -0,0 +1,61 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+
+# Модули уровня файла не должны требовать django.setup(): при запуске процессов
+# через spawn (macOS, Windows) дочерний процесс импортирует этот файл заново
+from frames import images
+
+
+def _build(name, force):
+    # Выполняется в дочернем процессе: ошибку возвращаем, а не бросаем,
+    # чтобы один битый файл не останавливал остальные
+    try:
+        return name, images.generate(name, force=force), None
+    except Exception as e:
+        return name, 0, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Миниатюры и WebP-варианты для фото багетов и паспарту (параллельно, пулом процессов)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Число процессов (по умолчанию — по числу ядер)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать уже существующие производные'
+        )
+
+    def handle(self, *args, **options):
+        from frames.models import Baguette, Passepartout
+
+        names = set()
+        for model in (Baguette, Passepartout):
+            names.update(model.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True))
+        if not names:
+            self.stdout.write('Нет изображений')
+            return
+
+        created = errors = 0
+        # initializer: при spawn настройки и приложения в дочернем процессе не загружены
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1), initializer=django.setup) as pool:
+            futures = [pool.submit(_build, name, options['force']) for name in sorted(names)]
+            for future in as_completed(futures):
+                name, count, error = future.result()
+                if error:
+                    errors += 1
+                    self.stdout.write(self.style.ERROR(f'{name}: {error}'))
+                else:
+                    created += count
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {len(names)}, создано файлов: {created}, ошибок: {errors}'
+        ))
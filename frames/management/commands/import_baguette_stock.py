@@ -3,7 +3,7 @@ from decimal import Decimal, InvalidOperation
 from django.core.management.base import BaseCommand
 from openpyxl import load_workbook
 
-from frames.models import Baguette
+from frames.models import Baguette, clean_barcode
 
 
 class Command(BaseCommand):
@@ -16,6 +16,12 @@ class Command(BaseCommand):
             required=True,
             help="Путь к xlsx файлу с остатками багетов",
         )
+        parser.add_argument(
+            "--barcode-column",
+            type=int,
+            default=None,
+            help="Номер колонки со штрихкодом (с 0); по умолчанию штрихкоды не импортируются",
+        )
 
     @staticmethod
     def _to_decimal(value):
@@ -33,6 +39,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         file_path = options["file"]
+        barcode_column = options["barcode_column"]
         wb = load_workbook(file_path, data_only=True)
         ws = wb[wb.sheetnames[0]]
 
@@ -55,13 +62,27 @@ class Command(BaseCommand):
 
             stock_quantity = self._to_decimal(stock_raw)
 
+            defaults = {
+                "stock_quantity": stock_quantity,
+                "price": Decimal("0"),
+                "width": Decimal("0"),
+            }
+            if barcode_column is not None and len(row) > barcode_column:
+                barcode = clean_barcode(row[barcode_column])
+                if barcode and Baguette.objects.filter(barcode=barcode).exclude(name=name).exists():
+                    # Штрихкод уникален: строку с чужим штрихкодом пропускаем целиком,
+                    # иначе IntegrityError оборвёт импорт на середине
+                    self.stdout.write(
+                        self.style.WARNING(f"Пропущен {name}: штрихкод {barcode} уже у другого багета")
+                    )
+                    skipped_count += 1
+                    continue
+                if barcode:
+                    defaults["barcode"] = barcode
+
             _, created = Baguette.objects.update_or_create(
                 name=name,
-                defaults={
-                    "stock_quantity": stock_quantity,
-                    "price": Decimal("0"),
-                    "width": Decimal("0"),
-                },
+                defaults=defaults,
             )
 
             if created:
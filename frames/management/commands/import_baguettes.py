@@ -1,7 +1,7 @@
 import xlrd
 from decimal import Decimal
 from django.core.management.base import BaseCommand
-from frames.models import Baguette
+from frames.models import Baguette, clean_barcode
 
 
 class Command(BaseCommand):
@@ -14,9 +14,16 @@ class Command(BaseCommand):
             default='справочник багет.xls',
             help='Путь к Excel файлу с багетами'
         )
+        parser.add_argument(
+            '--barcode-column',
+            type=int,
+            default=None,
+            help='Номер колонки со штрихкодом (с 0); по умолчанию штрихкоды не импортируются'
+        )
 
     def handle(self, *args, **options):
         file_path = options['file']
+        barcode_column = options['barcode_column']
         
         try:
             # Открываем Excel файл
@@ -70,13 +77,27 @@ class Command(BaseCommand):
                         skipped_count += 1
                         continue
                     
+                    defaults = {
+                        'width': width_decimal,
+                        'price': price_decimal,
+                    }
+                    if barcode_column is not None and barcode_column < ws.ncols:
+                        barcode = clean_barcode(ws.cell_value(row_idx, barcode_column))
+                        if barcode and Baguette.objects.filter(barcode=barcode).exclude(name=name.strip()).exists():
+                            self.stdout.write(
+                                self.style.WARNING(
+                                    f'Пропущена строка {row_idx + 1}: штрихкод {barcode} уже у другого багета'
+                                )
+                            )
+                            skipped_count += 1
+                            continue
+                        if barcode:
+                            defaults['barcode'] = barcode
+
                     # Создаем или обновляем багет
                     baguette, created = Baguette.objects.update_or_create(
                         name=name.strip(),
-                        defaults={
-                            'width': width_decimal,
-                            'price': price_decimal,
-                        }
+                        defaults=defaults
                     )
                     
                     if created:
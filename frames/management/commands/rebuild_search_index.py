@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from frames import search
+
+
+class Command(BaseCommand):
+    help = 'Перестроение полнотекстового индекса справочников (таблица frames_search)'
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс поиска перестроен'))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.10 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+# Копия frames.models.norm_search на момент миграции: историческая миграция
+# не должна зависеть от текущего кода моделей
+_LOOKALIKE = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у',
+})
+
+
+def norm_search(s):
+    return (s or '').lower().translate(_LOOKALIKE).replace(' ', '')
+
+
+def fill_norm(apps, schema_editor):
+    Baguette = apps.get_model('frames', 'Baguette')
+    rows = []
+    for b in Baguette.objects.only('pk', 'name', 'barcode').iterator(chunk_size=1000):
+        b.name_norm = norm_search(b.name)
+        b.barcode_norm = norm_search(b.barcode)
+        rows.append(b)
+    Baguette.objects.bulk_update(rows, ['name_norm', 'barcode_norm'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frames', '0019_rename_stretch_price_per_meter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baguette',
+            name='barcode_norm',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='baguette',
+            name='name_norm',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_norm, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# Состояние frames/search.py на момент миграции: номер справочника в rowid
+# (rowid = номер * KIND_BASE + pk), модель и есть ли у неё штрихкод.
+# Копия, а не импорт: реестр catalog.CATALOGS может меняться после этой миграции
+KIND_BASE = 10 ** 12
+KINDS = [
+    (1, 'Baguette', True),
+    (2, 'Glass', False),
+    (3, 'Backing', False),
+    (4, 'Hardware', False),
+    (5, 'Podramnik', False),
+    (6, 'Package', False),
+    (7, 'Molding', False),
+    (8, 'Trosik', False),
+    (9, 'Podveski', False),
+    (10, 'Passepartout', False),
+    (11, 'Stretch', False),
+    (12, 'Foamboard', False),
+    (13, 'TechOperation', False),
+]
+
+_LOOKALIKE = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у',
+})
+
+
+def _fold(s):
+    return (s or '').lower().translate(_LOOKALIKE)
+
+
+def _document(name, barcode):
+    parts = (_fold(name).replace(' ', ''), _fold(barcode).replace(' ', ''), _fold(name))
+    return ' '.join(p for p in parts if p)
+
+
+def fill_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for kind_no, model_name, has_barcode in KINDS:
+            model = apps.get_model('frames', model_name)
+            if has_barcode:
+                values = model.objects.values_list('pk', 'name', 'barcode')
+            else:
+                values = ((pk, name, None) for pk, name in model.objects.values_list('pk', 'name'))
+            rows = [(kind_no * KIND_BASE + pk, _document(name, barcode)) for pk, name, barcode in values]
+            cursor.executemany('INSERT INTO frames_search (rowid, text) VALUES (%s, %s)', rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frames', '0020_baguette_search_norm'),
+    ]
+
+    operations = [
+        # Полнотекстовый индекс справочников (см. frames/search.py)
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE frames_search USING fts5(text, tokenize='trigram')",
+            'DROP TABLE frames_search',
+        ),
+        migrations.RunPython(fill_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+def clean_barcodes(apps, schema_editor):
+    """
+    Перед уникальным индексом: пустые штрихкоды → NULL, пробелы по краям убираем.
+    Повторяющиеся штрихкоды не трогаем: миграция останавливается со списком багетов,
+    какой штрихкод чей — решает оператор в админке, затем migrate запускается снова.
+    """
+    Baguette = apps.get_model('frames', 'Baguette')
+    owners = {}
+    for pk, name, barcode in Baguette.objects.exclude(barcode__isnull=True).order_by('pk').values_list('pk', 'name', 'barcode'):
+        code = barcode.strip()
+        if code:
+            owners.setdefault(code, []).append(f'#{pk} {name}')
+    conflicts = {code: names for code, names in owners.items() if len(names) > 1}
+    if conflicts:
+        raise RuntimeError(
+            'Повторяющиеся штрихкоды багетов, уникальный индекс не создан:\n' + '\n'.join(
+                f'  {code}: {", ".join(names)}' for code, names in sorted(conflicts.items())
+            )
+        )
+
+    for pk, barcode in Baguette.objects.exclude(barcode__isnull=True).values_list('pk', 'barcode'):
+        code = barcode.strip() or None
+        if code != barcode:
+            Baguette.objects.filter(pk=pk).update(barcode=code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frames', '0021_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(clean_barcodes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='baguette',
+            name='barcode',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True, verbose_name='Штрихкод'),
+        ),
+    ]
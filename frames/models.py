@@ -1,10 +1,40 @@
 from django.db import models
 
 
+# Похожие латинские/кириллические буквы приводим к одному виду,
+# чтобы «M59» находил «М59» (кириллица) и наоборот.
+_LOOKALIKE = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у',
+})
+
+
+def fold_search(s):
+    """Нижний регистр, латиница→кириллица (пробелы сохраняются)."""
+    return (s or '').lower().translate(_LOOKALIKE)
+
+
+def norm_search(s):
+    """Нормализация для поиска: без пробелов, в нижнем регистре, латиница→кириллица."""
+    return fold_search(s).replace(' ', '')
+
+
+def clean_barcode(value):
+    """Штрихкод из ячейки Excel: числовые приходят как float (4600123.0); пустой — None."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if value in (None, ''):
+        return None
+    return str(value).strip() or None
+
+
 class Baguette(models.Model):
     """Модель багета"""
     name = models.CharField('Название', max_length=200)
-    barcode = models.CharField('Штрихкод', max_length=100, blank=True, null=True)
+    barcode = models.CharField('Штрихкод', max_length=100, blank=True, null=True, unique=True)
+    # Нормализованные (norm_search) копии для поиска индексом; заполняются в save()
+    name_norm = models.CharField(max_length=200, blank=True, default='', editable=False, db_index=True)
+    barcode_norm = models.CharField(max_length=100, blank=True, default='', editable=False, db_index=True)
     width = models.DecimalField('Ширина (м)', max_digits=6, decimal_places=2)
     price = models.DecimalField('Цена за метр (руб)', max_digits=10, decimal_places=2)
     stock_quantity = models.DecimalField(
@@ -16,6 +46,7 @@ class Baguette(models.Model):
     )
     image = models.ImageField('Фото', upload_to='baguettes/', blank=True, null=True)
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Багет'
@@ -25,6 +56,52 @@ class Baguette(models.Model):
     def __str__(self):
         return f"{self.name} (ширина: {self.width} м, цена: {self.price} руб/м)"
 
+    def save(self, *args, **kwargs):
+        # Пустой штрихкод храним как NULL — уникальность проверяется только у заполненных
+        self.barcode = (self.barcode or '').strip() or None
+        self.name_norm = norm_search(self.name)
+        self.barcode_norm = norm_search(self.barcode)
+        # update_or_create() сохраняет только поля из defaults — добавляем производные
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = {'updated_at'}
+            if {'name', 'barcode'} & set(update_fields):
+                extra |= {'name_norm', 'barcode_norm'}
+            kwargs['update_fields'] = {*update_fields, *extra}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def by_barcode(cls, code):
+        """Багет по точному штрихкоду (сканер) — один запрос по уникальному индексу."""
+        code = (code or '').strip()
+        if not code:
+            return None
+        return cls.objects.filter(barcode=code).first()
+
+    @classmethod
+    def search(cls, query, limit=50):
+        """
+        Поиск по названию/штрихкоду без учёта пробелов, регистра и латиница/кириллица.
+        Сначала совпадения по началу строки (диапазон по индексу name_norm/barcode_norm),
+        затем — по подстроке, всего не больше limit.
+        """
+        q = norm_search(query)
+        if not q:
+            return []
+        upper = q + '\uffff'
+        found = list(
+            cls.objects.filter(
+                models.Q(name_norm__gte=q, name_norm__lt=upper)
+                | models.Q(barcode_norm__gte=q, barcode_norm__lt=upper)
+            )[:limit]
+        )
+        if len(found) < limit:
+            found += list(
+                cls.objects.filter(models.Q(name_norm__contains=q) | models.Q(barcode_norm__contains=q))
+                .exclude(pk__in=[b.pk for b in found])[:limit - len(found)]
+            )
+        return found
+
 
 class Glass(models.Model):
     """Модель стекла"""
@@ -38,6 +115,7 @@ class Glass(models.Model):
         help_text='Фактическое наличие на складе в кв.м. Списывается при каждом заказе.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Стекло'
@@ -60,6 +138,7 @@ class Backing(models.Model):
         help_text='Фактическое наличие на складе в штуках. Списывается при каждом заказе.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Подкладка'
@@ -82,6 +161,7 @@ class Hardware(models.Model):
         help_text='Фактическое наличие на складе в штуках. Списывается при каждом заказе.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Фурнитура'
@@ -105,6 +185,7 @@ class Podramnik(models.Model):
         help_text='Фактическое наличие на складе в штуках. Списывается при каждом заказе.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Подрамник'
@@ -128,6 +209,7 @@ class Passepartout(models.Model):
     )
     image = models.ImageField('Фото', upload_to='passepartout/', blank=True, null=True)
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Паспарту'
@@ -172,6 +254,7 @@ class Package(models.Model):
         help_text='Фактическое наличие на складе в штуках. Списывается при каждом заказе.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Упаковка'
@@ -194,6 +277,7 @@ class Molding(models.Model):
         help_text='Фактическое наличие на складе в метрах. Списывается при каждом заказе.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Молдинг'
@@ -216,6 +300,7 @@ class Trosik(models.Model):
         help_text='Фактическое наличие на складе в метрах. Списывается при каждом заказе.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Тросик'
@@ -238,6 +323,7 @@ class Podveski(models.Model):
         help_text='Фактическое наличие на складе в штуках. Списывается при каждом заказе.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
     
     class Meta:
         verbose_name = 'Подвески'
@@ -260,6 +346,7 @@ class Stretch(models.Model):
         help_text='Не используется: натяжка — работа мастера, материал приносит клиент, со склада не списывается.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = 'Натяжка'
@@ -282,6 +369,7 @@ class Foamboard(models.Model):
         help_text='Фактическое наличие на складе в кв.м. Списывается при каждом заказе.'
     )
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = 'Пенокартон'
@@ -327,6 +415,7 @@ class TechOperation(models.Model):
     size_to = models.DecimalField('До (см)', max_digits=7, decimal_places=2, null=True, blank=True)
     rate = models.DecimalField('Расценка', max_digits=10, decimal_places=2, null=True, blank=True)
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = 'Технологическая операция (работа)'
@@ -344,16 +433,25 @@ class TechOperation(models.Model):
         """
         Возвращает подходящую операцию по виду и размеру (макс. стороны в см):
         строка, где От <= size <= До (пустое От = 0, пустое До = ∞).
+        Поиск — по индексу в памяти (works.py), без запросов к базе.
         """
-        from decimal import Decimal
-        try:
-            size = Decimal(str(size))
-        except Exception:
-            return None
-        for op in cls.objects.filter(operation_type=operation_type):
-            lo = op.size_from if op.size_from is not None else Decimal('0')
-            hi = op.size_to if op.size_to is not None else Decimal('9999999')
-            if lo <= size <= hi:
-                return op
-        return None
+        from .works import find
+        return find(operation_type, size)
+
 
+class CatalogTombstone(models.Model):
+    """
+    Отметка об удалении записи справочника — чтобы /api/catalog/changes/
+    мог сообщить клиенту, какие строки убрать из его копии.
+    """
+    catalog = models.CharField('Справочник', max_length=32)
+    object_id = models.IntegerField('ID записи')
+    deleted_at = models.DateTimeField('Дата удаления', auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Удалённая запись справочника'
+        verbose_name_plural = 'Удалённые записи справочников'
+        ordering = ['deleted_at']
+
+    def __str__(self):
+        return f"{self.catalog} #{self.object_id}"
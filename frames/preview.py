@@ -0,0 +1,294 @@
+"""
+Предпросмотр рамы на сервере (Pillow) — та же композиция, что в FramePreview.jsx:
+картина, вокруг неё все паспарту, затем все рамы; каждый слой — четыре полоски
+с митрами 45°, полоска тайлится по длине и масштабируется по толщине.
+
+Готовые PNG хранятся на диске (settings.PREVIEW_CACHE_DIR) под ключом из параметров
+и имён файлов фото, поэтому замена фото багета даёт новую картинку. Параметры перед
+ключом приводятся к шагу (STEP, WIDTH_STEP) и к одному из размеров SIZES — иначе «40», «40.0» и
+«4E1» давали бы разные файлы; каталог ограничен settings.PREVIEW_CACHE_MAX_MB.
+"""
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from PIL import Image, ImageDraw
+
+from . import images
+from .models import Baguette, Passepartout
+
+DEFAULT_FRAME_WIDTH = 50
+PASSEPARTOUT_WIDTH = 25
+PASSEPARTOUT_COLOR = (245, 245, 220)   # #f5f5dc
+PLACEHOLDER_COLOR = (139, 92, 246)     # #8b5cf6 — багет, фото которого не загрузилось
+PHOTO_COLOR = (248, 249, 250)          # #f8f9fa — место картины
+
+DEFAULT_SIZE = 400
+# Размеры картинки, px: запрошенный округляется вверх до ближайшего
+SIZES = (100, 200, 400, 800, 1200, 2000)
+
+# Точность в ключе кэша: размеры картины — 0,1 см, ширины рам — как Baguette.width
+STEP = Decimal('0.1')
+WIDTH_STEP = Decimal('0.01')
+MAX_DIMENSION = Decimal('9999.9')
+
+# Проверка предела каталога — после каждых PRUNE_EVERY новых файлов
+PRUNE_EVERY = 50
+_written = 0
+_prune_lock = threading.Lock()
+
+# Ориентация полосок багета для митров — как ORIENT в FramePreview.jsx
+ORIENT = {
+    'top_flip_y': False,
+    'bottom_flip_y': True,
+    'right_flip_x': False,
+    'left_rotate': 270,
+}
+
+
+def _round(value):
+    # Math.round из JS (половина — вверх), а не банковское округление Python
+    return math.floor(value + 0.5)
+
+
+def _clamp(fw, w, h):
+    clamp_max = max(1, math.floor(min(w, h) / 2))
+    return max(1, min(fw, clamp_max))
+
+
+def _strip(texture, rotate=0, flip_x=False, flip_y=False):
+    """Как makeStripCanvas: отражение, затем поворот по часовой стрелке на rotate градусов."""
+    if flip_x:
+        texture = texture.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    if flip_y:
+        texture = texture.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+    rotate %= 360
+    if rotate == 90:
+        texture = texture.transpose(Image.Transpose.ROTATE_270)
+    elif rotate == 270:
+        texture = texture.transpose(Image.Transpose.ROTATE_90)
+    return texture
+
+
+def _draw_side(canvas, strip, polygon, horizontal, fixed, fw):
+    """Как drawLengthwiseTiledStrip: тайлы полоски вдоль стороны, обрезка по трапеции."""
+    sw, sh = strip.size
+    layer = Image.new('RGB', canvas.size)
+    if horizontal:
+        tile = strip.resize((sw, fw), Image.Resampling.LANCZOS)
+        for x in range(-sw, canvas.width + sw, sw):
+            layer.paste(tile, (x, fixed))
+    else:
+        tile = strip.resize((fw, sh), Image.Resampling.LANCZOS)
+        for y in range(-sh, canvas.height + sh, sh):
+            layer.paste(tile, (fixed, y))
+    mask = Image.new('L', canvas.size, 0)
+    ImageDraw.Draw(mask).polygon(polygon, fill=255)
+    canvas.paste(layer, mask=mask)
+
+
+def _draw_layer(canvas, rect, fw, texture=None, color=None):
+    """Как drawFrameLayer: слой шириной fw вокруг rect; возвращает внешний прямоугольник."""
+    x, y, w, h = rect
+    fw = _round(fw)
+    ox, oy = _round(x - fw), _round(y - fw)
+    ow, oh = _round(w + 2 * fw), _round(h + 2 * fw)
+    top = [(ox, oy), (ox + ow, oy), (ox + ow - fw, oy + fw), (ox + fw, oy + fw)]
+    bottom = [(ox + fw, oy + oh - fw), (ox + ow - fw, oy + oh - fw), (ox + ow, oy + oh), (ox, oy + oh)]
+    left = [(ox, oy), (ox + fw, oy + fw), (ox + fw, oy + oh - fw), (ox, oy + oh)]
+    right = [(ox + ow - fw, oy + fw), (ox + ow, oy), (ox + ow, oy + oh), (ox + ow - fw, oy + oh - fw)]
+    if texture is None:
+        draw = ImageDraw.Draw(canvas)
+        for polygon in (top, bottom, left, right):
+            draw.polygon(polygon, fill=color)
+    else:
+        _draw_side(canvas, _strip(texture, flip_y=ORIENT['top_flip_y']), top, True, oy, fw)
+        _draw_side(canvas, _strip(texture, flip_y=ORIENT['bottom_flip_y']), bottom, True, oy + oh - fw, fw)
+        _draw_side(canvas, _strip(texture, rotate=ORIENT['left_rotate']), left, False, ox, fw)
+        _draw_side(canvas, _strip(texture, rotate=90, flip_x=ORIENT['right_flip_x']), right, False, ox + ow - fw, fw)
+    return ox, oy, ow, oh
+
+
+def _texture(image):
+    """Текстура слоя: полоска из images.py (если есть), иначе оригинал; ошибка — заглушка."""
+    storage = image.storage
+    strip = images.derivative_name(image.name, 'strip', 'jpg')
+    name = strip if storage.exists(strip) else image.name
+    try:
+        with storage.open(name, 'rb') as f, Image.open(f) as img:
+            return img.convert('RGB')
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return Image.new('RGB', (64, DEFAULT_FRAME_WIDTH), PLACEHOLDER_COLOR)
+
+
+def render(layers, x1, x2, size=DEFAULT_SIZE):
+    """
+    Рисует предпросмотр. layers — от картины наружу:
+    [{'type': 'passepartout'|'baguette', 'image': ImageFieldFile или None, 'width': ...}].
+    Багеты без фото пропускаются, как в FramePreview.jsx.
+    """
+    layers = [l for l in layers if l['type'] == 'passepartout' or l['image']]
+    aspect = x1 / x2
+    if layers:
+        total_layers_fw = sum(
+            min(PASSEPARTOUT_WIDTH, 30) if l['type'] == 'passepartout' else DEFAULT_FRAME_WIDTH
+            for l in layers
+        )
+    else:
+        total_layers_fw = DEFAULT_FRAME_WIDTH * 2
+    available_w = size - total_layers_fw
+    available_h = size - total_layers_fw
+    if aspect > 1:
+        pw, ph = available_w, available_w / aspect
+        if ph > available_h:
+            pw, ph = available_h * aspect, available_h
+    else:
+        pw, ph = available_h * aspect, available_h
+        if pw > available_w:
+            pw, ph = available_w, available_w / aspect
+
+    widths = []
+    cur_w, cur_h = pw, ph
+    for layer in layers:
+        if layer['type'] == 'passepartout':
+            fw = _clamp(min(PASSEPARTOUT_WIDTH, 30), cur_w, cur_h)
+        else:
+            override = _round(float(layer['width']) * 5) if layer['width'] else None
+            fw = _clamp(override or DEFAULT_FRAME_WIDTH, cur_w, cur_h)
+        widths.append(fw)
+        cur_w += 2 * fw
+        cur_h += 2 * fw
+    total_inset = sum(widths) if widths else DEFAULT_FRAME_WIDTH
+
+    out_w, out_h = int(pw + 2 * total_inset), int(ph + 2 * total_inset)
+    canvas = Image.new('RGB', (out_w, out_h), (255, 255, 255))
+    photo_x = photo_y = _round(total_inset)
+    photo_w, photo_h = _round(pw), _round(ph)
+    ImageDraw.Draw(canvas).rectangle(
+        [photo_x, photo_y, photo_x + photo_w - 1, photo_y + photo_h - 1], fill=PHOTO_COLOR
+    )
+
+    rect = (photo_x, photo_y, photo_w, photo_h)
+    for layer, fw in zip(layers, widths):
+        if layer['type'] == 'passepartout' and not layer['image']:
+            rect = _draw_layer(canvas, rect, fw, color=PASSEPARTOUT_COLOR)
+        else:
+            fw = _clamp(fw, rect[2], rect[3])
+            rect = _draw_layer(canvas, rect, fw, texture=_texture(layer['image']))
+    if not layers:
+        d = DEFAULT_FRAME_WIDTH
+        ImageDraw.Draw(canvas).rectangle(
+            [photo_x - d, photo_y - d, photo_x + photo_w + d - 1, photo_y + photo_h + d - 1],
+            outline=PLACEHOLDER_COLOR, width=d,
+        )
+
+    scale = min(size / out_w, size / out_h, 1)
+    if scale < 1:
+        canvas = canvas.resize((max(1, _round(out_w * scale)), max(1, _round(out_h * scale))),
+                               Image.Resampling.LANCZOS)
+    return canvas
+
+
+def snap_size(size):
+    """Размер картинки из SIZES: ближайший не меньше запрошенного (больше максимума — максимум)."""
+    return next((s for s in SIZES if s >= size), SIZES[-1])
+
+
+def dimension(value, step=STEP):
+    """
+    Размер или ширина для предпросмотра: Decimal с шагом step, от step до MAX_DIMENSION.
+    Иначе ValueError.
+    """
+    value = Decimal(str(value)).quantize(step, rounding=ROUND_HALF_UP)
+    if not step <= value <= MAX_DIMENSION:
+        raise ValueError(f'Размеры и ширины должны быть от {step} до {MAX_DIMENSION}')
+    return value.normalize()
+
+
+def prune(directory=None, max_bytes=None):
+    """Удаляет давно не запрошенные картинки (по mtime), пока каталог не станет меньше предела."""
+    directory = directory or settings.PREVIEW_CACHE_DIR
+    if max_bytes is None:
+        max_bytes = settings.PREVIEW_CACHE_MAX_MB * 1024 * 1024
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _written_one():
+    global _written
+    with _prune_lock:
+        _written += 1
+        due = _written % PRUNE_EVERY == 0
+    if due:
+        prune()
+
+
+def preview_file(baguette_ids, x1, x2, passepartout_ids=(), widths=None, size=DEFAULT_SIZE):
+    """
+    Путь к PNG предпросмотра (из кэша на диске или только что нарисованного).
+    baguette_ids — рамы от внутренней к внешней; widths — ширины рам вместо Baguette.width
+    (None в списке — ширина из справочника). Неизвестный id или размер вне
+    допустимого (dimension) — ValueError.
+    """
+    x1, x2 = dimension(x1), dimension(x2)
+    size = snap_size(size)
+    baguettes = Baguette.objects.in_bulk(baguette_ids)
+    passepartouts = Passepartout.objects.in_bulk(passepartout_ids)
+    missing = [i for i in baguette_ids if i not in baguettes] + [i for i in passepartout_ids if i not in passepartouts]
+    if missing:
+        raise ValueError(f"Не найдены в справочнике: {', '.join(map(str, missing))}")
+
+    widths = list(widths or [])
+    layers = [
+        {'type': 'passepartout', 'id': pk, 'image': passepartouts[pk].image, 'width': None}
+        for pk in passepartout_ids
+    ]
+    for i, pk in enumerate(baguette_ids):
+        width = widths[i] if i < len(widths) and widths[i] is not None else baguettes[pk].width
+        width = dimension(width, WIDTH_STEP) if width else None
+        layers.append({'type': 'baguette', 'id': pk, 'image': baguettes[pk].image, 'width': width})
+
+    key_data = {
+        'layers': [(l['type'], l['id'], str(l['width']), l['image'].name or '') for l in layers],
+        'x1': str(x1), 'x2': str(x2), 'size': size,
+    }
+    key = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+    path = os.path.join(settings.PREVIEW_CACHE_DIR, key[:2], f'{key}.png')
+    if os.path.exists(path):
+        try:
+            os.utime(path)   # отметка запроса: prune() удаляет давно не запрошенные
+        except FileNotFoundError:
+            pass
+        else:
+            return path
+
+    image = render(layers, float(x1), float(x2), size)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Пишем во временный файл и переименовываем — параллельный запрос не увидит недописанный PNG
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.png')
+    with os.fdopen(fd, 'wb') as f:
+        image.save(f, 'PNG', optimize=True)
+    os.replace(tmp, path)
+    _written_one()
+    return path
@@ -0,0 +1,110 @@
+"""
+Снимок справочников для расчёта цены в памяти процесса.
+
+Калькуляторам от строки справочника нужны только название, ширина и цена, поэтому
+вместо моделей Django снимок хранит компактные записи со __slots__ — по словарю
+id → запись на каждый справочник. Читаются они values_list() (без создания
+моделей), по одному запросу на справочник.
+
+Снимок неизменяемый. При смене версии цен (catalog.get_price_version; остатки
+склада её не меняют) он строится заново целиком и подменяется одним присваиванием: расчёт, который уже
+получил снимок, досчитывается по нему, следующий получает новый.
+"""
+from types import MappingProxyType
+
+from . import catalog
+from .models import (
+    Baguette, Glass, Backing, Hardware, Podramnik, Package,
+    Molding, Trosik, Podveski, Passepartout, Stretch, Foamboard,
+)
+
+
+class Record:
+    """Строка справочника: pk, название и поля FIELDS. Только для чтения."""
+    __slots__ = ('pk', 'name')
+    FIELDS = ()
+
+    def __init__(self, pk, name, *values):
+        set_field = object.__setattr__
+        set_field(self, 'pk', pk)
+        set_field(self, 'name', name)
+        for field, value in zip(self.FIELDS, values):
+            set_field(self, field, value)
+
+    @property
+    def id(self):
+        return self.pk
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} из снимка справочников не изменяется')
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.pk}: {self.name}>'
+
+
+class PricedRecord(Record):
+    __slots__ = ('price',)
+    FIELDS = ('price',)
+
+
+class BaguetteRecord(Record):
+    __slots__ = ('width', 'price')
+    FIELDS = ('width', 'price')
+
+
+class SqmRecord(Record):
+    __slots__ = ('price_per_sqm',)
+    FIELDS = ('price_per_sqm',)
+
+
+class MeterRecord(Record):
+    __slots__ = ('price_per_meter',)
+    FIELDS = ('price_per_meter',)
+
+
+class UnitRecord(Record):
+    __slots__ = ('price_per_unit',)
+    FIELDS = ('price_per_unit',)
+
+
+# Вид справочника → (модель, класс записи)
+KINDS = {
+    'baguette': (Baguette, BaguetteRecord),
+    'glass': (Glass, SqmRecord),
+    'backing': (Backing, PricedRecord),
+    'hardware': (Hardware, UnitRecord),
+    'podramnik': (Podramnik, PricedRecord),
+    'package': (Package, PricedRecord),
+    'molding': (Molding, MeterRecord),
+    'trosik': (Trosik, MeterRecord),
+    'podveski': (Podveski, UnitRecord),
+    'passepartout': (Passepartout, PricedRecord),
+    'stretch': (Stretch, MeterRecord),
+    'foamboard': (Foamboard, PricedRecord),
+}
+
+_book = None   # (версия цен, {вид: {id: запись}})
+
+
+def build():
+    """Читает все справочники (по запросу на модель) в неизменяемые словари записей."""
+    return MappingProxyType({
+        kind: MappingProxyType({
+            pk: record(pk, *values)
+            for pk, *values in model.objects.values_list('pk', 'name', *record.FIELDS)
+        })
+        for kind, (model, record) in KINDS.items()
+    })
+
+
+def current():
+    """Снимок текущей версии цен; перестраивается, если цены в справочниках менялись."""
+    global _book
+    # Версия читается до построения: изменение во время build() даст новую версию,
+    # и следующий вызов перестроит снимок
+    version = catalog.get_price_version()
+    book = _book
+    if book is None or book[0] != version:
+        book = (version, build())
+        _book = book
+    return book[1]
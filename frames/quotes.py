@@ -0,0 +1,149 @@
+"""
+Кэш расчётов цены (calculate_price_api) в памяти процесса.
+
+Мастер переключает опции туда-обратно, и одна и та же конфигурация считается
+повторно. Ключ — хэш канонического вида данных запроса (ключи по алфавиту,
+числа как нормализованные Decimal, пустые *_id убраны) вместе с версией
+цен (catalog.get_price_version): любое изменение цен в справочниках даёт новые ключи, старые вытесняются
+по LRU или истекают по TTL.
+
+Ключ расчёта отдаётся клиенту как quote_token. По нему хранится черновик (Draft):
+данные запроса и части расчёта (QuoteParts), —
+мастер присылает только изменённые поля, и пересчитываются только затронутые части.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+
+from . import catalog
+
+
+def canonical(value):
+    """
+    Канонический вид данных расчёта: одинаковые по смыслу запросы дают одинаковый вид.
+    Строки не приводятся к числам — "2.0" и 2 калькуляторы обрабатывают по-разному.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted(
+            (str(k), canonical(v)) for k, v in value.items()
+            # Пустой id и отсутствующий для калькуляторов одно и то же
+            if not (str(k).endswith('_id') and v in (None, '', 0))
+        ))
+    if isinstance(value, (list, tuple)):
+        return ('list', tuple(canonical(v) for v in value))
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        try:
+            return Decimal(str(value)).normalize()
+        except InvalidOperation:
+            return repr(value)
+    return repr(value)
+
+
+def make_key(data, version=None):
+    if version is None:
+        version = catalog.get_price_version()
+    return hashlib.sha256(f'{version}:{canonical(data)!r}'.encode('utf-8')).hexdigest()
+
+
+class QuoteCache:
+    """LRU с ограничением размера и временем жизни записей; считает попадания и промахи."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()   # ключ → (срок годности, значение)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            return item is not None and item[0] > time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None,
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+            }
+
+
+cache = QuoteCache(settings.QUOTE_CACHE_SIZE, settings.QUOTE_CACHE_TTL)
+
+
+class Draft:
+    """Черновик расчёта по quote_token: данные и то, что можно переиспользовать при их изменении."""
+    __slots__ = ('data', 'version', 'parts')
+
+    def __init__(self, data, version, parts=None):
+        self.data = data
+        self.version = version   # части годятся только для этой версии цен
+        self.parts = parts or {}
+
+
+drafts = QuoteCache(settings.QUOTE_CACHE_SIZE, settings.QUOTE_CACHE_TTL)
+
+
+def merge(data, changes):
+    """Данные предыдущего расчёта с изменёнными полями; поле со значением None убирается."""
+    merged = dict(data)
+    for key, value in changes.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+
+def cached(data, compute, version=None, keep=None):
+    """
+    Результат compute() для данных data — из кэша или посчитанный и сохранённый.
+    keep(результат) решает, сохранять ли его (по умолчанию — всегда).
+    Возвращает (результат, попадание в кэш).
+    """
+    if not isinstance(data, (dict, list)):
+        return compute(), False
+    key = make_key(data, version)
+    result = cache.get(key)
+    if result is not None:
+        return result, True
+    result = compute()
+    if keep is None or keep(result):
+        cache.set(key, result)
+    return result, False
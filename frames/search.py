@@ -0,0 +1,126 @@
+"""
+Полнотекстовый поиск по всем справочникам: виртуальная таблица SQLite FTS5
+с токенизатором trigram (поиск по подстроке от 3 символов, ранжирование bm25).
+
+В таблице хранится только нормализованный текст строки справочника
+(norm_search/fold_search — без учёта регистра, пробелов и латиница/кириллица).
+Тип справочника и id объекта закодированы в rowid, поэтому обновление одной
+строки и фильтр по типам идут по первичному ключу, без сканирования таблицы.
+Синхронизация — сигналами post_save/post_delete (signals.py), полная
+перестройка — rebuild() / manage.py rebuild_search_index.
+"""
+from django.db import connection
+
+from . import catalog
+from .models import norm_search, fold_search
+
+TABLE = 'frames_search'
+
+# rowid = номер справочника * KIND_BASE + pk
+KIND_BASE = 10 ** 12
+KIND_NO = {name: i for i, name in enumerate(catalog.CATALOGS, start=1)}
+KIND_BY_NO = {i: name for name, i in KIND_NO.items()}
+KIND_BY_MODEL = {model: name for name, (model, _row) in catalog.CATALOGS.items()}
+
+
+def _document(obj):
+    name = getattr(obj, 'name', '')
+    barcode = getattr(obj, 'barcode', None)
+    parts = (norm_search(name), norm_search(barcode), fold_search(name))
+    return ' '.join(p for p in parts if p)
+
+
+def _rowid(kind, pk):
+    return KIND_NO[kind] * KIND_BASE + pk
+
+
+def index_object(obj):
+    """Добавляет/обновляет объект справочника в индексе."""
+    kind = KIND_BY_MODEL.get(type(obj))
+    if kind is None:
+        return
+    rowid = _rowid(kind, obj.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+        cursor.execute(f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)', [rowid, _document(obj)])
+
+
+def unindex_object(obj):
+    """Удаляет объект справочника из индекса."""
+    kind = KIND_BY_MODEL.get(type(obj))
+    if kind is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(kind, obj.pk)])
+
+
+def rebuild():
+    """Перестраивает индекс целиком."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for kind, (model, _row) in catalog.CATALOGS.items():
+            fields = ['pk', 'name'] + (['barcode'] if hasattr(model, 'barcode') else [])
+            rows = [
+                (_rowid(kind, obj.pk), _document(obj))
+                for obj in model.objects.only(*fields).iterator(chunk_size=1000)
+            ]
+            cursor.executemany(f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)', rows)
+
+
+def _phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _select(conditions, params, kinds, order, limit):
+    where = list(conditions)
+    params = list(params)
+    if kinds:
+        where.append('(' + ' OR '.join(['rowid BETWEEN %s AND %s'] * len(kinds)) + ')')
+        for kind in kinds:
+            params += [KIND_NO[kind] * KIND_BASE, (KIND_NO[kind] + 1) * KIND_BASE - 1]
+    sql = f"SELECT rowid FROM {TABLE} WHERE {' AND '.join(where)} ORDER BY {order} LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [limit])
+        return [r[0] for r in cursor.fetchall()]
+
+
+def _words_condition(words):
+    """
+    Все слова в любом порядке. Триграммы находят только подстроки от 3 символов,
+    более короткие слова проверяем instr() среди уже отобранных строк.
+    """
+    long_words = [w for w in words if len(w) >= 3]
+    conditions, params = [], []
+    if long_words:
+        conditions.append(f'{TABLE} MATCH %s')
+        params.append(' AND '.join(_phrase(w) for w in long_words))
+    for w in words:
+        if len(w) < 3:
+            conditions.append('instr(text, %s) > 0')
+            params.append(w)
+    return conditions, params, ('rank' if long_words else 'rowid')
+
+
+def search(query, kinds=None, limit=50):
+    """
+    Ищет query по справочникам kinds (по умолчанию — все).
+    Сначала совпадения запроса слитно («59 зол» → «м59золото»), затем строки,
+    содержащие все слова запроса в любом порядке.
+    Возвращает [(имя справочника, pk), ...] по убыванию релевантности.
+    """
+    joined = norm_search(query)
+    if not joined:
+        return []
+
+    conditions, params, order = _words_condition([joined])
+    rowids = _select(conditions, params, kinds, order, limit)
+
+    words = fold_search(query).split()
+    if len(words) > 1 and len(rowids) < limit:
+        seen = set(rowids)
+        conditions, params, order = _words_condition(words)
+        for rowid in _select(conditions, params, kinds, order, limit):
+            if rowid not in seen and len(rowids) < limit:
+                rowids.append(rowid)
+
+    return [(KIND_BY_NO[rowid // KIND_BASE], rowid % KIND_BASE) for rowid in rowids]
@@ -1,7 +1,14 @@
+import json
+from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, Optional, List, Any
-from django.db.models import F
-
+from types import MappingProxyType
+from typing import Dict, Optional, List, Any, Mapping, Tuple
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import catalog, fixed, pricebook, quotes
+from .works import find as find_operation, get_index as operation_index
 from .models import Baguette, Glass, Backing, Hardware, Podramnik, Package, Molding, Trosik, Podveski, Material, Passepartout, Stretch, TechOperation, Foamboard
 
 
@@ -14,22 +21,50 @@ def _dec(value, default='0') -> Decimal:
         return Decimal(default)
 
 
-def _okr(value) -> int:
-    """Аналог 1С Окр(): округление до целого (half-up)."""
-    return int(_dec(value).to_integral_value(rounding=ROUND_HALF_UP))
+# Минимальная стоимость материала для клиента (пороги из кода 1С, процедура Расчет()),
+# в копейках: если расчётная стоимость не больше порога — берётся порог (fixed.at_least).
+MIN_GLASS_PRICE = 30 * fixed.KOPECK
+MIN_BACKING_PRICE = 20 * fixed.KOPECK
+MIN_TROSIK_PRICE = 50 * fixed.KOPECK
+
+
+def _pk(value) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+class QuoteContext:
+    """
+    Справочники для одного расчёта: снимок справочников процесса (pricebook.py),
+    взятый один раз на весь расчёт, и индекс расценок работ. Строки — записи снимка
+    (pk, name и поля цены), поиск по id — обращение к словарю, без запросов к базе.
+    """
 
+    def __init__(self, book: Optional[Mapping[str, Mapping[int, Any]]] = None):
+        self._book = book if book is not None else pricebook.current()
+        self._operations = None
 
-# Минимальная стоимость материала для клиента (пороги из кода 1С, процедура Расчет()):
-# если расчётная стоимость меньше порога — берётся порог.
-MIN_GLASS_PRICE = Decimal('30')
-MIN_BACKING_PRICE = Decimal('20')
-MIN_TROSIK_PRICE = Decimal('50')
+    @property
+    def operations(self):
+        """Индекс расценок работ (works.py) — один на весь контекст."""
+        if self._operations is None:
+            self._operations = operation_index()
+        return self._operations
 
+    def get(self, kind: str, pk) -> Optional[Any]:
+        """Запись справочника или None."""
+        pk = _pk(pk)
+        return self._book[kind].get(pk) if pk is not None else None
 
-def _floor(value: Decimal, minimum: Decimal) -> Decimal:
-    """Порог снизу: возвращает minimum, если value <= minimum (как в 1С: >порог ? value : порог)."""
-    value = _dec(value)
-    return value if value > minimum else minimum
+    def require(self, kind: str, pk) -> Any:
+        """Как get(), но отсутствующая строка — DoesNotExist (как у objects.get())."""
+        obj = self.get(kind, pk)
+        if obj is None:
+            model = pricebook.KINDS[kind][0]
+            raise model.DoesNotExist(f'{model._meta.object_name} matching query does not exist.')
+        return obj
 
 
 class PriceCalculator:
@@ -103,27 +138,31 @@ class PriceCalculator:
         return (x1 + x2) * 2 / 100
 
     @staticmethod
-    def price_backings(backing_ids, area):
+    def price_backings(backing_ids, area: int, ctx: Optional[QuoteContext] = None,
+                       kopecks: Optional[Dict[str, int]] = None):
         """
-        Считает список подкладок по площади (у всех одна площадь рамы).
-        Возвращает (components, total). Ключи: backing, backing_2, backing_3...
+        Считает список подкладок по площади (у всех одна площадь рамы, в единицах fixed.AREA).
+        Возвращает (components, total в копейках). Ключи: backing, backing_2, backing_3...
         """
+        ctx = ctx or QuoteContext()
         comps = {}
-        total = Decimal('0')
+        total = 0
         for i, bid in enumerate(backing_ids or []):
             if not bid:
                 continue
-            backing = Backing.objects.filter(pk=bid).first()
+            backing = ctx.get('backing', bid)
             if not backing:
                 continue
-            price = _floor(backing.price * area, MIN_BACKING_PRICE)
+            price = fixed.at_least(fixed.by_area(area, fixed.kopecks(backing.price)), MIN_BACKING_PRICE)
             key = 'backing' if i == 0 else f'backing_{i + 1}'
             comps[key] = {
                 'name': backing.name,
-                'area': float(area),
+                'area': fixed.to_float(area, fixed.AREA),
                 'unit_price': float(backing.price),
-                'total_price': float(price),
+                'total_price': fixed.rub(price),
             }
+            if kopecks is not None:
+                kopecks[key] = price
             total += price
         return comps, total
 
@@ -151,156 +190,141 @@ class PriceCalculator:
         passepartout_width: Optional[Decimal] = None,
         stretch_id: Optional[int] = None,
         work_id: Optional[int] = None,
+        ctx: Optional[QuoteContext] = None,
+        kopecks: Optional[Dict[str, int]] = None,
     ) -> Dict[str, any]:
         """
         Расчет стоимости заказа (частичный или полный)
         Возвращает детализацию по каждому компоненту и итоговую сумму
         Все поля кроме x1 и x2 опциональны
+        kopecks — если передан, в него пишутся суммы компонентов в копейках (см. fixed.py)
         """
+        if ctx is None:
+            ctx = QuoteContext()
         
         result = {
             'components': {},
-            'total_price': Decimal('0')
+            'total_price': 0.0
         }
-        
+        if kopecks is None:
+            kopecks = {}
+        x1u, x2u = fixed.length(x1), fixed.length(x2)
+
+        def add(key, component, amount):
+            result['components'][key] = {**component, 'total_price': fixed.rub(amount)}
+            kopecks[key] = amount
+
         # Список выбранных типов материалов для автоматического добавления работ
         selected_material_types = []
         
         try:
-            # Багет
+            # Багет: расход = периметр + 8 × ширина
             if baguette_id:
-                baguette = Baguette.objects.get(pk=baguette_id)
-                baguette_calc = PriceCalculator.calculate_baguette_price(x1, x2, baguette)
-                result['components']['baguette'] = {
+                baguette = ctx.require('baguette', baguette_id)
+                baguette_length = 2 * (x1u + x2u) + 8 * fixed.meters(baguette.width)
+                add('baguette', {
                     'name': baguette.name,
-                    'quantity': float(baguette_calc['quantity']),
-                    'unit_price': float(baguette_calc['unit_price']),
-                    'total_price': float(baguette_calc['total_price'])
-                }
-                result['total_price'] += baguette_calc['total_price']
+                    'quantity': fixed.to_float(baguette_length, fixed.METER),
+                    'unit_price': float(baguette.price),
+                }, fixed.by_length(baguette_length, fixed.kopecks(baguette.price)))
                 selected_material_types.append('baguette')
             
             # Стекло (мин. MIN_GLASS_PRICE)
             if glass_id:
-                glass = Glass.objects.get(pk=glass_id)
-                glass_calc = PriceCalculator.calculate_glass_price(x1, x2, glass)
-                glass_total = _floor(glass_calc['total_price'], MIN_GLASS_PRICE)
-                result['components']['glass'] = {
+                glass = ctx.require('glass', glass_id)
+                area = x1u * x2u
+                add('glass', {
                     'name': glass.name,
-                    'area': float(glass_calc['area']),
-                    'unit_price': float(glass_calc['unit_price']),
-                    'total_price': float(glass_total)
-                }
-                result['total_price'] += glass_total
+                    'area': fixed.to_float(area, fixed.AREA),
+                    'unit_price': float(glass.price_per_sqm),
+                }, fixed.at_least(fixed.by_area(area, fixed.kopecks(glass.price_per_sqm)), MIN_GLASS_PRICE))
                 selected_material_types.append('glass')
 
             # Подкладка (одна или несколько; мин. MIN_BACKING_PRICE каждая)
             bids = list(backing_ids) if backing_ids else ([backing_id] if backing_id else [])
             if bids:
-                backing_area = PriceCalculator.calculate_glass_area(x1, x2)
-                comps, btotal = PriceCalculator.price_backings(bids, backing_area)
+                comps, _ = PriceCalculator.price_backings(bids, x1u * x2u, ctx, kopecks)
                 result['components'].update(comps)
-                result['total_price'] += btotal
                 selected_material_types.append('backing')
             
             # Фурнитура
             if hardware_id:
-                hardware = Hardware.objects.get(pk=hardware_id)
-                hardware_price = hardware.price_per_unit * hardware_quantity
-                result['components']['hardware'] = {
+                hardware = ctx.require('hardware', hardware_id)
+                add('hardware', {
                     'name': hardware.name,
                     'quantity': hardware_quantity,
                     'unit_price': float(hardware.price_per_unit),
-                    'total_price': float(hardware_price)
-                }
-                result['total_price'] += hardware_price
+                }, fixed.kopecks(hardware.price_per_unit) * int(hardware_quantity))
                 selected_material_types.append('hardware')
             
-            # Подрамник
+            # Подрамник: расход — периметр
             if podramnik_id:
-                podramnik = Podramnik.objects.get(pk=podramnik_id)
-                podramnik_qty = PriceCalculator.calculate_baguette_quantity(x1, x2, Decimal('0'))
-                podramnik_price = podramnik.price * podramnik_qty
-                result['components']['podramnik'] = {
+                podramnik = ctx.require('podramnik', podramnik_id)
+                podramnik_length = 2 * (x1u + x2u)
+                add('podramnik', {
                     'name': podramnik.name,
-                    'quantity': float(podramnik_qty),
+                    'quantity': fixed.to_float(podramnik_length, fixed.METER),
                     'unit_price': float(podramnik.price),
-                    'total_price': float(podramnik_price)
-                }
-                result['total_price'] += podramnik_price
+                }, fixed.by_length(podramnik_length, fixed.kopecks(podramnik.price)))
                 selected_material_types.append('podramnik')
             
             # Упаковка (цена × количество упаковки)
             if package_id:
-                package = Package.objects.get(pk=package_id)
+                package = ctx.require('package', package_id)
                 pkg_qty = int(package_quantity or 1) or 1
-                package_total = package.price * pkg_qty
-                result['components']['package'] = {
+                add('package', {
                     'name': package.name,
                     'quantity': pkg_qty,
                     'unit_price': float(package.price),
-                    'total_price': float(package_total)
-                }
-                result['total_price'] += package_total
+                }, fixed.kopecks(package.price) * pkg_qty)
             
             # Опциональные компоненты
             
             # Молдинг
             if molding_id and molding_consumption:
-                molding = Molding.objects.get(pk=molding_id)
-                molding_price = molding.price_per_meter * molding_consumption
-                result['components']['molding'] = {
+                molding = ctx.require('molding', molding_id)
+                add('molding', {
                     'name': molding.name,
                     'consumption': float(molding_consumption),
                     'unit_price': float(molding.price_per_meter),
-                    'total_price': float(molding_price)
-                }
-                result['total_price'] += molding_price
+                }, fixed.by_length(fixed.meters(molding_consumption), fixed.kopecks(molding.price_per_meter)))
                 selected_material_types.append('molding')
             
             # Тросик (мин. MIN_TROSIK_PRICE)
             if trosik_id and trosik_length:
-                trosik = Trosik.objects.get(pk=trosik_id)
+                trosik = ctx.require('trosik', trosik_id)
                 trosik_length_m = PriceCalculator.normalize_length_to_meters(trosik_length)
-                trosik_price = _floor(trosik.price_per_meter * trosik_length_m, MIN_TROSIK_PRICE)
-                result['components']['trosik'] = {
+                trosik_price = fixed.by_length(fixed.meters(trosik_length_m), fixed.kopecks(trosik.price_per_meter))
+                add('trosik', {
                     'name': trosik.name,
                     'length': float(trosik_length_m),
                     'unit_price': float(trosik.price_per_meter),
-                    'total_price': float(trosik_price)
-                }
-                result['total_price'] += trosik_price
+                }, fixed.at_least(trosik_price, MIN_TROSIK_PRICE))
                 selected_material_types.append('trosik')
             
             # Подвески
             if podveski_id and podveski_quantity:
-                podveski = Podveski.objects.get(pk=podveski_id)
-                podveski_price = podveski.price_per_unit * podveski_quantity
-                result['components']['podveski'] = {
+                podveski = ctx.require('podveski', podveski_id)
+                add('podveski', {
                     'name': podveski.name,
                     'quantity': podveski_quantity,
                     'unit_price': float(podveski.price_per_unit),
-                    'total_price': float(podveski_price)
-                }
-                result['total_price'] += podveski_price
+                }, fixed.kopecks(podveski.price_per_unit) * int(podveski_quantity))
                 selected_material_types.append('podveski')
             
             # Паспарту
             if passepartout_id:
-                passepartout = Passepartout.objects.get(pk=passepartout_id)
+                passepartout = ctx.require('passepartout', passepartout_id)
                 pp_length = passepartout_length if passepartout_length else x1
                 pp_width = passepartout_width if passepartout_width else x2
-                pp_area = PriceCalculator.calculate_glass_area(pp_length, pp_width)
-                pp_price = passepartout.price * pp_area
-                result['components']['passepartout'] = {
+                pp_area = fixed.length(pp_length) * fixed.length(pp_width)
+                add('passepartout', {
                     'name': passepartout.name,
                     'length': float(pp_length),
                     'width': float(pp_width),
-                    'area': float(pp_area),
+                    'area': fixed.to_float(pp_area, fixed.AREA),
                     'unit_price': float(passepartout.price),
-                    'total_price': float(pp_price)
-                }
-                result['total_price'] += pp_price
+                }, fixed.by_area(pp_area, fixed.kopecks(passepartout.price)))
                 selected_material_types.append('passepartout')
             
             # Натяжка НЕ материал: это работа мастера (тех.процесс), считается
@@ -314,14 +338,119 @@ class PriceCalculator:
             # входных данных, но на цену не влияют.
             _ = (work_id, selected_material_types)
 
-            result['total_price'] = float(result['total_price'])
-            
         except Exception as e:
             result['error'] = str(e)
-        
+
+        result['total_price'] = fixed.rub(sum(kopecks[key] for key in result['components']))
         return result
 
 
+class BaguettePriceList:
+    """
+    Цена одного размера во всех багетах сразу — для подбора багета «в бюджет».
+    Ширины и цены багетов держатся в памяти процесса колонками (кортежами),
+    построенными по снимку справочников (pricebook.py) и вместе с ним обновляемыми;
+    расчёт — один проход по колонкам, без запросов на каждый багет.
+    Цена = багет (как calculate_baguette_price) + работа «Изготовление рамы»
+    + выбранные стекло, подкладки и паспарту (они одинаковы для всех багетов).
+    """
+
+    _columns = None   # (снимок справочников, ids, names, widths, prices)
+
+    @classmethod
+    def columns(cls):
+        """ids, названия, ширины (единицы fixed.METER) и цены за метр (копейки)."""
+        book = pricebook.current()
+        columns = cls._columns
+        if columns is None or columns[0] is not book:
+            rows = [
+                (b.pk, b.name, fixed.meters(b.width), fixed.kopecks(b.price))
+                for b in book['baguette'].values()
+            ]
+            columns = (book, *(zip(*rows) if rows else ((), (), (), ())))
+            cls._columns = columns
+        return columns[1:]
+
+    @staticmethod
+    def common_components(x1: Decimal, x2: Decimal, glass_id=None, backing_ids=None,
+                          passepartout_id=None, ctx: Optional[QuoteContext] = None):
+        """Компоненты, не зависящие от багета: (components, total в копейках)."""
+        ctx = ctx or QuoteContext()
+        area = fixed.length(x1) * fixed.length(x2)
+        comps, total = {}, 0
+
+        op = find_operation('rama', max(x1, x2), ctx.operations)
+        if op and op.rate is not None:
+            comps['work'] = {'name': op.name, 'total_price': float(op.rate)}
+            total += fixed.kopecks(op.rate)
+        if glass_id:
+            glass = ctx.require('glass', glass_id)
+            glass_total = fixed.at_least(fixed.by_area(area, fixed.kopecks(glass.price_per_sqm)), MIN_GLASS_PRICE)
+            comps['glass'] = {
+                'name': glass.name,
+                'area': fixed.to_float(area, fixed.AREA),
+                'unit_price': float(glass.price_per_sqm),
+                'total_price': fixed.rub(glass_total),
+            }
+            total += glass_total
+        if backing_ids:
+            b_comps, b_total = PriceCalculator.price_backings(backing_ids, area, ctx)
+            comps.update(b_comps)
+            total += b_total
+        if passepartout_id:
+            passepartout = ctx.require('passepartout', passepartout_id)
+            pp_total = fixed.by_area(area, fixed.kopecks(passepartout.price))
+            comps['passepartout'] = {
+                'name': passepartout.name,
+                'area': fixed.to_float(area, fixed.AREA),
+                'unit_price': float(passepartout.price),
+                'total_price': fixed.rub(pp_total),
+            }
+            total += pp_total
+        return comps, total
+
+    @classmethod
+    def compute(cls, x1: Decimal, x2: Decimal, glass_id=None, backing_ids=None, passepartout_id=None,
+                min_price: Optional[Decimal] = None, max_price: Optional[Decimal] = None,
+                descending: bool = False) -> Dict[str, Any]:
+        """
+        Все багеты с ценой для размера x1×x2, отсортированные по итоговой цене
+        (при равной цене — по названию) и отфильтрованные по [min_price, max_price].
+        """
+        comps, common = cls.common_components(x1, x2, glass_id, backing_ids, passepartout_id)
+        ids, names, widths, prices = cls.columns()
+
+        # Как calculate_total_price: расход = периметр + 8 × ширина, всё в целых единицах
+        perimeter = 2 * (fixed.length(x1) + fixed.length(x2))
+        lengths = [perimeter + 8 * w for w in widths]
+        baguette_totals = [fixed.by_length(q, p) for q, p in zip(lengths, prices)]
+        totals = [t + common for t in baguette_totals]
+
+        low = fixed.kopecks(min_price) if min_price is not None else None
+        high = fixed.kopecks(max_price) if max_price is not None else None
+        order = [
+            i for i in range(len(ids))
+            if (low is None or totals[i] >= low) and (high is None or totals[i] <= high)
+        ]
+        order.sort(key=lambda i: names[i])
+        order.sort(key=lambda i: totals[i], reverse=descending)
+        return {
+            'x1': float(x1),
+            'x2': float(x2),
+            'components': comps,
+            'common_price': fixed.rub(common),
+            'results': [{
+                'id': ids[i],
+                'name': names[i],
+                'width': fixed.to_float(widths[i], fixed.METER),
+                'unit_price': fixed.rub(prices[i]),
+                'quantity': fixed.to_float(lengths[i], fixed.METER),
+                'baguette_price': fixed.rub(baguette_totals[i]),
+                'total_price': fixed.rub(totals[i]),
+            } for i in order],
+        }
+
+
 class OrderExtrasCalculator:
     """
     Автосложность (входит в цену) и технологические операции / «работы» (справочно).
@@ -333,7 +462,8 @@ class OrderExtrasCalculator:
     """
 
     @staticmethod
-    def _frame_infos(frames: List[Dict], gx1: Decimal, gx2: Decimal, data: Dict) -> List[Dict]:
+    def _frame_infos(frames: List[Dict], gx1: Decimal, gx2: Decimal, data: Dict,
+                     ctx: QuoteContext) -> List[Dict]:
         """
         Рамы задаются явно (мастер добавляет их кнопкой «Добавить раму»).
         Каждая добавленная рама — это багетная рама (багет опционален), поэтому
@@ -355,16 +485,17 @@ class OrderExtrasCalculator:
 
         infos = []
         for f in raw:
-            baguette = Baguette.objects.filter(pk=f['baguette_id']).first() if f['baguette_id'] else None
+            baguette = ctx.get('baguette', f['baguette_id'])
             width = baguette.width if baguette else Decimal('0')
             infos.append({'x1': f['x1'], 'x2': f['x2'], 'width': width, 'max': max(f['x1'], f['x2'])})
         return infos
 
     @classmethod
-    def compute(cls, *, frames, passepartouts, x1, x2, data) -> Dict[str, Any]:
+    def compute(cls, *, frames, passepartouts, x1, x2, data, ctx: Optional[QuoteContext] = None) -> Dict[str, Any]:
+        ctx = ctx or QuoteContext()
         gx1, gx2 = _dec(x1), _dec(x2)
         q = int(data.get('quantity') or 1) or 1
-        infos = cls._frame_infos(frames, gx1, gx2, data)
+        infos = cls._frame_infos(frames, gx1, gx2, data, ctx)
         n = len(infos)
 
         # Опорный размер рамы 1 (макс(бд1, бш1)) — для сложности и подбора работ паспарту/стекла/подкладки.
@@ -440,25 +571,30 @@ class OrderExtrasCalculator:
 
         # ---------- Работы (справочно) ----------
         works: List[Dict] = []
+        operations = ctx.operations   # расценки — из индекса в памяти, без запросов
+
+        total_rate = 0   # копейки
 
         def add_work(op_type, size, label=None, rate_override=None):
+            nonlocal total_rate
             if rate_override is not None:
-                rate = _dec(rate_override)
+                rate = rate_override   # уже в копейках
                 name = label or op_type
             else:
-                op = TechOperation.find_by_size(op_type, size)
+                op = find_operation(op_type, size, operations)
                 if not op or op.rate is None:
                     return
-                rate = op.rate
+                rate = fixed.kopecks(op.rate)
                 name = label or op.name
             # Работы считаются на одно изделие; количество копий применяется к итогу
             works.append({
                 'operation_type': op_type,
                 'name': name,
-                'rate': float(rate),
+                'rate': fixed.rub(rate),
                 'quantity': 1,
-                'total': float(rate),
+                'total': fixed.rub(rate),
             })
+            total_rate += rate
 
         # Рама: тип работы = число рам (1→рама, 2→двойная, 3→тройная), размер внешней рамы
         if n == 1:
@@ -494,27 +630,25 @@ class OrderExtrasCalculator:
         # Расценка за метр берётся из справочника натяжек (у каждого материала своя),
         # материал приносит клиент — со склада ничего не списывается.
         if data.get('stretch_id'):
-            stretch = Stretch.objects.filter(pk=data['stretch_id']).first()
+            stretch = ctx.get('stretch', data['stretch_id'])
             if stretch:
-                perimeter_m = PriceCalculator.calculate_perimeter_meters(b1x, b1y)
+                perimeter = 2 * (fixed.length(b1x) + fixed.length(b1y))
                 add_work(
                     'stretch', 0,
                     label=f'Натяжка ({stretch.name})',
-                    rate_override=perimeter_m * stretch.price_per_meter,
+                    rate_override=fixed.by_length(perimeter, fixed.kopecks(stretch.price_per_meter)),
                 )
 
         # Упаковка: расценка = Окр(цена_упаковки / 2). Количество упаковки на эту
         # работу не влияет — оно умножает только стоимость самих пакетов (материал).
         if data.get('package_id'):
-            package = Package.objects.filter(pk=data['package_id']).first()
+            package = ctx.get('package', data['package_id'])
             if package:
-                add_work('package', 0, label='Упаковка', rate_override=_okr(package.price / 2))
+                add_work('package', 0, label='Упаковка', rate_override=fixed.okr(fixed.kopecks(package.price), 2))
 
         # Авто-сложность отключена: сложность задаётся вручную полем manual_complexity
         # на заказе. (Расчёт compR/compP/compMount выше сохранён на случай возврата.)
 
-        total_rate = sum(w['total'] for w in works)
-
         return {
             'manual_complexity': float(_dec(data.get('manual_complexity'))),
             'complexity': {
@@ -525,73 +659,11 @@ class OrderExtrasCalculator:
             },
             'works': {
                 'items': works,
-                'total_rate': float(total_rate),
-                'work_time_hours': round(total_rate / 100, 2),
+                'total_rate': fixed.rub(total_rate),
+                'work_time_hours': round(fixed.rub(total_rate) / 100, 2),
             },
         }
 
-    @classmethod
-    def for_order(cls, order, frames: Optional[List[Dict]] = None) -> Dict[str, Any]:
-        """Считает сложность и работы для сохранённого заказа (для квитанции/детализации)."""
-        frames = frames or []
-        extras_frames = []
-        for f in frames:
-            if isinstance(f, dict):
-                extras_frames.append({
-                    'baguette_id': f.get('baguette_id'),
-                    'x1': f.get('x1') or order.x1,
-                    'x2': f.get('x2') or order.x2,
-                })
-        # Легаси: одиночный заказ без массива рам, но с багетом
-        if not extras_frames and order.baguette_id:
-            extras_frames = [{'baguette_id': order.baguette_id, 'x1': order.x1, 'x2': order.x2}]
-
-        pps = []
-        if frames and isinstance(frames[0], dict):
-            embedded = frames[0].get('passepartouts')
-            if isinstance(embedded, list):
-                pps.extend([p for p in embedded if isinstance(p, dict) and p.get('passepartout_id')])
-        for f in frames:
-            if isinstance(f, dict) and f.get('passepartout_id'):
-                pps.append({
-                    'passepartout_id': f.get('passepartout_id'),
-                    'passepartout_length': f.get('passepartout_length'),
-                    'passepartout_width': f.get('passepartout_width'),
-                })
-        if not pps and order.passepartout_id:
-            pps.append({
-                'passepartout_id': order.passepartout_id,
-                'passepartout_length': order.passepartout_length,
-                'passepartout_width': order.passepartout_width,
-            })
-
-        # Подкладки: список из frames_data (embedded), иначе одна из заказа
-        backings = []
-        if frames and isinstance(frames[0], dict):
-            embedded_b = frames[0].get('backings')
-            if isinstance(embedded_b, list):
-                backings = [(b.get('backing_id') if isinstance(b, dict) else b)
-                            for b in embedded_b if b]
-        if not backings and order.backing_id:
-            backings = [order.backing_id]
-
-        data = {
-            'baguette_id': order.baguette_id,
-            'glass_id': order.glass_id,
-            'backing_id': order.backing_id,
-            'backing_ids': backings,
-            'hardware_id': order.hardware_id,
-            'hardware_quantity': order.hardware_quantity,
-            'podramnik_id': order.podramnik_id,
-            'molding_id': order.molding_id,
-            'package_id': order.package_id,
-            'package_quantity': order.package_quantity,
-            'stretch_id': order.stretch_id,
-            'manual_complexity': order.manual_complexity,
-            'quantity': 1,
-        }
-        return cls.compute(frames=extras_frames, passepartouts=pps, x1=order.x1, x2=order.x2, data=data)
-
     @staticmethod
     def apply(calculation: Dict, extras: Dict, quantity: int = 1) -> Dict:
         """
@@ -601,50 +673,606 @@ class OrderExtrasCalculator:
         в цену не добавляется (иначе было бы задвоение).
         """
         works = extras['works']
-        manual = extras.get('manual_complexity') or 0
         qty = int(quantity or 1) or 1
-        materials_per_copy = float(calculation.get('total_price', 0))
+        # Суммы — в копейках (fixed.py): строки детализации и итог сходятся без ошибок float
+        materials_per_copy = fixed.kopecks(calculation.get('total_price', 0))
         # Количество копий умножает расход/стоимость каждого материала и работы,
         # чтобы строки детализации сходились с общим итогом.
         if qty > 1:
             for comp in calculation.get('components', {}).values():
-                for k in ('total_price', 'area', 'quantity', 'consumption', 'length'):
+                v = comp.get('total_price')
+                if isinstance(v, (int, float)):
+                    comp['total_price'] = fixed.rub(fixed.kopecks(v) * qty)
+                for k in ('area', 'quantity', 'consumption', 'length'):
                     v = comp.get(k)
                     if isinstance(v, (int, float)):
                         comp[k] = v * qty
             for w in works.get('items', []):
-                w['total'] = w['total'] * qty
-            works['total_rate'] = works['total_rate'] * qty
+                w['total'] = fixed.rub(fixed.kopecks(w['total']) * qty)
+            works['total_rate'] = fixed.rub(fixed.kopecks(works['total_rate']) * qty)
             works['work_time_hours'] = round(works['work_time_hours'] * qty, 2)
-        manual_total = manual * qty
+        manual_total = fixed.kopecks(extras.get('manual_complexity') or 0) * qty
         if manual_total > 0:
             calculation.setdefault('components', {})['manual_complexity'] = {
-                'name': 'Сложность', 'total_price': manual_total
+                'name': 'Сложность', 'total_price': fixed.rub(manual_total)
             }
-        calculation['total_price'] = materials_per_copy * qty + works['total_rate'] + manual_total
+        calculation['total_price'] = fixed.rub(
+            materials_per_copy * qty + fixed.kopecks(works['total_rate']) + manual_total
+        )
         calculation['works'] = works
         calculation['quantity'] = qty
         return calculation
 
 
+def _collect_backing_ids(data, frames):
+    """Собирает id подкладок (несколько) из запроса (список backings или первой рамы)."""
+    ids = []
+
+    def _add(seq):
+        if isinstance(seq, list):
+            for b in seq:
+                bid = b.get('backing_id') if isinstance(b, dict) else b
+                if bid:
+                    ids.append(bid)
+
+    _add(data.get('backings'))
+    if frames and isinstance(frames[0], dict):
+        _add(frames[0].get('backings'))
+    if not ids and data.get('backing_id'):
+        ids.append(data.get('backing_id'))
+
+    seen, out = set(), []
+    for i in ids:
+        if i not in seen:
+            seen.add(i)
+            out.append(i)
+    return out
+
+
+def _collect_passepartouts(passepartouts_data, frames):
+    """Собирает список паспарту из нового формата и legacy-данных рам."""
+    items = []
+
+    if isinstance(passepartouts_data, list):
+        for pp in passepartouts_data:
+            if isinstance(pp, dict) and pp.get('passepartout_id'):
+                items.append(pp)
+
+    if frames:
+        # Новый формат может прийти внутри первой рамы
+        embedded = frames[0].get('passepartouts') if isinstance(frames[0], dict) else None
+        if isinstance(embedded, list):
+            for pp in embedded:
+                if isinstance(pp, dict) and pp.get('passepartout_id'):
+                    items.append(pp)
+
+        # Legacy: паспарту было привязано к каждой раме
+        for frame in frames:
+            if isinstance(frame, dict) and frame.get('passepartout_id'):
+                items.append({
+                    'passepartout_id': frame.get('passepartout_id'),
+                    'passepartout_length': frame.get('passepartout_length'),
+                    'passepartout_width': frame.get('passepartout_width'),
+                })
+
+    return items
+
+
+
+def _freeze(value):
+    """Словари → MappingProxyType, списки → кортежи (вложенно) — данные Quote только для чтения."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    """Обратно к обычным dict/list — изменяемая копия для ответа API."""
+    if isinstance(value, (MappingProxyType, dict)):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+@dataclass(frozen=True)
+class Quote:
+    """
+    Готовый расчёт цены: материалы и работы на одну копию, количество копий,
+    разбивка по рамам и итог. Неизменяемый — один и тот же расчёт читают
+    calculate_price_api, создание заказа, детализация и обе квитанции.
+    """
+    base: Mapping          # расчёт материалов (components, total_price) на одну копию
+    extras: Mapping        # OrderExtrasCalculator.compute: работы, сложность — на одну копию
+    frames: Tuple          # по рамам: index, baguette_id, x1, x2, baguette (или None)
+    quantity: int
+    total_price: float     # итог на все копии (как в calculation())
+    # Заполняются только у расчёта, прочитанного из снимка заказа (from_snapshot)
+    catalog_version: Optional[int] = None
+    priced_at: Optional[str] = None
+
+    SNAPSHOT_FORMAT = 1
+
+    @property
+    def components(self) -> Mapping:
+        return self.base['components']
+
+    @property
+    def materials_total(self) -> float:
+        """Материалы на одну копию."""
+        return float(self.base.get('total_price', 0))
+
+    @property
+    def works(self) -> Mapping:
+        return self.extras['works']
+
+    @property
+    def manual_complexity(self):
+        return self.extras.get('manual_complexity') or 0
+
+    def calculation(self) -> Dict[str, Any]:
+        """Расчёт в формате ответа calculate_price_api (новый изменяемый словарь)."""
+        return OrderExtrasCalculator.apply(_thaw(self.base), _thaw(self.extras), quantity=self.quantity)
+
+    def snapshot(self) -> str:
+        """JSON для Order.price_snapshot: расчёт, версия справочников и время расчёта."""
+        return json.dumps({
+            'format': self.SNAPSHOT_FORMAT,
+            'catalog_version': catalog.get_version(),
+            'priced_at': timezone.now().isoformat(),
+            'base': _thaw(self.base),
+            'extras': _thaw(self.extras),
+            'frames': _thaw(self.frames),
+            'quantity': self.quantity,
+            'total_price': self.total_price,
+        }, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_snapshot(cls, raw: Optional[str]) -> Optional['Quote']:
+        """Quote из Order.price_snapshot; None — снимка нет или он в другом формате."""
+        if not raw:
+            return None
+        try:
+            data = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            return None
+        if not isinstance(data, dict) or data.get('format') != cls.SNAPSHOT_FORMAT:
+            return None
+        return cls(
+            base=_freeze(data['base']),
+            extras=_freeze(data['extras']),
+            frames=_freeze(data['frames']),
+            quantity=data['quantity'],
+            total_price=data['total_price'],
+            catalog_version=data.get('catalog_version'),
+            priced_at=data.get('priced_at'),
+        )
+
+
+class QuoteParts:
+    """
+    Части расчёта (рамы, паспарту, стекло, подкладки, подрамник, прочие материалы,
+    работы), запомненные по своим входным данным. При пересчёте по изменённым полям
+    (calculate_price_api с base_token) части предыдущего расчёта с теми же входами
+    берутся готовыми. Готовые части не изменяются.
+    """
+
+    def __init__(self, previous: Optional[Dict] = None):
+        self.previous = previous or {}
+        self.current: Dict = {}
+        self.reused = 0
+
+    def get(self, name: str, inputs, compute):
+        key = (name, quotes.canonical(inputs))
+        if key not in self.current:
+            if key in self.previous:
+                self.current[key] = self.previous[key]
+                self.reused += 1
+            else:
+                self.current[key] = compute()
+        return self.current[key]
+
+
+class QuoteEngine:
+    """
+    Единый расчёт цены заказа: рамы, паспарту, стекло, подкладки, подрамник,
+    прочие материалы и работы — за один проход по данным, справочники из QuoteContext.
+    Данные — в формате calculate_price_api; сохранённый заказ приводится к ним в order_payload().
+    """
+
+    # Поля «прочих материалов» (считаются по первой раме одним calculate_total_price)
+    OTHER_FIELDS = (
+        'hardware_id', 'hardware_quantity', 'package_id', 'package_quantity',
+        'molding_id', 'molding_consumption', 'trosik_id', 'trosik_length',
+        'podveski_id', 'podveski_quantity',
+    )
+    # Поля заказа, не влияющие на цену
+    NON_PRICING_FIELDS = (
+        'customer_name', 'customer_phone', 'comment', 'payment_method',
+        'advance_payment', 'fulfillment_date',
+    )
+
+    @staticmethod
+    def _frame_entry(idx, baguette_id, x1, x2, component, ctx):
+        baguette = ctx.get('baguette', baguette_id) if component else None
+        return {
+            'index': idx + 1,
+            'baguette_id': baguette_id,
+            'x1': float(x1),
+            'x2': float(x2),
+            'baguette': {
+                'id': baguette.pk,
+                'name': baguette.name,
+                'width': float(baguette.width),
+                **component,
+            } if baguette else None,
+        }
+
+    @staticmethod
+    def _passepartout_components(passepartouts, x1, x2, ctx):
+        """Независимые паспарту (passepartout_1, ...): компоненты и сумма в копейках."""
+        comps, total = {}, 0
+        for pp_idx, pp_data in enumerate(passepartouts):
+            pp_id = pp_data.get('passepartout_id')
+            if not pp_id:
+                continue
+            passepartout = ctx.require('passepartout', pp_id)
+            pp_length = Decimal(str(pp_data.get('passepartout_length'))) if pp_data.get('passepartout_length') else x1
+            pp_width = Decimal(str(pp_data.get('passepartout_width'))) if pp_data.get('passepartout_width') else x2
+            pp_area = fixed.length(pp_length) * fixed.length(pp_width)
+            pp_price = fixed.by_area(pp_area, fixed.kopecks(passepartout.price))
+            comps[f'passepartout_{pp_idx + 1}'] = {
+                'name': f'{passepartout.name} (Паспарту {pp_idx + 1})',
+                'length': float(pp_length),
+                'width': float(pp_width),
+                'area': fixed.to_float(pp_area, fixed.AREA),
+                'unit_price': float(passepartout.price),
+                'total_price': fixed.rub(pp_price),
+            }
+            total += pp_price
+        return comps, total
+
+    @classmethod
+    def _frame_part(cls, idx, frame, x1, x2, ctx):
+        """
+        Рама idx: (размер для стекла/подкладки или None, компоненты, сумма в копейках, строка frames).
+        Багет — по собственному размеру рамы (иначе — глобальные x1, x2).
+        """
+        if frame.get('baguette_id'):
+            fx1 = Decimal(str(frame.get('x1', x1))) if frame.get('x1') else x1
+            fx2 = Decimal(str(frame.get('x2', x2))) if frame.get('x2') else x2
+            # Площади для стекла/подкладки — только по корректным размерам рам
+            size = None
+            if fx1 and fx2 and fx1 > 0 and fx2 > 0:
+                size = (fx1, fx2)
+            else:
+                fx1, fx2 = x1, x2
+            frame_kopecks = {}
+            frame_calculation = PriceCalculator.calculate_total_price(
+                x1=fx1,
+                x2=fx2,
+                baguette_id=frame.get('baguette_id'),
+                work_id=frame.get('work_id'),
+                ctx=ctx,
+                kopecks=frame_kopecks,
+            )
+            frame_num = idx + 1
+            components, total = {}, 0
+            for key, value in frame_calculation.get('components', {}).items():
+                if key in ['baguette', 'passepartout', 'work']:
+                    components[f'{key}_frame{frame_num}'] = {
+                        **value,
+                        'name': f"{value.get('name', key)} (Рама {frame_num})"
+                    }
+                    total += frame_kopecks[key]
+            entry = cls._frame_entry(
+                idx, frame.get('baguette_id'), fx1, fx2, frame_calculation['components'].get('baguette'), ctx
+            )
+            return size, components, total, entry
+        if isinstance(frame, dict):
+            # Рама без багета — в цене только работа (OrderExtrasCalculator)
+            fx1, fx2 = _dec(frame.get('x1')) or x1, _dec(frame.get('x2')) or x2
+            if fx1 <= 0 or fx2 <= 0:
+                fx1, fx2 = x1, x2
+            return None, {}, 0, cls._frame_entry(idx, None, fx1, fx2, None, ctx)
+        return None, {}, 0, None
+
+    @staticmethod
+    def _glass_part(glass_id, frame_sizes, ctx):
+        """Стекло — по суммарной площади рам: (компоненты, сумма в копейках)."""
+        total_glass_area = sum(fixed.length(fx1) * fixed.length(fx2) for fx1, fx2 in frame_sizes)
+        if not glass_id or total_glass_area <= 0:
+            return {}, 0
+        glass = ctx.require('glass', glass_id)
+        glass_total = fixed.at_least(
+            fixed.by_area(total_glass_area, fixed.kopecks(glass.price_per_sqm)), MIN_GLASS_PRICE
+        )
+        return {'glass': {
+            'name': glass.name,
+            'area': fixed.to_float(total_glass_area, fixed.AREA),
+            'unit_price': float(glass.price_per_sqm),
+            'total_price': fixed.rub(glass_total),
+        }}, glass_total
+
+    @staticmethod
+    def _backings_part(backing_ids, pic_x1, pic_x2, ctx):
+        """Подкладки — «на картину» (pic_x1, pic_x2 в единицах fixed.LENGTH)."""
+        pic_area = pic_x1 * pic_x2
+        if not backing_ids or pic_area <= 0:
+            return {}, 0
+        return PriceCalculator.price_backings(backing_ids, pic_area, ctx)
+
+    @staticmethod
+    def _podramnik_part(podramnik_id, pic_x1, pic_x2, ctx):
+        """Подрамник — «на картину», по периметру."""
+        if not podramnik_id:
+            return {}, 0
+        podramnik = ctx.require('podramnik', podramnik_id)
+        podramnik_length = 2 * (pic_x1 + pic_x2)
+        podramnik_price = fixed.by_length(podramnik_length, fixed.kopecks(podramnik.price))
+        return {'podramnik': {
+            'name': podramnik.name,
+            'quantity': fixed.to_float(podramnik_length, fixed.METER),
+            'unit_price': float(podramnik.price),
+            'total_price': fixed.rub(podramnik_price),
+        }}, podramnik_price
+
+    @staticmethod
+    def _other_part(data, eff_x1, eff_x2, ctx):
+        """Фурнитура, упаковка, молдинг, тросик, подвески — по первой раме."""
+        other_kopecks = {}
+        other_calculation = PriceCalculator.calculate_total_price(
+            x1=eff_x1,
+            x2=eff_x2,
+            glass_id=None,
+            backing_id=None,
+            hardware_id=data.get('hardware_id'),
+            hardware_quantity=data.get('hardware_quantity', 1),
+            package_id=data.get('package_id'),
+            package_quantity=data.get('package_quantity', 1),
+            molding_id=data.get('molding_id'),
+            molding_consumption=Decimal(str(data.get('molding_consumption'))) if data.get('molding_consumption') else None,
+            trosik_id=data.get('trosik_id'),
+            trosik_length=Decimal(str(data.get('trosik_length'))) if data.get('trosik_length') else None,
+            podveski_id=data.get('podveski_id'),
+            podveski_quantity=data.get('podveski_quantity'),
+            stretch_id=None,
+            ctx=ctx,
+            kopecks=other_kopecks,
+        )
+        components = other_calculation.get('components', {})
+        return components, sum(other_kopecks[key] for key in components)
+
+    @classmethod
+    def quote(cls, data: Dict, ctx: Optional[QuoteContext] = None,
+              parts: Optional[QuoteParts] = None) -> Quote:
+        """
+        Расчёт по данным запроса (размеры не проверяются — это делает вызывающий).
+        parts — части предыдущего расчёта (пересчёт по изменённым полям), см. QuoteParts.
+        """
+        x1 = Decimal(str(data.get('x1', 0))) if data.get('x1') else Decimal('0')
+        x2 = Decimal(str(data.get('x2', 0))) if data.get('x2') else Decimal('0')
+        frames = data.get('frames', [])
+        passepartouts = _collect_passepartouts(data.get('passepartouts', []), frames)
+        backing_ids = _collect_backing_ids(data, frames)
+        ctx = ctx or QuoteContext()
+        if parts is not None:
+            part = parts.get
+        else:
+            def part(name, inputs, compute):
+                return compute()
+        frame_entries = []
+
+        if frames and len(frames) > 0:
+            components, total = {}, 0   # сумма — в копейках
+
+            frame_sizes = []
+            for idx, frame in enumerate(frames):
+                size, frame_components, frame_total, entry = part(
+                    'frame', (idx, frame, x1, x2), lambda: cls._frame_part(idx, frame, x1, x2, ctx)
+                )
+                if size:
+                    frame_sizes.append(size)
+                components.update(frame_components)
+                total += frame_total
+                if entry is not None:
+                    frame_entries.append(entry)
+
+            # Паспарту: независимая группировка (до 3 шт)
+            pp_comps, pp_total = part(
+                'passepartouts', (passepartouts, x1, x2),
+                lambda: cls._passepartout_components(passepartouts, x1, x2, ctx),
+            )
+
+            # Стекло — по суммарной площади рам; прочее — по первой раме
+            if not frame_sizes:
+                frame_sizes = [(x1, x2)] if x1 and x2 else []
+            eff_x1, eff_x2 = frame_sizes[0] if frame_sizes else (x1, x2)
+
+            # Подкладка/подрамник — «на картину», один раз по раме меньшего размера
+            pic_x1, pic_x2 = min(frame_sizes, key=lambda s: s[0] * s[1]) if frame_sizes else (x1, x2)
+            pic_x1, pic_x2 = fixed.length(pic_x1), fixed.length(pic_x2)
+
+            # Натяжка здесь НЕ считается: это работа мастера по периметру (OrderExtrasCalculator)
+            sections = (
+                (pp_comps, pp_total),
+                part('glass', (data.get('glass_id'), frame_sizes),
+                     lambda: cls._glass_part(data.get('glass_id'), frame_sizes, ctx)),
+                part('backings', (backing_ids, pic_x1, pic_x2),
+                     lambda: cls._backings_part(backing_ids, pic_x1, pic_x2, ctx)),
+                part('podramnik', (data.get('podramnik_id'), pic_x1, pic_x2),
+                     lambda: cls._podramnik_part(data.get('podramnik_id'), pic_x1, pic_x2, ctx)),
+                part('other', ({k: data.get(k) for k in cls.OTHER_FIELDS}, eff_x1, eff_x2),
+                     lambda: cls._other_part(data, eff_x1, eff_x2, ctx)),
+            )
+            for section_components, section_total in sections:
+                components.update(section_components)
+                total += section_total
+
+            base = {'components': components, 'total_price': fixed.rub(total)}
+            # Работы и сложность зависят почти от всех полей — пересчитываются при любом
+            # изменении данных расчёта (расценки — из индекса в памяти, строки — из ctx)
+            pricing = {k: v for k, v in data.items() if k not in cls.NON_PRICING_FIELDS}
+            extras = part(
+                'extras', (pricing, passepartouts, eff_x1, eff_x2),
+                lambda: OrderExtrasCalculator.compute(
+                    frames=frames, passepartouts=passepartouts, x1=eff_x1, x2=eff_x2, data=data, ctx=ctx
+                ),
+            )
+        else:
+            # Обратная совместимость: одна рама, всё по x1, x2
+            base_kopecks = {}
+            base = PriceCalculator.calculate_total_price(
+                x1=x1,
+                x2=x2,
+                baguette_id=data.get('baguette_id'),
+                glass_id=data.get('glass_id'),
+                backing_id=data.get('backing_id'),
+                backing_ids=backing_ids,
+                hardware_id=data.get('hardware_id'),
+                hardware_quantity=data.get('hardware_quantity', 1),
+                podramnik_id=data.get('podramnik_id'),
+                package_id=data.get('package_id'),
+                package_quantity=data.get('package_quantity', 1),
+                molding_id=data.get('molding_id'),
+                molding_consumption=Decimal(str(data.get('molding_consumption'))) if data.get('molding_consumption') else None,
+                trosik_id=data.get('trosik_id'),
+                trosik_length=Decimal(str(data.get('trosik_length'))) if data.get('trosik_length') else None,
+                podveski_id=data.get('podveski_id'),
+                podveski_quantity=data.get('podveski_quantity'),
+                passepartout_id=data.get('passepartout_id'),
+                passepartout_length=Decimal(str(data.get('passepartout_length'))) if data.get('passepartout_length') else None,
+                passepartout_width=Decimal(str(data.get('passepartout_width'))) if data.get('passepartout_width') else None,
+                stretch_id=data.get('stretch_id'),
+                work_id=data.get('work_id'),
+                ctx=ctx,
+                kopecks=base_kopecks,
+            )
+            pp_comps, pp_total = cls._passepartout_components(passepartouts, x1, x2, ctx)
+            base['components'].update(pp_comps)
+            base['total_price'] = fixed.rub(sum(base_kopecks.values()) + pp_total)
+            frame_entries.append(cls._frame_entry(
+                0, data.get('baguette_id'), x1, x2, base['components'].get('baguette'), ctx
+            ))
+
+            single_frames = [{'baguette_id': data.get('baguette_id'), 'x1': x1, 'x2': x2}] if data.get('baguette_id') else []
+            extras = OrderExtrasCalculator.compute(
+                frames=single_frames, passepartouts=passepartouts, x1=x1, x2=x2, data=data, ctx=ctx
+            )
+
+        quantity = int(data.get('quantity', 1) or 1) or 1
+        base, extras = _freeze(base), _freeze(extras)
+        total = OrderExtrasCalculator.apply(_thaw(base), _thaw(extras), quantity)['total_price']
+        return Quote(
+            base=base,
+            extras=extras,
+            frames=_freeze(frame_entries),
+            quantity=quantity,
+            total_price=total,
+        )
+
+    @staticmethod
+    def order_payload(order) -> Dict[str, Any]:
+        """
+        Данные сохранённого заказа в формате calculate_price_api.
+        Рамы, паспарту и подкладки — из order.frames/passepartouts/backings
+        (для нескольких заказов их стоит загрузить prefetch_related).
+        """
+        frames = [
+            {'baguette_id': f.baguette_id, 'x1': f.x1, 'x2': f.x2}
+            for f in order.frames.all()
+        ]
+        passepartouts = [
+            {'passepartout_id': p.passepartout_id, 'passepartout_length': p.length, 'passepartout_width': p.width}
+            for p in order.passepartouts.all()
+        ]
+        backings = [b.backing_id for b in order.backings.all()]
+        data = {
+            'x1': order.x1,
+            'x2': order.x2,
+            'frames': frames,
+            'passepartouts': passepartouts,
+            # Одна подкладка старых заказов — только в FK
+            'backing_id': order.backing_id,
+            'backings': backings or ([order.backing_id] if order.backing_id else []),
+            'glass_id': order.glass_id,
+            'podramnik_id': order.podramnik_id,
+            'hardware_id': order.hardware_id,
+            'hardware_quantity': order.hardware_quantity or 1,
+            'package_id': order.package_id,
+            'package_quantity': order.package_quantity or 1,
+            'molding_id': order.molding_id,
+            'molding_consumption': order.molding_consumption,
+            'trosik_id': order.trosik_id,
+            'trosik_length': order.trosik_length,
+            'podveski_id': order.podveski_id,
+            'podveski_quantity': order.podveski_quantity,
+            'stretch_id': order.stretch_id,
+            'manual_complexity': order.manual_complexity,
+            'quantity': order.quantity or 1,
+        }
+        if not frames:
+            data['baguette_id'] = order.baguette_id
+        if not frames and not passepartouts:
+            data.update({
+                'passepartout_id': order.passepartout_id,
+                'passepartout_length': order.passepartout_length,
+                'passepartout_width': order.passepartout_width,
+            })
+        return data
+
+    @classmethod
+    def for_order(cls, order, ctx: Optional[QuoteContext] = None, reprice: bool = False) -> Quote:
+        """
+        Расчёт сохранённого заказа (детализация, квитанции): снимок, сделанный при создании.
+        Заказы без снимка и reprice=True — заново по текущим ценам справочников.
+        """
+        if not reprice:
+            quote = Quote.from_snapshot(order.price_snapshot)
+            if quote is not None:
+                return quote
+        return cls.quote(cls.order_payload(order), ctx)
+
+    @classmethod
+    def reprice(cls, order) -> Quote:
+        """
+        Пересчитывает заказ по текущим справочникам: новый снимок, итог и долг.
+        Возвращает расчёт из нового снимка (с версией справочников и временем).
+        """
+        quote = cls.for_order(order, reprice=True)
+        order.price_snapshot = quote.snapshot()
+        order.total_price = Decimal(str(quote.total_price)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        order.debt = order.total_price - (order.advance_payment or Decimal('0'))
+        order.save(update_fields=['price_snapshot', 'total_price', 'debt', 'updated_at'])
+        return Quote.from_snapshot(order.price_snapshot)
+
+
 class StockDeduction:
     """Списание материалов со склада при создании заказа"""
 
     @staticmethod
-    def deduct_from_order(order_data: Dict[str, Any], frames: List[Dict], passepartouts: Optional[List[Dict]] = None, quantity: int = 1) -> None:
+    def consumption(order_data: Dict[str, Any], frames: List[Dict], passepartouts: Optional[List[Dict]] = None,
+                    quantity: int = 1, ctx: Optional[QuoteContext] = None) -> Dict[Any, Dict[int, Decimal]]:
         """
-        Списывает материалы со склада на основе данных заказа.
-        Использует F() для атомарного обновления (защита от гонок).
-        Количество копий (quantity) умножает расход всех материалов.
+        Расход материалов заказа: {модель: {id: количество}}, уже умноженный на число копий.
+        Расход одной строки из нескольких мест (рамы с одним багетом и т.п.) суммируется.
+        Ширины багетов — из ctx (снимок справочников), без запросов.
         """
+        ctx = ctx or QuoteContext()
         qmul = int(quantity or 1) or 1
         x1 = order_data.get('x1') or Decimal('0')
         x2 = order_data.get('x2') or Decimal('0')
+        usage: Dict[Any, Dict[int, Decimal]] = {}
 
-        # Багет: по каждой раме свой багет и размеры
-        baguette_consumption: Dict[int, Decimal] = {}
-        passepartout_consumption: Dict[int, Decimal] = {}
+        def use(model, pk, qty):
+            pk = _pk(pk)
+            if pk is not None:
+                rows = usage.setdefault(model, {})
+                rows[pk] = rows.get(pk, Decimal('0')) + qty * qmul
 
+        # Багет: по каждой раме свой багет и размеры
         if frames:
             for frame in frames:
                 if frame.get('baguette_id'):
@@ -652,133 +1280,115 @@ class StockDeduction:
                     fx2 = Decimal(str(frame.get('x2', x2))) if frame.get('x2') else x2
                     if fx1 <= 0 or fx2 <= 0:
                         fx1, fx2 = x1, x2
-                    baguette = Baguette.objects.filter(pk=frame['baguette_id']).first()
+                    baguette = ctx.get('baguette', frame['baguette_id'])
                     if baguette:
-                        qty = PriceCalculator.calculate_baguette_quantity(fx1, fx2, baguette.width)
-                        bid = baguette.pk
-                        baguette_consumption[bid] = baguette_consumption.get(bid, Decimal('0')) + qty
+                        use(Baguette, baguette.pk, PriceCalculator.calculate_baguette_quantity(fx1, fx2, baguette.width))
 
                 if frame.get('passepartout_id'):
-                    pid = frame['passepartout_id']
                     fx1 = Decimal(str(frame.get('x1', x1))) if frame.get('x1') else x1
                     fx2 = Decimal(str(frame.get('x2', x2))) if frame.get('x2') else x2
                     pp_length = Decimal(str(frame.get('passepartout_length'))) if frame.get('passepartout_length') else fx1
                     pp_width = Decimal(str(frame.get('passepartout_width'))) if frame.get('passepartout_width') else fx2
-                    pp_area = PriceCalculator.calculate_glass_area(pp_length, pp_width)
-                    passepartout_consumption[pid] = passepartout_consumption.get(pid, Decimal('0')) + pp_area
+                    use(Passepartout, frame['passepartout_id'], PriceCalculator.calculate_glass_area(pp_length, pp_width))
         else:
             # Одна рама
             if order_data.get('baguette_id'):
-                baguette = Baguette.objects.filter(pk=order_data['baguette_id']).first()
+                baguette = ctx.get('baguette', order_data['baguette_id'])
                 if baguette:
-                    qty = PriceCalculator.calculate_baguette_quantity(x1, x2, baguette.width)
-                    baguette_consumption[baguette.pk] = qty
+                    use(Baguette, baguette.pk, PriceCalculator.calculate_baguette_quantity(x1, x2, baguette.width))
             if order_data.get('passepartout_id'):
                 pp_length = Decimal(str(order_data.get('passepartout_length'))) if order_data.get('passepartout_length') else x1
                 pp_width = Decimal(str(order_data.get('passepartout_width'))) if order_data.get('passepartout_width') else x2
-                passepartout_consumption[order_data['passepartout_id']] = PriceCalculator.calculate_glass_area(pp_length, pp_width)
+                use(Passepartout, order_data['passepartout_id'], PriceCalculator.calculate_glass_area(pp_length, pp_width))
 
         # Новый формат: отдельный список паспарту (независимо от рам)
-        if passepartouts:
-            for pp in passepartouts:
-                pid = pp.get('passepartout_id')
-                if not pid:
-                    continue
-                pp_length = Decimal(str(pp.get('passepartout_length'))) if pp.get('passepartout_length') else x1
-                pp_width = Decimal(str(pp.get('passepartout_width'))) if pp.get('passepartout_width') else x2
-                pp_area = PriceCalculator.calculate_glass_area(pp_length, pp_width)
-                passepartout_consumption[pid] = passepartout_consumption.get(pid, Decimal('0')) + pp_area
-
-        # Списание багета
-        for bid, qty in baguette_consumption.items():
-            Baguette.objects.filter(pk=bid).update(stock_quantity=F('stock_quantity') - qty * qmul)
+        for pp in passepartouts or []:
+            if not pp.get('passepartout_id'):
+                continue
+            pp_length = Decimal(str(pp.get('passepartout_length'))) if pp.get('passepartout_length') else x1
+            pp_width = Decimal(str(pp.get('passepartout_width'))) if pp.get('passepartout_width') else x2
+            use(Passepartout, pp['passepartout_id'], PriceCalculator.calculate_glass_area(pp_length, pp_width))
 
         # Площадь стекла (все рамы)
-        if frames:
-            frame_sizes = []
-            for f in frames:
-                if f.get('baguette_id'):
-                    fx1 = Decimal(str(f.get('x1', x1))) if f.get('x1') else x1
-                    fx2 = Decimal(str(f.get('x2', x2))) if f.get('x2') else x2
-                    if fx1 > 0 and fx2 > 0:
-                        frame_sizes.append((fx1, fx2))
-            if not frame_sizes:
-                frame_sizes = [(x1, x2)]
-            total_glass_area = sum(PriceCalculator.calculate_glass_area(a, b) for a, b in frame_sizes)
-        else:
-            total_glass_area = PriceCalculator.calculate_glass_area(x1, x2)
-        total_glass_area = total_glass_area * qmul  # расход на все копии
-
-        # Стекло
-        if order_data.get('glass_id') and total_glass_area > 0:
-            Glass.objects.filter(pk=order_data['glass_id']).update(
-                stock_quantity=F('stock_quantity') - total_glass_area
-            )
-
-        # Подкладки (каждая по площади)
-        bids = order_data.get('backing_ids') or ([order_data['backing_id']] if order_data.get('backing_id') else [])
+        frame_sizes = []
+        for f in frames or []:
+            if f.get('baguette_id'):
+                fx1 = Decimal(str(f.get('x1', x1))) if f.get('x1') else x1
+                fx2 = Decimal(str(f.get('x2', x2))) if f.get('x2') else x2
+                if fx1 > 0 and fx2 > 0:
+                    frame_sizes.append((fx1, fx2))
+        if not frame_sizes:
+            frame_sizes = [(x1, x2)]
+        total_glass_area = sum(PriceCalculator.calculate_glass_area(a, b) for a, b in frame_sizes)
+
+        # Стекло и подкладки (каждая по площади)
         if total_glass_area > 0:
+            if order_data.get('glass_id'):
+                use(Glass, order_data['glass_id'], total_glass_area)
+            bids = order_data.get('backing_ids') or ([order_data['backing_id']] if order_data.get('backing_id') else [])
             for bid in bids:
-                if bid:
-                    Backing.objects.filter(pk=bid).update(
-                        stock_quantity=F('stock_quantity') - total_glass_area
-                    )
+                use(Backing, bid, total_glass_area)
 
         # Фурнитура
         if order_data.get('hardware_id'):
-            hq = order_data.get('hardware_quantity') or 1
-            Hardware.objects.filter(pk=order_data['hardware_id']).update(
-                stock_quantity=F('stock_quantity') - hq * qmul
-            )
+            use(Hardware, order_data['hardware_id'], _dec(order_data.get('hardware_quantity') or 1))
 
         # Подрамник (как по раме - погонные метры)
         if order_data.get('podramnik_id'):
-            if frames:
-                total_podramnik_qty = Decimal('0')
-                for f in frames:
-                    if f.get('baguette_id'):
-                        fx1 = Decimal(str(f.get('x1', x1))) if f.get('x1') else x1
-                        fx2 = Decimal(str(f.get('x2', x2))) if f.get('x2') else x2
-                        if fx1 > 0 and fx2 > 0:
-                            total_podramnik_qty += PriceCalculator.calculate_baguette_quantity(fx1, fx2, Decimal('0'))
-                if total_podramnik_qty <= 0:
-                    total_podramnik_qty = PriceCalculator.calculate_baguette_quantity(x1, x2, Decimal('0'))
-            else:
-                total_podramnik_qty = PriceCalculator.calculate_baguette_quantity(x1, x2, Decimal('0'))
-            Podramnik.objects.filter(pk=order_data['podramnik_id']).update(
-                stock_quantity=F('stock_quantity') - total_podramnik_qty * qmul
-            )
+            use(Podramnik, order_data['podramnik_id'], sum(
+                PriceCalculator.calculate_baguette_quantity(a, b, Decimal('0')) for a, b in frame_sizes
+            ))
 
         # Упаковка (количество упаковки × копии)
         if order_data.get('package_id'):
-            pkg_qty = int(order_data.get('package_quantity') or 1) or 1
-            Package.objects.filter(pk=order_data['package_id']).update(
-                stock_quantity=F('stock_quantity') - pkg_qty * qmul
-            )
-
-        # Паспарту
-        for pid, qty in passepartout_consumption.items():
-            Passepartout.objects.filter(pk=pid).update(
-                stock_quantity=F('stock_quantity') - qty * qmul
-            )
+            use(Package, order_data['package_id'], int(order_data.get('package_quantity') or 1) or 1)
 
         # Молдинг
         if order_data.get('molding_id') and order_data.get('molding_consumption'):
-            Molding.objects.filter(pk=order_data['molding_id']).update(
-                stock_quantity=F('stock_quantity') - order_data['molding_consumption'] * qmul
-            )
+            use(Molding, order_data['molding_id'], _dec(order_data['molding_consumption']))
 
         # Тросик
         if order_data.get('trosik_id') and order_data.get('trosik_length'):
-            trosik_length_m = PriceCalculator.normalize_length_to_meters(Decimal(str(order_data['trosik_length'])))
-            Trosik.objects.filter(pk=order_data['trosik_id']).update(
-                stock_quantity=F('stock_quantity') - trosik_length_m * qmul
-            )
+            use(Trosik, order_data['trosik_id'],
+                PriceCalculator.normalize_length_to_meters(Decimal(str(order_data['trosik_length']))))
 
         # Подвески
         if order_data.get('podveski_id') and order_data.get('podveski_quantity'):
-            Podveski.objects.filter(pk=order_data['podveski_id']).update(
-                stock_quantity=F('stock_quantity') - order_data['podveski_quantity'] * qmul
-            )
+            use(Podveski, order_data['podveski_id'], _dec(order_data['podveski_quantity']))
 
         # Натяжка со склада НЕ списывается: это работа мастера, материал приносит клиент.
+        return usage
+
+    @staticmethod
+    def apply(usage: Dict[Any, Dict[int, Decimal]]) -> None:
+        """
+        Списывает расход consumption(): одно UPDATE на таблицу,
+        stock_quantity = stock_quantity - CASE id WHEN ... THEN расход END.
+        F() — атомарное уменьшение (защита от гонок).
+        """
+        # updated_at — update() по queryset не проставляет auto_now (нужно для /api/catalog/changes/)
+        now = timezone.now()
+        for model, amounts in usage.items():
+            field = model._meta.get_field('stock_quantity')
+            model.objects.filter(pk__in=list(amounts)).update(
+                updated_at=now,
+                stock_quantity=F('stock_quantity') - Case(
+                    *(When(pk=pk, then=Value(qty, output_field=field)) for pk, qty in amounts.items()),
+                    output_field=field,
+                ),
+            )
+
+        # Остатки показываются в справочниках — сбрасываем версию (ETag), т.к. update()
+        # по queryset не вызывает сигналы post_save. Версия цен не меняется: снимок
+        # справочников (pricebook) и кэш расчётов остаются. После фиксации транзакции —
+        # иначе другой процесс может прочитать остатки до неё.
+        transaction.on_commit(lambda: catalog.bump_version(prices=False))
+
+    @classmethod
+    def deduct_from_order(cls, order_data: Dict[str, Any], frames: List[Dict], passepartouts: Optional[List[Dict]] = None,
+                          quantity: int = 1, ctx: Optional[QuoteContext] = None) -> None:
+        """
+        Списывает материалы со склада на основе данных заказа.
+        Количество копий (quantity) умножает расход всех материалов.
+        """
+        cls.apply(cls.consumption(order_data, frames, passepartouts, quantity, ctx))
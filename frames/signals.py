@@ -0,0 +1,74 @@
+from django.apps import apps
+from django.db.models.signals import post_init, post_save, post_delete
+
+from . import catalog, images, search, works
+from .models import Baguette, CatalogTombstone, Passepartout, TechOperation
+
+
+def _catalog_changed(sender, update_fields=None, **kwargs):
+    # Сохранение только остатков (update_fields) цены не меняет
+    catalog.bump_version(prices=not (update_fields and set(update_fields) <= catalog.STOCK_FIELDS))
+
+
+def _catalog_row_deleted(sender, instance, **kwargs):
+    CatalogTombstone.objects.create(catalog=catalog.NAME_BY_MODEL[sender], object_id=instance.pk)
+
+
+def _image_name(instance):
+    # Из __dict__, а не через дескриптор: у отложенного (only/defer) поля обращение — запрос
+    value = instance.__dict__.get('image')
+    return getattr(value, 'name', value) or ''
+
+
+def _remember_image(sender, instance, **kwargs):
+    instance._saved_image_name = _image_name(instance)
+
+
+def _image_derivatives(sender, instance, created, update_fields=None, **kwargs):
+    # Производные строятся только при смене фото: массовый импорт остатков и
+    # правка цены не должны кодировать картинки на каждом сохранении
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    name = _image_name(instance)
+    if created or name != getattr(instance, '_saved_image_name', None):
+        instance._saved_image_name = name
+        images.generate_for(instance.image)
+
+
+def _works_changed(sender, **kwargs):
+    works.invalidate()
+
+
+def _search_index_save(sender, instance, **kwargs):
+    search.index_object(instance)
+
+
+def _search_index_delete(sender, instance, **kwargs):
+    search.unindex_object(instance)
+
+
+def connect():
+    """Подключает обработчики ко всем моделям справочников приложения frames."""
+    for model in apps.get_app_config('frames').get_models():
+        if model is CatalogTombstone:
+            continue
+        post_save.connect(_catalog_changed, sender=model, dispatch_uid=f'catalog_version_save_{model.__name__}')
+        post_delete.connect(_catalog_changed, sender=model, dispatch_uid=f'catalog_version_delete_{model.__name__}')
+
+    # Отметки об удалении для /api/catalog/changes/
+    for model in catalog.NAME_BY_MODEL:
+        post_delete.connect(_catalog_row_deleted, sender=model, dispatch_uid=f'catalog_tombstone_{model.__name__}')
+
+    # Миниатюры и WebP фото (images.py) — при загрузке в админке и при импорте
+    for model in (Baguette, Passepartout):
+        post_init.connect(_remember_image, sender=model, dispatch_uid=f'image_name_{model.__name__}')
+        post_save.connect(_image_derivatives, sender=model, dispatch_uid=f'image_derivatives_{model.__name__}')
+
+    # Индекс расценок работ (works.py) — перестроить во всех процессах
+    post_save.connect(_works_changed, sender=TechOperation, dispatch_uid='works_index_save')
+    post_delete.connect(_works_changed, sender=TechOperation, dispatch_uid='works_index_delete')
+
+    # Полнотекстовый индекс (search.py) — только справочники из реестра catalog.CATALOGS
+    for model in search.KIND_BY_MODEL:
+        post_save.connect(_search_index_save, sender=model, dispatch_uid=f'search_index_save_{model.__name__}')
+        post_delete.connect(_search_index_delete, sender=model, dispatch_uid=f'search_index_delete_{model.__name__}')
@@ -1,3 +1,81 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from orders.models import Order
+
+from . import catalog, pricebook
+from .models import Baguette, Backing, Glass, Passepartout
+
+
+# Запросов на детализацию заказа: заказ со всеми внешними ключами, рамы,
+# паспарту и подкладки заказа (вместе с их справочниками) — по запросу на таблицу
+ORDER_DETAIL_QUERIES = 4
+# Первая детализация заказа без снимка цен после изменения цен: ещё построение
+# снимка справочников (pricebook) — по запросу на вид справочника
+ORDER_DETAIL_COLD_QUERIES = ORDER_DETAIL_QUERIES + len(pricebook.KINDS)
+
+
+class OrderDetailQueryBudgetTest(TestCase):
+    """get_order_detail: число запросов не зависит от количества рам, паспарту и подкладок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.baguettes = [
+            Baguette.objects.create(name=f'Багет {i}', width=Decimal('0.03'), price=Decimal('500'))
+            for i in range(3)
+        ]
+        cls.passepartouts = [
+            Passepartout.objects.create(name=f'Паспарту {i}', price=Decimal('800'))
+            for i in range(2)
+        ]
+        cls.backings = [
+            Backing.objects.create(name=f'Подкладка {i}', price=Decimal('300'))
+            for i in range(2)
+        ]
+        cls.glass = Glass.objects.create(name='Стекло', price_per_sqm=Decimal('1200'))
+
+    def create_order(self, frames, passepartouts=(), backings=()):
+        response = self.client.post('/api/create-order/', {
+            'x1': 40,
+            'x2': 30,
+            'glass_id': self.glass.pk,
+            'frames': [{'baguette_id': b.pk, 'x1': 40, 'x2': 30} for b in frames],
+            'passepartouts': [
+                {'passepartout_id': p.pk, 'passepartout_length': 50, 'passepartout_width': 40}
+                for p in passepartouts
+            ],
+            'backings': [b.pk for b in backings],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return Order.objects.latest('pk')
+
+    def get_detail(self, order, queries=ORDER_DETAIL_QUERIES):
+        with self.assertNumQueries(queries):
+            response = self.client.get(f'/api/orders/{order.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_one_frame(self):
+        order = self.create_order(self.baguettes[:1], self.passepartouts[:1], self.backings[:1])
+        data = self.get_detail(order)
+        self.assertEqual(len(data['frames']), 1)
+        self.assertEqual(data['glass']['id'], self.glass.pk)
+
+    def test_many_frames_passepartouts_and_backings(self):
+        order = self.create_order(self.baguettes, self.passepartouts, self.backings)
+        data = self.get_detail(order)
+        self.assertEqual([f['baguette']['id'] for f in data['frames']], [b.pk for b in self.baguettes])
+        self.assertEqual([p['id'] for p in data['passepartouts']], [p.pk for p in self.passepartouts])
+        self.assertEqual([b['id'] for b in data['backings']], [b.pk for b in self.backings])
+
+    def test_order_without_price_snapshot(self):
+        # Старый заказ пересчитывается по снимку справочников процесса: первое обращение
+        # после изменения цен строит снимок, следующие обходятся без запросов к справочникам
+        order = self.create_order(self.baguettes, self.passepartouts, self.backings)
+        Order.objects.filter(pk=order.pk).update(price_snapshot=None)
+        catalog.bump_version(prices=True)
+        for queries in (ORDER_DETAIL_COLD_QUERIES, ORDER_DETAIL_QUERIES):
+            data = self.get_detail(order, queries)
+            self.assertIsNone(data['priced_at'])
+            self.assertEqual(data['total_price'], float(order.total_price))
@@ -5,6 +5,8 @@ app_name = 'frames'
 
 urlpatterns = [
     path('api/baguettes/', api_views.get_baguettes, name='api_baguettes'),
+    path('api/baguettes/prices/', api_views.get_baguette_prices, name='api_baguette_prices'),
+    path('api/baguettes/by-barcode/<str:code>/', api_views.get_baguette_by_barcode, name='api_baguette_by_barcode'),
     path('api/glasses/', api_views.get_glasses, name='api_glasses'),
     path('api/backings/', api_views.get_backings, name='api_backings'),
     path('api/hardware/', api_views.get_hardware, name='api_hardware'),
@@ -17,11 +19,19 @@ urlpatterns = [
     path('api/stretches/', api_views.get_stretches, name='api_stretches'),
     path('api/foamboards/', api_views.get_foamboards, name='api_foamboards'),
     path('api/works/', api_views.get_works, name='api_works'),
+    path('api/catalog/', api_views.get_catalog, name='api_catalog'),
+    path('api/catalog/changes/', api_views.get_catalog_changes, name='api_catalog_changes'),
+    path('api/search/', api_views.search_catalog, name='api_search'),
+    path('api/frame-preview/', api_views.frame_preview, name='api_frame_preview'),
     path('api/calculate-price/', api_views.calculate_price_api, name='api_calculate_price'),
+    path('api/calculate-price/cache/', api_views.calculate_price_cache_stats, name='api_calculate_price_cache'),
+    path('api/calculate-price/batch/', api_views.calculate_price_batch_api, name='api_calculate_price_batch'),
     path('api/create-order/', api_views.create_order_api, name='api_create_order'),
     path('api/orders/', api_views.get_orders, name='api_orders'),
+    path('api/orders/summary/', api_views.get_orders_summary, name='api_orders_summary'),
     path('api/orders/<int:order_id>/', api_views.get_order_detail, name='api_order_detail'),
     path('api/orders/<int:order_id>/status/', api_views.update_order_status, name='api_update_order_status'),
+    path('api/orders/<int:order_id>/reprice/', api_views.reprice_order, name='api_reprice_order'),
     path('api/orders/<int:order_id>/receipt/', api_views.generate_receipt, name='api_generate_receipt'),
     path('api/orders/<int:order_id>/receipt/print/', api_views.receipt_print, name='api_receipt_print'),
 ]
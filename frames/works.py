@@ -0,0 +1,130 @@
+"""
+Индекс расценок технологических операций (TechOperation) в памяти процесса.
+
+Таблица небольшая и меняется редко, поэтому при первом обращении она читается
+целиком (один запрос) и для каждого вида операции строится отсортированный список
+границ От/До; расценка по размеру ищется bisect'ом без обращения к базе.
+
+Индекс перестраивается после изменения TechOperation: сигнал (signals.py) пишет
+новую метку в кэш Django, общий для всех воркеров, и каждый процесс сверяет её
+со своей при get_index().
+"""
+import bisect
+import logging
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+
+from .models import TechOperation
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'works:version'
+
+# Пустое От = 0, пустое До = ∞ — как в TechOperation.find_by_size
+NO_LOWER = Decimal('0')
+NO_UPPER = Decimal('9999999')
+
+# Шаг От/До в 1С (две цифры после запятой): 19.99 и 20 — соседние диапазоны, не разрыв
+STEP = Decimal('0.01')
+
+_index = None   # (метка из кэша, {вид операции: OperationIndex})
+
+
+def _range(op):
+    lo = op.size_from if op.size_from is not None else NO_LOWER
+    hi = op.size_to if op.size_to is not None else NO_UPPER
+    return lo, hi
+
+
+class OperationIndex:
+    """
+    Диапазоны одного вида операции. Границы делят ось размеров на точки и интервалы
+    между ними; для каждого участка заранее выбрана операция, которую вернул бы
+    прежний перебор строк (первая по порядку таблицы, чей диапазон содержит размер),
+    поэтому пересекающиеся диапазоны дают тот же результат, что и раньше.
+    """
+    __slots__ = ('bounds', 'slots')
+
+    def __init__(self, ops):
+        ranges = [(_range(op), op) for op in ops]
+        self.bounds = sorted({value for (lo, hi), _ in ranges for value in (lo, hi)})
+        # slots[2k] — интервал перед bounds[k], slots[2k+1] — сама точка bounds[k],
+        # slots[-1] — всё, что больше последней границы
+        self.slots = []
+        for k, bound in enumerate(self.bounds):
+            before = (self.bounds[k - 1] + bound) / 2 if k else bound - 1
+            self.slots.append(self._first(ranges, before))
+            self.slots.append(self._first(ranges, bound))
+        self.slots.append(self._first(ranges, self.bounds[-1] + 1 if self.bounds else NO_LOWER))
+
+    @staticmethod
+    def _first(ranges, size):
+        for (lo, hi), op in ranges:
+            if lo <= size <= hi:
+                return op
+        return None
+
+    def find(self, size):
+        k = bisect.bisect_left(self.bounds, size)
+        if k < len(self.bounds) and self.bounds[k] == size:
+            return self.slots[2 * k + 1]
+        return self.slots[2 * k]
+
+
+def _check(operation_type, ops):
+    """Пересечения и разрывы диапазонов одного вида — только предупреждения в лог."""
+    problems = []
+    ranges = sorted((_range(op), op) for op in ops if op.rate is not None)
+    reach = None
+    for (lo, hi), op in ranges:
+        if reach is not None:
+            if lo <= reach:
+                problems.append(f"{operation_type}: диапазон {lo}–{hi} пересекается с предыдущими (до {reach})")
+            elif lo - reach > STEP:
+                problems.append(f"{operation_type}: нет расценки для размеров от {reach} до {lo}")
+        reach = hi if reach is None else max(reach, hi)
+    return problems
+
+
+def build():
+    """Читает TechOperation одним запросом и строит индексы по видам операций."""
+    by_type = {}
+    for op in TechOperation.objects.order_by('operation_type', 'size_from', 'pk'):
+        by_type.setdefault(op.operation_type, []).append(op)
+    for operation_type, ops in by_type.items():
+        for problem in _check(operation_type, ops):
+            logger.warning("Технологические операции: %s", problem)
+    return {operation_type: OperationIndex(ops) for operation_type, ops in by_type.items()}
+
+
+def get_index():
+    """Индексы текущего процесса; перестраиваются, если TechOperation менялась."""
+    global _index
+    version = cache.get(VERSION_KEY)
+    if _index is None or _index[0] != version:
+        _index = (version, build())
+    return _index[1]
+
+
+def invalidate():
+    """Помечает индекс устаревшим во всех процессах."""
+    global _index
+    _index = None
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def find(operation_type, size, index=None):
+    """
+    Операция вида operation_type для размера size (макс. сторона в см) или None.
+    index — результат get_index(), если он уже получен (несколько поисков подряд).
+    """
+    try:
+        size = Decimal(str(size))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+    if not size.is_finite():
+        return None
+    ops = (index if index is not None else get_index()).get(operation_type)
+    return ops.find(size) if ops else None
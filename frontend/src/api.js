@@ -36,10 +36,15 @@ api.interceptors.request.use((config) => {
 });
 
 // Получение данных
-export const getBaguettes = (search = '') => {
-  const params = search ? { params: { search } } : {};
-  return api.get('/baguettes/', params);
+// Без search — страница списка: { results, next }; next передаётся в after для следующей
+export const getBaguettes = (search = '', { limit, after, fields } = {}) => {
+  const params = search ? { search } : { limit, after };
+  if (fields) params.fields = fields.join(',');
+  return api.get('/baguettes/', { params });
 };
+// Точный поиск по штрихкоду (сканер)
+export const getBaguetteByBarcode = (code) =>
+  api.get(`/baguettes/by-barcode/${encodeURIComponent(code)}/`);
 export const getGlasses = () => api.get('/glasses/');
 export const getBackings = () => api.get('/backings/');
 export const getHardware = () => api.get('/hardware/');
@@ -52,14 +57,72 @@ export const getPassepartout = () => api.get('/passepartout/');
 export const getStretches = () => api.get('/stretches/');
 export const getFoamboards = () => api.get('/foamboards/');
 
+// Справочники с копией в localStorage: после первой загрузки сервер отдаёт
+// только изменённые и удалённые строки (/catalog/changes/?since=<версия>)
+const CATALOG_CACHE_KEY = 'catalogCache';
+
+const byName = (a, b) => (a.name < b.name ? -1 : a.name > b.name ? 1 : a.id - b.id);
+
+export const getCatalogSynced = async (include) => {
+  const key = include.join(',');
+  let cached = null;
+  try {
+    cached = JSON.parse(localStorage.getItem(CATALOG_CACHE_KEY));
+  } catch {
+    cached = null;
+  }
+  const since = cached && cached.include === key ? cached.version : 0;
+  const { data } = await api.get('/catalog/changes/', { params: { since, include: key } });
+
+  // full — версия старше срока хранения удалений (или since=0): справочники целиком
+  const catalogs = data.full ? {} : cached.catalogs;
+  for (const name of include) {
+    const deleted = data.deleted[name] || [];
+    const changed = data.changes[name] || [];
+    if (!data.full && !deleted.length && !changed.length) continue;
+    const removed = new Set(deleted);
+    const rows = new Map(
+      (catalogs[name] || []).filter((row) => !removed.has(row.id)).map((row) => [row.id, row])
+    );
+    changed.forEach((row) => rows.set(row.id, row));
+    catalogs[name] = [...rows.values()].sort(byName);
+  }
+  try {
+    localStorage.setItem(CATALOG_CACHE_KEY, JSON.stringify({ version: data.version, include: key, catalogs }));
+  } catch {
+    // Нет места в localStorage — в следующий раз загрузим справочники целиком
+  }
+  return { data: catalogs };
+};
+
+// Адрес PNG-предпросмотра рамы, нарисованного сервером (рамы — от внутренней к внешней)
+export const framePreviewUrl = ({ baguettes = [], passepartouts = [], x1, x2, size }) => {
+  const params = new URLSearchParams({
+    baguettes: baguettes.join(','),
+    passepartouts: passepartouts.join(','),
+    x1,
+    x2,
+  });
+  if (size) params.set('size', size);
+  return `${api.defaults.baseURL}/frame-preview/?${params}`;
+};
+
 // Расчет цены
 export const calculatePrice = (data) => api.post('/calculate-price/', data);
+// Пересчёт предыдущего расчёта (quote_token из его ответа) с изменёнными полями
+export const recalculatePrice = (baseToken, changes) => api.post('/calculate-price/', { base_token: baseToken, changes });
+export const getBaguettePrices = (params) => api.get('/baguettes/prices/', { params });
+export const calculatePriceBatch = (items) => api.post('/calculate-price/batch/', items);
 
 // Создание заказа
 export const createOrder = (data) => api.post('/create-order/', data);
 
-// Получение списка заказов
-export const getOrders = () => api.get('/orders/');
+// Получение списка заказов: страница ({ results, next }); params — фильтры
+// (status, date_from, date_to, debt, phone, customer), limit и after (next предыдущей страницы)
+export const getOrders = (params) => api.get('/orders/', { params });
+
+// Сводка по заказам (количество и суммы по статусам, дням и месяцам) с теми же фильтрами
+export const getOrdersSummary = (params) => api.get('/orders/summary/', { params });
 
 // Получение детальной информации о заказе
 export const getOrderDetail = (orderId) => api.get(`/orders/${orderId}/`);
@@ -67,6 +130,9 @@ export const getOrderDetail = (orderId) => api.get(`/orders/${orderId}/`);
 // Изменение статуса заказа
 export const updateOrderStatus = (orderId, status) => api.patch(`/orders/${orderId}/status/`, { status });
 
+// Пересчёт цены заказа по текущим ценам справочников
+export const repriceOrder = (orderId) => api.post(`/orders/${orderId}/reprice/`);
+
 // Генерация квитанции (Word документ)
 export const generateReceipt = async (orderId) => {
   try {
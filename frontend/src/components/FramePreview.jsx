@@ -1,5 +1,6 @@
 import { useEffect, useRef } from 'react';
 import { useOrder } from '../context/OrderContext';
+import { framePreviewUrl } from '../api';
 
 const DEFAULT_FRAME_WIDTH = 50;
 const PASSEPARTOUT_COLOR = '#f5f5dc';
@@ -37,20 +38,35 @@ export const FramePreview = ({ showLabel = true }) => {
           type: 'passepartout',
           width: 25,
           color: PASSEPARTOUT_COLOR,
-          image: pp?.passepartout_image || null,
+          image: pp?.passepartout_strip || pp?.passepartout_image || null,
+          fallback: pp?.passepartout_image || null,
         });
       }
     }
     for (const frame of frames) {
       if ((frame?.baguette_id && frame?.baguette_image) || (orderData.baguette_id && orderData.baguette_image)) {
-        const img = frame?.baguette_image || orderData.baguette_image;
+        // Уменьшенная полоска (WebP) вместо исходного фото; если её нет — оригинал
+        const original = frame?.baguette_image || orderData.baguette_image;
+        const img = frame?.baguette_strip || original;
         const w = frame?.baguette_width ?? orderData.baguette_width;
-        layers.push({ type: 'baguette', image: img, width: w });
+        layers.push({ type: 'baguette', image: img, fallback: original, width: w });
       }
     }
     return layers;
   };
 
+  // Без фото картины предпросмотр рисует сервер (тот же алгоритм, результат кэшируется) —
+  // слабым планшетам не нужно загружать фото багетов и рисовать canvas
+  const getServerPreviewUrl = () => {
+    if (paintingImage) return null;
+    const baguettes = (orderData.frames || []).map((f) => f?.baguette_id).filter(Boolean);
+    if (!baguettes.length && orderData.baguette_id) baguettes.push(orderData.baguette_id);
+    const passepartouts = (orderData.passepartouts || []).map((pp) => pp?.passepartout_id).filter(Boolean);
+    if (!baguettes.length && !passepartouts.length) return null;
+    const { x1, x2 } = getPaintingDimensions();
+    return framePreviewUrl({ baguettes, passepartouts, x1, x2 });
+  };
+
   const makeStripCanvas = (imgOrCanvas, { rotate = 0, flipX = false, flipY = false } = {}) => {
     const srcW = imgOrCanvas.width ?? imgOrCanvas.naturalWidth;
     const srcH = imgOrCanvas.height ?? imgOrCanvas.naturalHeight;
@@ -229,12 +245,13 @@ export const FramePreview = ({ showLabel = true }) => {
       p.getContext('2d').fillRect(0, 0, 64, DEFAULT_FRAME_WIDTH);
       return p;
     };
-    const loadImage = (url) =>
+    const loadImage = (url, fallback) =>
       new Promise((resolve) => {
         const img = new Image();
         img.crossOrigin = 'anonymous';
         img.onload = () => resolve(img);
-        img.onerror = () => resolve(createPlaceholder());
+        img.onerror = () =>
+          fallback && fallback !== url ? loadImage(fallback).then(resolve) : resolve(createPlaceholder());
         img.src = url;
       });
     const layersWithImages = layers.filter((l) => l.image);
@@ -249,7 +266,7 @@ export const FramePreview = ({ showLabel = true }) => {
           })
         : Promise.resolve(null);
     Promise.all([
-      ...imageUrls.map((url) => (url ? loadImage(url) : Promise.resolve(null))),
+      ...layersWithImages.map((l) => (l.image ? loadImage(l.image, l.fallback) : Promise.resolve(null))),
       loadPainting(),
     ]).then((results) => {
       const loadedImgs = results.slice(0, imageUrls.length);
@@ -324,6 +341,7 @@ export const FramePreview = ({ showLabel = true }) => {
     (orderData.frames && orderData.frames.some((f) => f.baguette_id || (f.x1 && f.x2))) ||
     (orderData.passepartouts && orderData.passepartouts.some((pp) => pp.passepartout_id)) ||
     orderData.baguette_id;
+  const serverPreviewUrl = hasData ? getServerPreviewUrl() : null;
 
   return (
     <div ref={containerRef} className={showLabel ? 'shrink-0' : 'w-full'}>
@@ -331,7 +349,16 @@ export const FramePreview = ({ showLabel = true }) => {
       <div className={`rounded-lg p-3 bg-gray-50 ${showLabel ? 'border border-gray-300' : ''}`}>
         {hasData ? (
           <div className="flex justify-center">
-            <canvas ref={canvasRef} className="block rounded-lg" style={{ maxWidth: '100%', maxHeight: '400px' }} />
+            {serverPreviewUrl ? (
+              <img
+                src={serverPreviewUrl}
+                alt="Предпросмотр рамы"
+                className="block rounded-lg"
+                style={{ maxWidth: '100%', maxHeight: '400px' }}
+              />
+            ) : (
+              <canvas ref={canvasRef} className="block rounded-lg" style={{ maxWidth: '100%', maxHeight: '400px' }} />
+            )}
           </div>
         ) : (
           <div className={`flex flex-col items-center justify-center text-gray-400 text-sm ${showLabel ? 'w-40 h-32' : 'py-8'}`}>
@@ -1,5 +1,5 @@
-import { createContext, useContext, useState, useCallback } from 'react';
-import { calculatePrice } from '../api';
+import { createContext, useContext, useState, useCallback, useRef } from 'react';
+import { calculatePrice, calculatePriceBatch, recalculatePrice } from '../api';
 
 const OrderContext = createContext();
 
@@ -11,6 +11,71 @@ export const useOrder = () => {
   return context;
 };
 
+// Поля, которые отличаются в next от prev (значение null — поле убрано)
+const changedFields = (prev, next) => {
+  const changes = {};
+  for (const key of new Set([...Object.keys(prev), ...Object.keys(next)])) {
+    if (JSON.stringify(prev[key] ?? null) !== JSON.stringify(next[key] ?? null)) {
+      changes[key] = next[key] ?? null;
+    }
+  }
+  return changes;
+};
+
+// Данные для /calculate-price/ из состояния мастера; null — размер картины ещё не задан
+const buildPricePayload = (orderData) => {
+  // Размер картины: если рама добавлена — берём из Рамы 1, иначе глобальный
+  const x1 = orderData.frames?.[0]?.x1 ?? orderData.x1;
+  const x2 = orderData.frames?.[0]?.x2 ?? orderData.x2;
+  const x1Val = parseFloat(x1);
+  const x2Val = parseFloat(x2);
+  if (!x1 || !x2 || isNaN(x1Val) || isNaN(x2Val) || x1Val <= 0 || x2Val <= 0) {
+    return null;
+  }
+
+  // Преобразуем данные для отправки на бэкенд
+  const dataToSend = {
+    x1: x1Val,
+    x2: x2Val,
+    glass_id: orderData.glass_id,
+    backing_id: (orderData.backings && orderData.backings[0]) || orderData.backing_id || null,
+    backings: orderData.backings || [],
+    hardware_id: orderData.hardware_id,
+    hardware_quantity: orderData.hardware_quantity,
+    podramnik_id: orderData.podramnik_id,
+    package_id: orderData.package_id,
+    package_quantity: orderData.package_quantity,
+    molding_id: orderData.molding_id,
+    molding_consumption: orderData.molding_consumption,
+    trosik_id: orderData.trosik_id,
+    trosik_length: orderData.trosik_length,
+    podveski_id: orderData.podveski_id,
+    podveski_quantity: orderData.podveski_quantity,
+    stretch_id: orderData.stretch_id,
+    manual_complexity: orderData.manual_complexity,
+    quantity: orderData.quantity,
+  };
+  
+  // Паспарту отправляем всегда — заказ может быть только на паспарту (без рамы)
+  dataToSend.passepartouts = orderData.passepartouts || [];
+
+  // Если есть массив рамок, отправляем его (с валидными размерами в каждой раме)
+  if (orderData.frames && orderData.frames.length > 0) {
+    dataToSend.frames = orderData.frames.map((f) => ({
+      ...f,
+      x1: f.x1 ?? x1Val,
+      x2: f.x2 ?? x2Val,
+    }));
+  } else if (orderData.baguette_id) {
+    // Обратная совместимость: старые поля
+    dataToSend.baguette_id = orderData.baguette_id;
+    dataToSend.passepartout_id = orderData.passepartout_id;
+    dataToSend.passepartout_length = orderData.passepartout_length;
+    dataToSend.passepartout_width = orderData.passepartout_width;
+  }
+  return dataToSend;
+};
+
 export const OrderProvider = ({ children }) => {
   const [orderData, setOrderData] = useState({
     // Шаг 1: Размеры
@@ -49,6 +114,9 @@ export const OrderProvider = ({ children }) => {
 
   const [priceCalculation, setPriceCalculation] = useState(null);
   const [paintingImage, setPaintingImage] = useState(null);
+  // Последний успешный расчёт: quote_token и отправленные данные — следующий
+  // расчёт отправляет только изменённые поля
+  const lastQuote = useRef(null);
 
   const updateOrderData = useCallback((updates) => {
     setOrderData((prev) => ({ ...prev, ...updates }));
@@ -56,57 +124,23 @@ export const OrderProvider = ({ children }) => {
 
   const calculateCurrentPrice = useCallback(async () => {
     try {
-      // Размер картины: если рама добавлена — берём из Рамы 1, иначе глобальный
-      const x1 = orderData.frames?.[0]?.x1 ?? orderData.x1;
-      const x2 = orderData.frames?.[0]?.x2 ?? orderData.x2;
-      const x1Val = parseFloat(x1);
-      const x2Val = parseFloat(x2);
-      if (!x1 || !x2 || isNaN(x1Val) || isNaN(x2Val) || x1Val <= 0 || x2Val <= 0) {
-        return null;
-      }
+      const dataToSend = buildPricePayload(orderData);
+      if (!dataToSend) return null;
 
-      // Преобразуем данные для отправки на бэкенд
-      const dataToSend = {
-        x1: x1Val,
-        x2: x2Val,
-        glass_id: orderData.glass_id,
-        backing_id: (orderData.backings && orderData.backings[0]) || orderData.backing_id || null,
-        backings: orderData.backings || [],
-        hardware_id: orderData.hardware_id,
-        hardware_quantity: orderData.hardware_quantity,
-        podramnik_id: orderData.podramnik_id,
-        package_id: orderData.package_id,
-        package_quantity: orderData.package_quantity,
-        molding_id: orderData.molding_id,
-        molding_consumption: orderData.molding_consumption,
-        trosik_id: orderData.trosik_id,
-        trosik_length: orderData.trosik_length,
-        podveski_id: orderData.podveski_id,
-        podveski_quantity: orderData.podveski_quantity,
-        stretch_id: orderData.stretch_id,
-        manual_complexity: orderData.manual_complexity,
-        quantity: orderData.quantity,
-      };
-      
-      // Паспарту отправляем всегда — заказ может быть только на паспарту (без рамы)
-      dataToSend.passepartouts = orderData.passepartouts || [];
-
-      // Если есть массив рамок, отправляем его (с валидными размерами в каждой раме)
-      if (orderData.frames && orderData.frames.length > 0) {
-        dataToSend.frames = orderData.frames.map((f) => ({
-          ...f,
-          x1: f.x1 ?? x1Val,
-          x2: f.x2 ?? x2Val,
-        }));
-      } else if (orderData.baguette_id) {
-        // Обратная совместимость: старые поля
-        dataToSend.baguette_id = orderData.baguette_id;
-        dataToSend.passepartout_id = orderData.passepartout_id;
-        dataToSend.passepartout_length = orderData.passepartout_length;
-        dataToSend.passepartout_width = orderData.passepartout_width;
+      let response = null;
+      const base = lastQuote.current;
+      if (base) {
+        try {
+          response = await recalculatePrice(base.token, changedFields(base.data, dataToSend));
+        } catch (error) {
+          // 409 — сервер забыл предыдущий расчёт: считаем по полным данным
+          if (error.response?.status !== 409) throw error;
+        }
       }
-      
-      const response = await calculatePrice(dataToSend);
+      if (!response) response = await calculatePrice(dataToSend);
+      lastQuote.current = response.data.quote_token
+        ? { token: response.data.quote_token, data: dataToSend }
+        : null;
       setPriceCalculation(response.data);
       return response.data;
     } catch (error) {
@@ -116,6 +150,20 @@ export const OrderProvider = ({ children }) => {
     }
   }, [orderData]);
 
+  // Сравнение вариантов для той же картины: каждый вариант — поля, заменяющие
+  // текущие (например { glass_id }); ответ — расчёты в том же порядке
+  const compareOptions = useCallback(async (variants) => {
+    const dataToSend = buildPricePayload(orderData);
+    if (!dataToSend || variants.length === 0) return [];
+    try {
+      const response = await calculatePriceBatch(variants.map((variant) => ({ ...dataToSend, ...variant })));
+      return response.data.results;
+    } catch (error) {
+      console.error('Ошибка сравнения вариантов:', error.response?.data?.error || error.message);
+      return [];
+    }
+  }, [orderData]);
+
   const resetOrder = useCallback(() => {
     setOrderData({
       x1: null,
@@ -147,6 +195,7 @@ export const OrderProvider = ({ children }) => {
     });
     setPriceCalculation(null);
     setPaintingImage(null);
+    lastQuote.current = null;
   }, []);
 
   return (
@@ -156,6 +205,7 @@ export const OrderProvider = ({ children }) => {
         updateOrderData,
         priceCalculation,
         calculateCurrentPrice,
+        compareOptions,
         paintingImage,
         setPaintingImage,
         resetOrder,
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { getOrders, getOrderDetail, updateOrderStatus, generateReceipt } from '../api';
+import { getOrders, getOrdersSummary, getOrderDetail, updateOrderStatus, generateReceipt, repriceOrder } from '../api';
 
 const STATUS_COLORS = {
   new: 'bg-blue-100 text-blue-800',
@@ -22,8 +22,34 @@ const STATUS_OPTIONS = [
   { value: 'issued', label: 'Выдан' },
 ];
 
+const EMPTY_FILTERS = {
+  status: '',
+  date_from: '',
+  date_to: '',
+  debt: false,
+  phone: '',
+  customer: '',
+};
+
+// Параметры запроса списка заказов: только заполненные фильтры
+const filterParams = (filters) => {
+  const params = {};
+  Object.entries(filters).forEach(([key, value]) => {
+    if (key === 'debt') {
+      if (value) params.debt = 1;
+    } else if (String(value).trim()) {
+      params[key] = String(value).trim();
+    }
+  });
+  return params;
+};
+
 export const Cabinet = () => {
   const [orders, setOrders] = useState([]);
+  const [filters, setFilters] = useState(EMPTY_FILTERS);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [summary, setSummary] = useState(null);
   const [expandedOrders, setExpandedOrders] = useState(new Set());
   const [orderDetails, setOrderDetails] = useState({});
   const [loading, setLoading] = useState(true);
@@ -31,24 +57,60 @@ export const Cabinet = () => {
   const [error, setError] = useState(null);
   const [updatingStatus, setUpdatingStatus] = useState(new Set());
   const [generatingReceipt, setGeneratingReceipt] = useState(new Set());
+  const [repricing, setRepricing] = useState(new Set());
 
   useEffect(() => {
+    let cancelled = false;
     const fetchOrders = async () => {
       try {
         setLoading(true);
-        const response = await getOrders();
-        setOrders(response.data);
+        const params = filterParams(filters);
+        const [response, summaryResponse] = await Promise.all([
+          getOrders(params),
+          getOrdersSummary(params).catch(() => null),
+        ]);
+        if (cancelled) return;
+        setOrders(response.data.results);
+        setNextCursor(response.data.next);
+        setSummary(summaryResponse ? summaryResponse.data : null);
         setError(null);
       } catch (err) {
+        if (cancelled) return;
         console.error('Ошибка загрузки заказов:', err);
         setError('Не удалось загрузить заказы');
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     };
 
-    fetchOrders();
-  }, []);
+    // Текстовые фильтры — запрос после паузы в наборе, а не на каждую букву
+    const timer = setTimeout(fetchOrders, 300);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [filters]);
+
+  const handleFilterChange = (key, value) => {
+    setFilters(prev => ({ ...prev, [key]: value }));
+  };
+
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await getOrders({ ...filterParams(filters), after: nextCursor });
+      setOrders(prev => [...prev, ...response.data.results]);
+      setNextCursor(response.data.next);
+    } catch (err) {
+      console.error('Ошибка загрузки заказов:', err);
+      alert('Не удалось загрузить следующие заказы');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const hasFilters = JSON.stringify(filters) !== JSON.stringify(EMPTY_FILTERS);
 
   const handleToggleOrder = async (orderId) => {
     const newExpanded = new Set(expandedOrders);
@@ -134,17 +196,29 @@ export const Cabinet = () => {
     }
   };
 
-  if (loading) {
-    return (
-      <div className="bg-gradient-to-br from-gray-50 to-gray-100 py-8">
-        <div className="container mx-auto px-4">
-          <div className="text-center py-20">
-            <div className="text-xl text-gray-600">Загрузка заказов...</div>
-          </div>
-        </div>
-      </div>
-    );
-  }
+  const handleReprice = async (orderId) => {
+    if (!window.confirm('Пересчитать заказ по текущим ценам справочников? Итог и долг изменятся.')) {
+      return;
+    }
+    setRepricing(new Set([...repricing, orderId]));
+    try {
+      const { data } = await repriceOrder(orderId);
+      const response = await getOrderDetail(orderId);
+      setOrderDetails(prev => ({ ...prev, [orderId]: response.data }));
+      setOrders(prev => prev.map(order =>
+        order.id === orderId ? { ...order, total_price: data.total_price, debt: data.debt } : order
+      ));
+    } catch (err) {
+      console.error('Ошибка пересчёта заказа:', err);
+      alert(`Не удалось пересчитать заказ: ${err.response?.data?.error || err.message}`);
+    } finally {
+      setRepricing(prev => {
+        const newSet = new Set(prev);
+        newSet.delete(orderId);
+        return newSet;
+      });
+    }
+  };
 
   if (error) {
     return (
@@ -172,15 +246,129 @@ export const Cabinet = () => {
         <div className="max-w-6xl mx-auto">
           <h1 className="text-3xl font-bold text-gray-800 mb-6">Мой кабинет</h1>
 
-          {orders.length === 0 ? (
+          {/* Фильтры списка заказов */}
+          <div className="bg-white rounded-2xl shadow-xl p-4 mb-6 grid grid-cols-1 md:grid-cols-6 gap-3 items-end">
+            <div>
+              <label className="block text-xs font-medium text-gray-600 mb-1">Статус</label>
+              <select
+                value={filters.status}
+                onChange={(e) => handleFilterChange('status', e.target.value)}
+                className="w-full px-3 py-2 border-2 border-gray-300 rounded-lg focus:border-blue-500 transition"
+              >
+                <option value="">Все</option>
+                {STATUS_OPTIONS.map(option => (
+                  <option key={option.value} value={option.value}>
+                    {option.label}
+                  </option>
+                ))}
+              </select>
+            </div>
+            <div>
+              <label className="block text-xs font-medium text-gray-600 mb-1">С даты</label>
+              <input
+                type="date"
+                value={filters.date_from}
+                onChange={(e) => handleFilterChange('date_from', e.target.value)}
+                className="w-full px-3 py-2 border-2 border-gray-300 rounded-lg focus:border-blue-500 transition"
+              />
+            </div>
+            <div>
+              <label className="block text-xs font-medium text-gray-600 mb-1">По дату</label>
+              <input
+                type="date"
+                value={filters.date_to}
+                onChange={(e) => handleFilterChange('date_to', e.target.value)}
+                className="w-full px-3 py-2 border-2 border-gray-300 rounded-lg focus:border-blue-500 transition"
+              />
+            </div>
+            <div>
+              <label className="block text-xs font-medium text-gray-600 mb-1">Телефон</label>
+              <input
+                type="tel"
+                value={filters.phone}
+                onChange={(e) => handleFilterChange('phone', e.target.value)}
+                placeholder="Начало номера"
+                className="w-full px-3 py-2 border-2 border-gray-300 rounded-lg focus:border-blue-500 transition"
+              />
+            </div>
+            <div>
+              <label className="block text-xs font-medium text-gray-600 mb-1">Клиент</label>
+              <input
+                type="text"
+                value={filters.customer}
+                onChange={(e) => handleFilterChange('customer', e.target.value)}
+                placeholder="Имя"
+                className="w-full px-3 py-2 border-2 border-gray-300 rounded-lg focus:border-blue-500 transition"
+              />
+            </div>
+            <div className="flex items-center justify-between gap-2">
+              <label className="flex items-center text-sm text-gray-700">
+                <input
+                  type="checkbox"
+                  checked={filters.debt}
+                  onChange={(e) => handleFilterChange('debt', e.target.checked)}
+                  className="mr-2"
+                />
+                С долгом
+              </label>
+              {hasFilters && (
+                <button
+                  onClick={() => setFilters(EMPTY_FILTERS)}
+                  className="text-sm text-blue-600 hover:underline"
+                >
+                  Сбросить
+                </button>
+              )}
+            </div>
+          </div>
+
+          {/* Итоги по заказам с текущими фильтрами */}
+          {summary && summary.total.count > 0 && (
+            <div className="bg-white rounded-2xl shadow-xl p-4 mb-6 flex flex-wrap gap-x-8 gap-y-2 text-sm text-gray-700">
+              <div>
+                Заказов: <strong>{summary.total.count}</strong>
+              </div>
+              <div>
+                Сумма: <strong>{summary.total.total_price.toFixed(2)} ₽</strong>
+              </div>
+              <div>
+                Авансы: <strong>{summary.total.advance_payment.toFixed(2)} ₽</strong>
+              </div>
+              <div>
+                Долг: <strong className="text-red-600">{summary.total.debt.toFixed(2)} ₽</strong>
+              </div>
+              {summary.by_status.filter(s => s.count > 0).map(s => (
+                <div key={s.status}>
+                  <span className={`px-2 py-0.5 rounded-full ${STATUS_COLORS[s.status] || STATUS_COLORS.new}`}>
+                    {s.status_display}
+                  </span>{' '}
+                  {s.count}
+                </div>
+              ))}
+            </div>
+          )}
+
+          {loading && orders.length === 0 ? (
+            <div className="text-center py-20">
+              <div className="text-xl text-gray-600">Загрузка заказов...</div>
+            </div>
+          ) : orders.length === 0 ? (
             <div className="bg-white rounded-2xl shadow-xl p-8 text-center">
               <div className="text-gray-400 text-6xl mb-4">📦</div>
-              <h2 className="text-2xl font-semibold text-gray-700 mb-2">
-                Заказов пока нет
-              </h2>
-              <p className="text-gray-600">
-                Создайте свой первый заказ, чтобы он появился здесь
-              </p>
+              {hasFilters ? (
+                <h2 className="text-2xl font-semibold text-gray-700 mb-2">
+                  Заказы не найдены
+                </h2>
+              ) : (
+                <>
+                  <h2 className="text-2xl font-semibold text-gray-700 mb-2">
+                    Заказов пока нет
+                  </h2>
+                  <p className="text-gray-600">
+                    Создайте свой первый заказ, чтобы он появился здесь
+                  </p>
+                </>
+              )}
             </div>
           ) : (
             <div className="space-y-4">
@@ -303,6 +491,15 @@ export const Cabinet = () => {
                                     )}
                                   </button>
                                 </div>
+                                <div>
+                                  <button
+                                    onClick={() => handleReprice(order.id)}
+                                    disabled={repricing.has(order.id)}
+                                    className="px-6 py-2 bg-white text-blue-700 font-semibold border-2 border-blue-600 rounded-lg hover:bg-blue-50 transition disabled:border-gray-300 disabled:text-gray-400 disabled:cursor-not-allowed"
+                                  >
+                                    {repricing.has(order.id) ? 'Пересчёт...' : 'Пересчитать по текущим ценам'}
+                                  </button>
+                                </div>
                               </div>
                             </div>
 
@@ -350,6 +547,27 @@ export const Cabinet = () => {
                               </div>
                             )}
 
+                            {/* Паспарту заказа */}
+                            {details.passepartouts && details.passepartouts.length > 0 && (
+                              <div className="bg-white p-4 rounded-lg border-2 border-gray-200">
+                                <h4 className="text-lg font-semibold text-gray-800 mb-4">
+                                  Паспарту ({details.passepartouts.length})
+                                </h4>
+                                <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
+                                  {details.passepartouts.map((pp, idx) => (
+                                    <div key={idx} className="bg-gray-50 p-4 rounded-lg">
+                                      <p className="font-medium text-gray-800">{pp.name}</p>
+                                      {pp.length && pp.width && (
+                                        <p className="text-xs text-gray-600">
+                                          Размер: {pp.length}×{pp.width} см
+                                        </p>
+                                      )}
+                                    </div>
+                                  ))}
+                                </div>
+                              </div>
+                            )}
+
                             {/* Остальные компоненты */}
                             <div className="bg-white p-4 rounded-lg border-2 border-gray-200">
                               <h4 className="text-lg font-semibold text-gray-800 mb-4">
@@ -546,6 +764,11 @@ export const Cabinet = () => {
                               <p className="text-sm text-gray-500">
                                 Обновлено: {details.updated_at || details.created_at}
                               </p>
+                              {details.priced_at && (
+                                <p className="text-sm text-gray-500">
+                                  Цена рассчитана: {new Date(details.priced_at).toLocaleString('ru-RU')}
+                                </p>
+                              )}
                             </div>
                           </div>
                         ) : (
@@ -558,6 +781,17 @@ export const Cabinet = () => {
                   </div>
                 );
               })}
+              {nextCursor && (
+                <div className="text-center">
+                  <button
+                    onClick={handleLoadMore}
+                    disabled={loadingMore}
+                    className="px-6 py-3 bg-blue-600 text-white rounded-lg hover:bg-blue-700 transition disabled:bg-gray-400"
+                  >
+                    {loadingMore ? 'Загрузка...' : 'Показать ещё'}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -1,25 +1,18 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useOrder } from '../context/OrderContext';
-import {
-  getBaguettes,
-  getGlasses,
-  getBackings,
-  getHardware,
-  getPodramniki,
-  getPackages,
-  getMoldings,
-  getTrosiki,
-  getPodveski,
-  getPassepartout,
-  getStretches,
-} from '../api';
+import { getBaguettes, getBaguetteByBarcode, getBaguettePrices, getCatalogSynced } from '../api';
 import { ProgressBar } from '../components/ProgressBar';
 import { PricePanel } from '../components/PricePanel';
 
+// Сколько багетов загружать в выпадающий список за раз
+const BAGUETTE_PAGE_SIZE = 50;
+// Сколько самых дешёвых (в пределах бюджета) багетов показывать в подборе по цене
+const BUDGET_LIMIT = 30;
+
 export const Wizard = () => {
   const navigate = useNavigate();
-  const { orderData, updateOrderData, calculateCurrentPrice, priceCalculation } = useOrder();
+  const { orderData, updateOrderData, calculateCurrentPrice, compareOptions, priceCalculation } = useOrder();
   const [currentStep, setCurrentStep] = useState(1);
 
   // Данные для всех шагов
@@ -36,6 +29,8 @@ export const Wizard = () => {
   const [stretches, setStretches] = useState([]);
 
   const [loading, setLoading] = useState(true);
+  // Итог заказа с каждым стеклом (шаг 2): id стекла → сумма
+  const [glassTotals, setGlassTotals] = useState({});
 
   // Локальное состояние для каждого шага
   const [x1, setX1] = useState(orderData.x1 || '');
@@ -57,7 +52,12 @@ export const Wizard = () => {
   const baguetteSearchTimeoutRef = useRef(null);
   const baguetteSearchInputRef = useRef(null);
   const [openBaguetteDropdownFrame, setOpenBaguetteDropdownFrame] = useState(null);
+  // Подбор багета по итоговой цене для размера рамы (/baguettes/prices/)
+  const [budget, setBudget] = useState({ frame: null, max: '', results: [], loading: false });
   const baguetteDropdownRef = useRef(null);
+  // Курсор следующей страницы списка багетов (null — конец списка или идёт поиск)
+  const baguettesNextRef = useRef(null);
+  const baguettesLoadingMoreRef = useRef(false);
 
   const [glassId, setGlassId] = useState(orderData.glass_id || '');
   // Подкладки — список (можно несколько): например ДВП + серый картон
@@ -125,43 +125,21 @@ export const Wizard = () => {
   useEffect(() => {
     const fetchAllData = async () => {
       try {
-        const [
-          baguettesRes,
-          glassesRes,
-          backingsRes,
-          hardwareRes,
-          podramnikiRes,
-          packagesRes,
-          moldingsRes,
-          trosikiRes,
-          podveskiRes,
-          passepartoutRes,
-          stretchesRes,
-        ] = await Promise.all([
-          getBaguettes(),
-          getGlasses(),
-          getBackings(),
-          getHardware(),
-          getPodramniki(),
-          getPackages(),
-          getMoldings(),
-          getTrosiki(),
-          getPodveski(),
-          getPassepartout(),
-          getStretches(),
+        const { data } = await getCatalogSynced([
+          'glasses', 'backings', 'hardware', 'podramniki', 'packages',
+          'moldings', 'trosiki', 'podveski', 'passepartout', 'stretches',
         ]);
 
-        setBaguettes(baguettesRes.data);
-        setGlasses(glassesRes.data);
-        setBackings(backingsRes.data);
-        setHardware(hardwareRes.data);
-        setPodramniki(podramnikiRes.data);
-        setPackages(packagesRes.data);
-        setMoldings(moldingsRes.data);
-        setTrosiki(trosikiRes.data);
-        setPodveski(podveskiRes.data);
-        setPassepartout(passepartoutRes.data);
-        setStretches(stretchesRes.data);
+        setGlasses(data.glasses);
+        setBackings(data.backings);
+        setHardware(data.hardware);
+        setPodramniki(data.podramniki);
+        setPackages(data.packages);
+        setMoldings(data.moldings);
+        setTrosiki(data.trosiki);
+        setPodveski(data.podveski);
+        setPassepartout(data.passepartout);
+        setStretches(data.stretches);
       } catch (error) {
         console.error('Ошибка загрузки данных:', error);
       } finally {
@@ -172,31 +150,56 @@ export const Wizard = () => {
     fetchAllData();
   }, []);
 
+  // Загрузка багетов: результаты поиска или первая страница списка
+  const loadBaguettes = useCallback(async (query) => {
+    try {
+      const baguettesRes = await getBaguettes(query, { limit: BAGUETTE_PAGE_SIZE });
+      if (query) {
+        baguettesNextRef.current = null;
+        setBaguettes(baguettesRes.data);
+      } else {
+        baguettesNextRef.current = baguettesRes.data.next;
+        setBaguettes(baguettesRes.data.results);
+      }
+    } catch (error) {
+      console.error('Ошибка загрузки багетов:', error);
+    }
+  }, []);
+
   // Автопоиск багетов с debounce (300 мс)
   const debouncedFetchBaguettes = useCallback((query) => {
     if (baguetteSearchTimeoutRef.current) {
       clearTimeout(baguetteSearchTimeoutRef.current);
     }
     baguetteSearchTimeoutRef.current = setTimeout(async () => {
-      try {
-        const baguettesRes = await getBaguettes(query);
-        setBaguettes(baguettesRes.data);
-      } catch (error) {
-        console.error('Ошибка загрузки багетов:', error);
-      }
+      await loadBaguettes(query);
       baguetteSearchTimeoutRef.current = null;
     }, 300);
-  }, []);
+  }, [loadBaguettes]);
 
   // Мгновенная загрузка багетов (при фокусе на поле)
-  const fetchBaguettesImmediate = useCallback(async (query) => {
+  const fetchBaguettesImmediate = loadBaguettes;
+
+  // Следующая страница списка при прокрутке к концу выпадающего списка
+  const handleBaguetteListScroll = async (e) => {
+    const el = e.currentTarget;
+    const cursor = baguettesNextRef.current;
+    if (!cursor || baguettesLoadingMoreRef.current) return;
+    if (el.scrollTop + el.clientHeight < el.scrollHeight - 40) return;
+    baguettesLoadingMoreRef.current = true;
     try {
-      const baguettesRes = await getBaguettes(query);
-      setBaguettes(baguettesRes.data);
+      const baguettesRes = await getBaguettes('', { limit: BAGUETTE_PAGE_SIZE, after: cursor });
+      // Пока грузили, пользователь мог начать поиск — тогда страница уже не нужна
+      if (baguettesNextRef.current === cursor) {
+        baguettesNextRef.current = baguettesRes.data.next;
+        setBaguettes((prev) => [...prev, ...baguettesRes.data.results]);
+      }
     } catch (error) {
       console.error('Ошибка загрузки багетов:', error);
+    } finally {
+      baguettesLoadingMoreRef.current = false;
     }
-  }, []);
+  };
 
   // Очистка таймера при размонтировании
   useEffect(() => {
@@ -225,6 +228,24 @@ export const Wizard = () => {
     return () => document.removeEventListener('mousedown', handleClickOutside);
   }, []);
 
+  // Шаг 2: итог заказа с каждым стеклом — одним пакетным расчётом
+  useEffect(() => {
+    if (currentStep !== 2 || glasses.length === 0) return;
+    let cancelled = false;
+    const options = glasses.slice(0, 100); // не больше лимита /calculate-price/batch/
+    compareOptions(options.map((glass) => ({ glass_id: glass.id }))).then((results) => {
+      if (cancelled) return;
+      const totals = {};
+      results.forEach((result, i) => {
+        if (typeof result?.total_price === 'number') totals[options[i].id] = result.total_price;
+      });
+      setGlassTotals(totals);
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [currentStep, glasses, compareOptions]);
+
   // Автоматический пересчет цены при изменении данных заказа
   useEffect(() => {
     if (orderData.x1 && orderData.x2) {
@@ -430,6 +451,7 @@ export const Wizard = () => {
         x2: isFirst && x2 ? parseFloat(x2) : null,
         baguette_id: null,
         baguette_image: null,
+        baguette_strip: null,
         baguette_width: null,
         baguette_name: null,
         work_id: null,
@@ -483,6 +505,65 @@ export const Wizard = () => {
     setBaguetteSearches(newSearches);
   };
 
+  // Выбор багета для рамы (из списка или по штрихкоду)
+  const selectBaguette = (index, baguette) => {
+    const displayName = `${baguette.name}${baguette.barcode ? ` (${baguette.barcode})` : ''} — ${baguette.price} ₽/м`;
+    updateFrame(index, {
+      baguette_id: baguette.id,
+      baguette_image: baguette.image || null,
+      baguette_strip: baguette.image_strip_webp || null,
+      baguette_width: baguette.width || null,
+      baguette_name: displayName,
+    });
+    updateBaguetteSearch(index, '');
+    setOpenBaguetteDropdownFrame(null);
+    setErrors({ ...errors, frames: null });
+  };
+
+  // Размер рамы для подбора по цене: свой размер рамы, иначе размер картины
+  const frameSize = (frameIndex) => {
+    const frame = frames[frameIndex];
+    const fx1 = parseFloat(frame?.x1);
+    const fx2 = parseFloat(frame?.x2);
+    return fx1 > 0 && fx2 > 0 ? { x1: fx1, x2: fx2 } : getPictureSize(frames);
+  };
+
+  const loadBudgetBaguettes = async (frameIndex) => {
+    const size = frameSize(frameIndex);
+    if (!(size.x1 > 0 && size.x2 > 0)) return;
+    setBudget((prev) => ({ ...prev, frame: frameIndex, loading: true }));
+    try {
+      const { data } = await getBaguettePrices({
+        x1: size.x1,
+        x2: size.x2,
+        max_price: budget.max || undefined,
+        glass_id: orderData.glass_id || undefined,
+        limit: BUDGET_LIMIT,
+        details: 1,
+      });
+      setBudget((prev) => ({ ...prev, frame: frameIndex, results: data.results, loading: false }));
+    } catch (error) {
+      console.error('Ошибка подбора багетов по цене:', error);
+      setBudget((prev) => ({ ...prev, results: [], loading: false }));
+    }
+  };
+
+  // Сканер штрихкодов вводит код и нажимает Enter — ищем точное совпадение
+  const handleBaguetteSearchKeyDown = async (index, e) => {
+    if (e.key !== 'Enter') return;
+    const code = (baguetteSearches[index] || '').trim();
+    if (!code) return;
+    e.preventDefault();
+    try {
+      const response = await getBaguetteByBarcode(code);
+      selectBaguette(index, response.data);
+    } catch (error) {
+      if (error.response?.status !== 404) {
+        console.error('Ошибка поиска по штрихкоду:', error);
+      }
+    }
+  };
+
   // Паспарту (независимо от количества рам)
   const addPassepartout = () => {
     if (passepartoutsData.length < 3) {
@@ -491,6 +572,7 @@ export const Wizard = () => {
         {
           passepartout_id: null,
           passepartout_image: null,
+          passepartout_strip: null,
           passepartout_length: null,
           passepartout_width: null,
           window_length: null,
@@ -881,6 +963,7 @@ export const Wizard = () => {
                                       updateFrame(frameIndex, {
                                         baguette_id: null,
                                         baguette_image: null,
+                                        baguette_strip: null,
                                         baguette_width: null,
                                         baguette_name: null,
                                       });
@@ -893,12 +976,16 @@ export const Wizard = () => {
                                     setOpenBaguetteDropdownFrame(frameIndex);
                                     fetchBaguettesImmediate(baguetteSearches[frameIndex] || '');
                                   }}
+                                  onKeyDown={(e) => handleBaguetteSearchKeyDown(frameIndex, e)}
                                   className="w-full px-4 py-3 border-2 border-gray-300 rounded-lg focus:border-blue-500 focus:ring-2 focus:ring-blue-200 transition"
                                   placeholder="Введите название или штрихкод багета"
                                   autoComplete="off"
                                 />
                                 {openBaguetteDropdownFrame === frameIndex && (
-                                  <ul className="absolute z-10 mt-1 w-full max-h-60 overflow-auto bg-white border-2 border-gray-300 rounded-lg shadow-lg">
+                                  <ul
+                                    className="absolute z-10 mt-1 w-full max-h-60 overflow-auto bg-white border-2 border-gray-300 rounded-lg shadow-lg"
+                                    onScroll={handleBaguetteListScroll}
+                                  >
                                     {baguettes.length === 0 ? (
                                       <li className="px-4 py-3 text-gray-500">
                                         {baguetteSearches[frameIndex] ? 'Ничего не найдено' : 'Введите название или штрихкод'}
@@ -910,16 +997,7 @@ export const Wizard = () => {
                                           className="px-4 py-3 cursor-pointer hover:bg-blue-50 first:rounded-t-md last:rounded-b-md"
                                           onMouseDown={(e) => {
                                             e.preventDefault();
-                                            const displayName = `${baguette.name}${baguette.barcode ? ` (${baguette.barcode})` : ''} — ${baguette.price} ₽/м`;
-                                            updateFrame(frameIndex, {
-                                              baguette_id: baguette.id,
-                                              baguette_image: baguette.image || null,
-                                              baguette_width: baguette.width || null,
-                                              baguette_name: displayName,
-                                            });
-                                            updateBaguetteSearch(frameIndex, '');
-                                            setOpenBaguetteDropdownFrame(null);
-                                            setErrors({ ...errors, frames: null });
+                                            selectBaguette(frameIndex, baguette);
                                           }}
                                         >
                                           <span>
@@ -940,6 +1018,48 @@ export const Wizard = () => {
                                   </ul>
                                 )}
                               </div>
+
+                              {/* Подбор по бюджету: багеты по итоговой цене рамы этого размера */}
+                              <div className="mt-3 flex items-center gap-2">
+                                <input
+                                  type="number"
+                                  min="0"
+                                  value={budget.frame === frameIndex ? budget.max : ''}
+                                  onChange={(e) => setBudget((prev) => ({
+                                    ...prev,
+                                    frame: frameIndex,
+                                    max: e.target.value,
+                                    results: prev.frame === frameIndex ? prev.results : [],
+                                  }))}
+                                  className="w-40 px-3 py-2 border-2 border-gray-300 rounded-lg focus:border-blue-500 focus:ring-2 focus:ring-blue-200 transition"
+                                  placeholder="Бюджет, ₽"
+                                />
+                                <button
+                                  type="button"
+                                  onClick={() => loadBudgetBaguettes(frameIndex)}
+                                  disabled={!(frameSize(frameIndex).x1 > 0 && frameSize(frameIndex).x2 > 0)}
+                                  className="wizard-button-add px-4 py-2 font-semibold disabled:opacity-50 disabled:cursor-not-allowed"
+                                >
+                                  {budget.loading && budget.frame === frameIndex ? 'Подбор...' : 'Подобрать по цене'}
+                                </button>
+                              </div>
+                              {budget.frame === frameIndex && !budget.loading && budget.results.length > 0 && (
+                                <ul className="mt-2 max-h-60 overflow-auto bg-white border-2 border-gray-200 rounded-lg">
+                                  {budget.results.map((row) => (
+                                    <li
+                                      key={row.id}
+                                      className="px-4 py-2 flex justify-between cursor-pointer hover:bg-blue-50"
+                                      onClick={() => {
+                                        selectBaguette(frameIndex, row.baguette || { id: row.id, name: row.name, price: row.unit_price, width: row.width });
+                                        setBudget((prev) => ({ ...prev, results: [] }));
+                                      }}
+                                    >
+                                      <span>{row.name} — {row.unit_price} ₽/м</span>
+                                      <span className="font-semibold">{row.total_price.toFixed(2)} ₽</span>
+                                    </li>
+                                  ))}
+                                </ul>
+                              )}
                             </div>
 
                           </div>
@@ -993,6 +1113,7 @@ export const Wizard = () => {
                                     updatePassepartout(ppIndex, {
                                       passepartout_id: ppId,
                                       passepartout_image: pp?.image || null,
+                                      passepartout_strip: pp?.image_strip_webp || null,
                                     });
                                   }}
                                   className="w-full px-4 py-3 border-2 border-gray-300 rounded-lg focus:border-blue-500 focus:ring-2 focus:ring-blue-200 transition"
@@ -1252,6 +1373,7 @@ export const Wizard = () => {
                             {glasses.map((glass) => (
                               <option key={glass.id} value={glass.id}>
                                 {glass.name} ({glass.price_per_sqm} ₽/кв.м)
+                                {glassTotals[glass.id] != null && ` — заказ ${glassTotals[glass.id].toFixed(2)} ₽`}
                               </option>
                             ))}
                           </select>
@@ -1,5 +1,23 @@
 from django.contrib import admin
-from .models import Order
+from .models import Order, OrderBacking, OrderFrame, OrderPassepartout
+
+
+class OrderFrameInline(admin.TabularInline):
+    model = OrderFrame
+    extra = 0
+    fields = ('position', 'baguette', 'x1', 'x2')
+
+
+class OrderPassepartoutInline(admin.TabularInline):
+    model = OrderPassepartout
+    extra = 0
+    fields = ('position', 'passepartout', 'length', 'width')
+
+
+class OrderBackingInline(admin.TabularInline):
+    model = OrderBacking
+    extra = 0
+    fields = ('position', 'backing')
 
 
 @admin.register(Order)
@@ -11,6 +29,7 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ['status', 'created_at']
     search_fields = ['id']
     readonly_fields = ['created_at', 'updated_at', 'get_baguette_quantity', 'get_glass_area']
+    inlines = [OrderFrameInline, OrderPassepartoutInline, OrderBackingInline]
     
     fieldsets = (
         ('Размеры картины', {
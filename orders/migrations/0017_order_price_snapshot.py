@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_alter_order_package_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='price_snapshot',
+            field=models.TextField(blank=True, null=True, verbose_name='Снимок расчёта цены'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.10 on 2026-10-18 17:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('frames', '0023_catalog_updated_at_tombstone'),
+        ('orders', '0018_order_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderBacking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0, verbose_name='Порядковый номер')),
+                ('backing', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='order_backings', to='frames.backing', verbose_name='Подкладка')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backings', to='orders.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Подкладка заказа',
+                'verbose_name_plural': 'Подкладки заказа',
+                'ordering': ['order', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('order', 'position'), name='order_backing_position_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderFrame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0, verbose_name='Порядковый номер')),
+                ('x1', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Размер X1 (см)')),
+                ('x2', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Размер X2 (см)')),
+                ('baguette', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='order_frames', to='frames.baguette', verbose_name='Багет')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='frames', to='orders.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Рама заказа',
+                'verbose_name_plural': 'Рамы заказа',
+                'ordering': ['order', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('order', 'position'), name='order_frame_position_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderPassepartout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0, verbose_name='Порядковый номер')),
+                ('length', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Длина паспарту (см)')),
+                ('width', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Ширина паспарту (см)')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passepartouts', to='orders.order', verbose_name='Заказ')),
+                ('passepartout', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='order_passepartouts', to='frames.passepartout', verbose_name='Паспарту')),
+            ],
+            options={
+                'verbose_name': 'Паспарту заказа',
+                'verbose_name_plural': 'Паспарту заказа',
+                'ordering': ['order', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('order', 'position'), name='order_passepartout_position_uniq')],
+            },
+        ),
+    ]
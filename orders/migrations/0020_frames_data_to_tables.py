@@ -0,0 +1,189 @@
+import json
+import logging
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import migrations
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+# Заказов за один проход: frames_data читается и строки рам пишутся пачками
+CHUNK = 500
+
+MAX_SIZE = Decimal('9999.99')   # max_digits=6, decimal_places=2
+
+
+def _pk(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _size(value):
+    """Размер из JSON → Decimal с двумя знаками; пустое, нулевое и некорректное — None."""
+    if value in (None, '', 0):
+        return None
+    try:
+        value = Decimal(str(value)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        return None
+    return value if 0 < value <= MAX_SIZE else None
+
+
+def _parse(raw):
+    try:
+        frames = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return []
+    return [f for f in frames if isinstance(f, dict)] if isinstance(frames, list) else []
+
+
+def frames_data_to_tables(apps, schema_editor):
+    """
+    frames_data (JSON) → OrderFrame, OrderPassepartout, OrderBacking.
+    Паспарту: список, который create_order_api клал в первую раму, а у старых заказов —
+    паспарту каждой рамы (как их собирал расчёт). Подкладки — список из первой рамы.
+    id удалённых из справочников строк не переносятся (багет рамы становится пустым);
+    каждый такой заказ пишется в лог, а исходный frames_data остаётся в заказе.
+    """
+    Order = apps.get_model('orders', 'Order')
+    OrderFrame = apps.get_model('orders', 'OrderFrame')
+    OrderPassepartout = apps.get_model('orders', 'OrderPassepartout')
+    OrderBacking = apps.get_model('orders', 'OrderBacking')
+    baguettes = set(apps.get_model('frames', 'Baguette').objects.values_list('pk', flat=True))
+    passepartouts = set(apps.get_model('frames', 'Passepartout').objects.values_list('pk', flat=True))
+    backings = set(apps.get_model('frames', 'Backing').objects.values_list('pk', flat=True))
+
+    orders = (
+        Order.objects.exclude(frames_data__isnull=True).exclude(frames_data='')
+        .order_by('pk').values_list('pk', 'frames_data')
+    )
+    incomplete = 0
+    last = 0
+    while True:
+        chunk = list(orders.filter(pk__gt=last)[:CHUNK])
+        if not chunk:
+            break
+        last = chunk[-1][0]
+        frame_rows, pp_rows, backing_rows = [], [], []
+        for order_id, raw in chunk:
+            frames = _parse(raw)
+            if not frames:
+                continue
+            missing = []
+
+            for position, frame in enumerate(frames):
+                baguette_id = _pk(frame.get('baguette_id'))
+                if baguette_id is not None and baguette_id not in baguettes:
+                    missing.append(f'багет {baguette_id}')
+                    baguette_id = None
+                frame_rows.append(OrderFrame(
+                    order_id=order_id, position=position, baguette_id=baguette_id,
+                    x1=_size(frame.get('x1')), x2=_size(frame.get('x2')),
+                ))
+
+            embedded = frames[0].get('passepartouts')
+            if isinstance(embedded, list):
+                items = [pp for pp in embedded if isinstance(pp, dict)]
+            else:
+                items = frames
+            position = 0
+            for pp in items:
+                passepartout_id = _pk(pp.get('passepartout_id'))
+                if passepartout_id is None:
+                    continue
+                if passepartout_id not in passepartouts:
+                    missing.append(f'паспарту {passepartout_id}')
+                    continue
+                pp_rows.append(OrderPassepartout(
+                    order_id=order_id, position=position, passepartout_id=passepartout_id,
+                    length=_size(pp.get('passepartout_length')), width=_size(pp.get('passepartout_width')),
+                ))
+                position += 1
+
+            embedded = frames[0].get('backings')
+            seen = []
+            for b in embedded if isinstance(embedded, list) else []:
+                backing_id = _pk(b.get('backing_id') if isinstance(b, dict) else b)
+                if backing_id is None or backing_id in seen:
+                    continue
+                if backing_id not in backings:
+                    missing.append(f'подкладка {backing_id}')
+                    continue
+                backing_rows.append(OrderBacking(order_id=order_id, position=len(seen), backing_id=backing_id))
+                seen.append(backing_id)
+
+            if missing:
+                incomplete += 1
+                logger.warning(
+                    'Заказ #%s: нет в справочниках — %s; исходные данные в frames_data: %s',
+                    order_id, ', '.join(missing), raw,
+                )
+
+        OrderFrame.objects.bulk_create(frame_rows, batch_size=CHUNK)
+        OrderPassepartout.objects.bulk_create(pp_rows, batch_size=CHUNK)
+        OrderBacking.objects.bulk_create(backing_rows, batch_size=CHUNK)
+
+    if incomplete:
+        logger.warning('Перенесены не полностью (ссылки на удалённые строки справочников): %s заказ(ов)', incomplete)
+
+
+def _number(value):
+    return float(value) if value is not None else None
+
+
+def tables_to_frames_data(apps, schema_editor):
+    """
+    Обратно: frames_data в формате create_order_api (паспарту и подкладки — в первой раме)
+    для заказов, созданных после переноса; у старых заказов исходный frames_data не тронут.
+    Паспарту и подкладки заказов без рам в frames_data не помещаются и теряются.
+    """
+    Order = apps.get_model('orders', 'Order')
+    OrderFrame = apps.get_model('orders', 'OrderFrame')
+    OrderPassepartout = apps.get_model('orders', 'OrderPassepartout')
+    OrderBacking = apps.get_model('orders', 'OrderBacking')
+
+    order_ids = OrderFrame.objects.order_by('order_id').values_list('order_id', flat=True).distinct()
+    last = 0
+    while True:
+        chunk = list(order_ids.filter(order_id__gt=last)[:CHUNK])
+        if not chunk:
+            break
+        last = chunk[-1]
+        frames, pps, backings = {}, {}, {}
+        for row in OrderFrame.objects.filter(order_id__in=chunk).order_by('order_id', 'position'):
+            frames.setdefault(row.order_id, []).append({
+                'baguette_id': row.baguette_id, 'x1': _number(row.x1), 'x2': _number(row.x2),
+            })
+        for row in OrderPassepartout.objects.filter(order_id__in=chunk).order_by('order_id', 'position'):
+            pps.setdefault(row.order_id, []).append({
+                'passepartout_id': row.passepartout_id,
+                'passepartout_length': _number(row.length),
+                'passepartout_width': _number(row.width),
+            })
+        for row in OrderBacking.objects.filter(order_id__in=chunk).order_by('order_id', 'position'):
+            backings.setdefault(row.order_id, []).append(row.backing_id)
+        for order_id, order_frames in frames.items():
+            if order_id in pps:
+                order_frames[0]['passepartouts'] = pps[order_id]
+            if order_id in backings:
+                order_frames[0]['backings'] = backings[order_id]
+            Order.objects.filter(pk=order_id).filter(
+                Q(frames_data__isnull=True) | Q(frames_data='')
+            ).update(frames_data=json.dumps(order_frames))
+
+    OrderFrame.objects.all().delete()
+    OrderPassepartout.objects.all().delete()
+    OrderBacking.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0019_order_frame_passepartout_backing'),
+    ]
+
+    operations = [
+        migrations.RunPython(frames_data_to_tables, tables_to_frames_data),
+    ]
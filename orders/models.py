@@ -157,7 +157,9 @@ class Order(models.Model):
         null=True
     )
     
-    # Массив всех рамок (JSON в TextField для совместимости)
+    # Все рамы, паспарту и подкладки заказа — в OrderFrame, OrderPassepartout, OrderBacking.
+    # frames_data — прежний JSON рам: новые заказы его не заполняют, он хранится, пока перенос
+    # в таблицы (миграция orders 0020) не проверен на рабочей базе, и снимается следующим выпуском
     frames_data = models.TextField('Данные всех рамок', blank=True, null=True)
     
     # Информация о клиенте
@@ -177,6 +179,9 @@ class Order(models.Model):
 
     # Итоговая информация
     total_price = models.DecimalField('Итоговая цена (руб)', max_digits=12, decimal_places=2)
+    # Расчёт цены на момент создания (JSON, Quote.snapshot): детализация и квитанции читают его,
+    # а не пересчитывают по текущим ценам справочников; обновляется только пересчётом заказа
+    price_snapshot = models.TextField('Снимок расчёта цены', blank=True, null=True)
     advance_payment = models.DecimalField('Аванс (руб)', max_digits=12, decimal_places=2, default=0)
     debt = models.DecimalField('Долг (руб)', max_digits=12, decimal_places=2, default=0)
     fulfillment_date = models.DateField('Дата исполнения заказа', blank=True, null=True)
@@ -188,6 +193,12 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        indexes = [
+            # Список заказов (кабинет): страницы по (created_at, id), с фильтром по статусу и без
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['customer_phone'], name='order_customer_phone_idx'),
+        ]
     
     def __str__(self):
         return f"Заказ #{self.pk} от {self.created_at.strftime('%d.%m.%Y')} ({self.get_status_display()})"
@@ -201,3 +212,82 @@ class Order(models.Model):
     def get_glass_area(self):
         """Расчет площади стекла: X1 * X2 (в кв.м)"""
         return (self.x1 * self.x2) / 10000  # Переводим из см² в м²
+
+
+class OrderFrame(models.Model):
+    """Рама заказа. Рам может быть несколько; багет первой дублируется в Order.baguette."""
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, verbose_name='Заказ', related_name='frames')
+    position = models.PositiveSmallIntegerField('Порядковый номер', default=0)
+    baguette = models.ForeignKey(
+        Baguette,
+        on_delete=models.PROTECT,
+        verbose_name='Багет',
+        related_name='order_frames',
+        blank=True,
+        null=True
+    )
+    # Собственные размеры рамы; пустые — размеры картины из заказа
+    x1 = models.DecimalField('Размер X1 (см)', max_digits=6, decimal_places=2, blank=True, null=True)
+    x2 = models.DecimalField('Размер X2 (см)', max_digits=6, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Рама заказа'
+        verbose_name_plural = 'Рамы заказа'
+        ordering = ['order', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'position'], name='order_frame_position_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Рама {self.position + 1} заказа #{self.order_id}"
+
+
+class OrderPassepartout(models.Model):
+    """Паспарту заказа (несколько, независимо от рам); первое дублируется в Order.passepartout."""
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, verbose_name='Заказ', related_name='passepartouts')
+    position = models.PositiveSmallIntegerField('Порядковый номер', default=0)
+    passepartout = models.ForeignKey(
+        Passepartout,
+        on_delete=models.PROTECT,
+        verbose_name='Паспарту',
+        related_name='order_passepartouts'
+    )
+    length = models.DecimalField('Длина паспарту (см)', max_digits=6, decimal_places=2, blank=True, null=True)
+    width = models.DecimalField('Ширина паспарту (см)', max_digits=6, decimal_places=2, blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Паспарту заказа'
+        verbose_name_plural = 'Паспарту заказа'
+        ordering = ['order', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'position'], name='order_passepartout_position_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Паспарту {self.position + 1} заказа #{self.order_id}"
+
+
+class OrderBacking(models.Model):
+    """Подкладка заказа (несколько); первая дублируется в Order.backing."""
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, verbose_name='Заказ', related_name='backings')
+    position = models.PositiveSmallIntegerField('Порядковый номер', default=0)
+    backing = models.ForeignKey(
+        Backing,
+        on_delete=models.PROTECT,
+        verbose_name='Подкладка',
+        related_name='order_backings'
+    )
+
+    class Meta:
+        verbose_name = 'Подкладка заказа'
+        verbose_name_plural = 'Подкладки заказа'
+        ordering = ['order', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'position'], name='order_backing_position_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Подкладка {self.position + 1} заказа #{self.order_id}"
@@ -5,10 +5,9 @@ from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 from decimal import Decimal
 from datetime import datetime
-import json
 from io import BytesIO
 from .models import Order
-from frames.services import PriceCalculator, OrderExtrasCalculator
+from frames.services import QuoteEngine
 
 
 def add_table_border(table):
@@ -46,81 +45,6 @@ def format_number(value):
         return "—"
 
 
-def _add_independent_passepartouts(calculation, order, frames):
-    """Добавляет независимые паспарту (passepartout_1, ...) в расчёт квитанции.
-
-    Такие паспарту хранятся отдельным списком в frames_data и в цену заказа
-    входят, но раньше не выводились в квитанции. Возвращает добавленную сумму.
-    """
-    from frames.models import Passepartout
-    pps = []
-    if frames and isinstance(frames[0], dict):
-        emb = frames[0].get('passepartouts')
-        if isinstance(emb, list):
-            pps = [p for p in emb if isinstance(p, dict) and p.get('passepartout_id')]
-    added = Decimal('0')
-    for i, pp in enumerate(pps):
-        try:
-            obj = Passepartout.objects.get(pk=pp['passepartout_id'])
-        except Passepartout.DoesNotExist:
-            continue
-        length = Decimal(str(pp.get('passepartout_length'))) if pp.get('passepartout_length') else order.x1
-        width = Decimal(str(pp.get('passepartout_width'))) if pp.get('passepartout_width') else order.x2
-        area = PriceCalculator.calculate_glass_area(length, width)
-        price = area * obj.price
-        calculation['components'][f'passepartout_{i + 1}'] = {
-            'name': f'{obj.name} (Паспарту {i + 1})',
-            'length': float(length),
-            'width': float(width),
-            'area': float(area),
-            'unit_price': float(obj.price),
-            'total_price': float(price),
-        }
-        calculation['total_price'] += Decimal(str(price))
-        added += Decimal(str(price))
-    return added
-
-
-def _order_backing_ids(order, frames):
-    """Список id подкладок из frames_data (несколько), иначе одна из заказа."""
-    ids = []
-    if frames and isinstance(frames[0], dict):
-        emb = frames[0].get('backings')
-        if isinstance(emb, list):
-            ids = [(b.get('backing_id') if isinstance(b, dict) else b) for b in emb if b]
-    if not ids and order.backing_id:
-        ids = [order.backing_id]
-    return ids
-
-
-def _scale_calc_by_copies(calculation, q):
-    """Умножает расход/стоимость материалов на количество копий (для детализации)."""
-    q = int(q or 1) or 1
-    if q <= 1:
-        return
-    for comp in calculation.get('components', {}).values():
-        for k in ('total_price', 'area', 'quantity', 'consumption', 'length'):
-            v = comp.get(k)
-            if isinstance(v, (int, float)):
-                comp[k] = v * q
-    tp = calculation.get('total_price', 0)
-    calculation['total_price'] = tp * q
-
-
-def _scale_extras_by_copies(extras, q):
-    """Умножает стоимость работ и сложность на количество копий."""
-    q = int(q or 1) or 1
-    if q <= 1:
-        return
-    works = extras.get('works', {})
-    for w in works.get('items', []):
-        w['total'] = w['total'] * q
-    if 'total_rate' in works:
-        works['total_rate'] = works['total_rate'] * q
-    if extras.get('manual_complexity'):
-        extras['manual_complexity'] = extras['manual_complexity'] * q
-
-
 def add_horizontal_line(doc):
     """Добавляет горизонтальную пунктирную линию для отрыва"""
     para = doc.add_paragraph()
@@ -327,116 +251,10 @@ def generate_receipt_word(order_id):
     items_title.paragraph_format.space_before = Pt(3)
     items_title.paragraph_format.space_after = Pt(2)
     
-    # Получаем расчет стоимости
-    frames = []
-    if order.frames_data:
-        try:
-            frames = json.loads(order.frames_data)
-        except (json.JSONDecodeError, TypeError):
-            pass
-    
-    # Рассчитываем детализацию
-    if frames and len(frames) > 0:
-        calculation = {
-            'components': {},
-            'total_price': Decimal('0')
-        }
-        
-        frame_sizes = []
-        for idx, frame_data in enumerate(frames):
-            if frame_data.get('baguette_id'):
-                fx1 = Decimal(str(frame_data.get('x1', order.x1))) if frame_data.get('x1') else order.x1
-                fx2 = Decimal(str(frame_data.get('x2', order.x2))) if frame_data.get('x2') else order.x2
-                if not fx1 or not fx2 or fx1 <= 0 or fx2 <= 0:
-                    fx1, fx2 = order.x1, order.x2
-                frame_sizes.append((fx1, fx2))
-                frame_calc = PriceCalculator.calculate_total_price(
-                    x1=fx1,
-                    x2=fx2,
-                    baguette_id=frame_data.get('baguette_id'),
-                    passepartout_id=frame_data.get('passepartout_id'),
-                    passepartout_length=Decimal(str(frame_data.get('passepartout_length'))) if frame_data.get('passepartout_length') else None,
-                    passepartout_width=Decimal(str(frame_data.get('passepartout_width'))) if frame_data.get('passepartout_width') else None,
-                    work_id=frame_data.get('work_id'),
-                )
-                frame_num = idx + 1
-                for key, value in frame_calc.get('components', {}).items():
-                    if key in ['baguette', 'passepartout', 'work']:
-                        component_key = f'{key}_frame{frame_num}'
-                        calculation['components'][component_key] = {
-                            **value,
-                            'name': f"{value.get('name', key)} (Рама {frame_num})",
-                        }
-                        calculation['total_price'] += Decimal(str(value.get('total_price', 0)))
-        if not frame_sizes:
-            frame_sizes = [(order.x1, order.x2)]
-        # Подкладка/подрамник — по раме меньшего размера (на картину, один раз)
-        eff_x1, eff_x2 = min(frame_sizes, key=lambda s: s[0] * s[1])
-        total_glass_area = sum(PriceCalculator.calculate_glass_area(fx1, fx2) for fx1, fx2 in frame_sizes)
-        other_calc = PriceCalculator.calculate_total_price(
-            x1=eff_x1,
-            x2=eff_x2,
-            glass_id=None,
-            backing_id=order.backing.id if order.backing else None,
-            backing_ids=_order_backing_ids(order, frames),
-            hardware_id=order.hardware.id if order.hardware else None,
-            hardware_quantity=order.hardware_quantity or 1,
-            podramnik_id=order.podramnik.id if order.podramnik else None,
-            package_id=order.package.id if order.package else None,
-            package_quantity=order.package_quantity or 1,
-            molding_id=order.molding.id if order.molding else None,
-            molding_consumption=order.molding_consumption,
-            trosik_id=order.trosik.id if order.trosik else None,
-            trosik_length=order.trosik_length,
-            podveski_id=order.podveski.id if order.podveski else None,
-            podveski_quantity=order.podveski_quantity,
-        )
-        for key, value in other_calc.get('components', {}).items():
-            if key not in ('glass', 'stretch'):
-                calculation['components'][key] = value
-                calculation['total_price'] += Decimal(str(value.get('total_price', 0)))
-        if order.glass and total_glass_area > 0:
-            glass = order.glass
-            glass_calc = {
-                'name': glass.name,
-                'area': float(total_glass_area),
-                'unit_price': float(glass.price_per_sqm),
-                'total_price': float(total_glass_area * glass.price_per_sqm)
-            }
-            calculation['components']['glass'] = glass_calc
-            calculation['total_price'] += Decimal(str(glass_calc['total_price']))
-        # Независимые паспарту (отдельный список) — входят в цену, выводим их строками
-        _add_independent_passepartouts(calculation, order, frames)
-        # Натяжка — работа мастера (по периметру), выводится строкой «РАБОТА» из extras,
-        # как материал по площади здесь не считается.
-    else:
-        calculation = PriceCalculator.calculate_total_price(
-            x1=order.x1,
-            x2=order.x2,
-            baguette_id=order.baguette.id if order.baguette else None,
-            glass_id=order.glass.id if order.glass else None,
-            backing_id=order.backing.id if order.backing else None,
-            backing_ids=_order_backing_ids(order, frames),
-            hardware_id=order.hardware.id if order.hardware else None,
-            hardware_quantity=order.hardware_quantity or 1,
-            podramnik_id=order.podramnik.id if order.podramnik else None,
-            package_id=order.package.id if order.package else None,
-            package_quantity=order.package_quantity or 1,
-            molding_id=order.molding.id if order.molding else None,
-            molding_consumption=order.molding_consumption,
-            trosik_id=order.trosik.id if order.trosik else None,
-            trosik_length=order.trosik_length,
-            podveski_id=order.podveski.id if order.podveski else None,
-            podveski_quantity=order.podveski_quantity,
-            stretch_id=order.stretch.id if order.stretch else None,
-            passepartout_id=order.passepartout.id if order.passepartout else None,
-            passepartout_length=order.passepartout_length,
-            passepartout_width=order.passepartout_width,
-        )
-    
-    # Количество копий: масштабируем расход/стоимость материалов
-    copies = int(order.quantity or 1) or 1
-    _scale_calc_by_copies(calculation, copies)
+    # Расчёт — тем же движком, что при создании заказа; материалы и работы уже на все копии
+    quote = QuoteEngine.for_order(order)
+    calculation = quote.calculation()
+    copies = quote.quantity
 
     # Создаем таблицу с деталями заказа
     details_table = doc.add_table(rows=1, cols=7)
@@ -468,45 +286,27 @@ def generate_receipt_word(order_id):
     _add_special_row('МАТЕРИАЛЫ')
 
     # Добавляем данные о рамах
-    frame_count = len(frames) if frames else 1
     has_frames = False
-    for frame_idx in range(frame_count):
-        if frames:
-            frame_data = frames[frame_idx]
-            baguette_id = frame_data.get('baguette_id')
-        else:
-            baguette_id = order.baguette.id if order.baguette else None
-        
-        if baguette_id:
+    for frame in quote.frames:
+        rx1, rx2 = frame['x1'], frame['x2']
+        if frame['baguette_id']:
             has_frames = True
-            from frames.models import Baguette
-            try:
-                baguette = Baguette.objects.get(pk=baguette_id)
-            except Baguette.DoesNotExist:
-                raise ValueError(f"Багет с ID {baguette_id} не найден")
-            # Размеры рамы — из frame_data при нескольких рамах, иначе из order
-            frame_data_local = frames[frame_idx] if frames and frame_idx < len(frames) else {}
-            rx1 = Decimal(str(frame_data_local.get('x1', order.x1))) if frame_data_local.get('x1') else order.x1
-            rx2 = Decimal(str(frame_data_local.get('x2', order.x2))) if frame_data_local.get('x2') else order.x2
-            if not rx1 or not rx2 or rx1 <= 0 or rx2 <= 0:
-                rx1, rx2 = order.x1, order.x2
-            # Ширина багета в метрах — функция ждёт метры (периметр_м + 8×ширина_м)
-            baguette_quantity = PriceCalculator.calculate_baguette_quantity(
-                rx1, rx2, baguette.width
-            )
+            baguette = frame['baguette']
+            if baguette is None:
+                raise ValueError(f"Багет с ID {frame['baguette_id']} не найден")
             # Расход и стоимость — на все копии
-            baguette_quantity = baguette_quantity * copies
-            baguette_price = baguette_quantity * baguette.price
+            baguette_quantity = baguette['quantity'] * copies
+            baguette_price = baguette['total_price'] * copies
 
             row = details_table.add_row()
             row.cells[0].text = str(copies)
             row.cells[1].text = "0.6"
-            row.cells[2].text = f"Рама {frame_idx + 1}"
+            row.cells[2].text = f"Рама {frame['index']}"
             row.cells[3].text = f"{format_number(rx1)}×{format_number(rx2)} см"
             # Ширина багета в модели в метрах, но в квитанции нужно показывать в см или как есть
             # Судя по примеру, ширина показывается как есть (0.048)
-            row.cells[4].text = format_number(baguette.width)
-            row.cells[5].text = format_number(baguette.price)
+            row.cells[4].text = format_number(baguette['width'])
+            row.cells[5].text = format_number(baguette['unit_price'])
             row.cells[6].text = format_number(baguette_price)
             
             # Устанавливаем размер шрифта для всех ячеек строки
@@ -517,7 +317,7 @@ def generate_receipt_word(order_id):
             
             # Описание багета
             desc_row = details_table.add_row()
-            desc_row.cells[2].text = f"Багет: {baguette.name}"
+            desc_row.cells[2].text = f"Багет: {baguette['name']}"
             desc_row.cells[3].text = f"расход {format_number(baguette_quantity)} м"
             for i in range(7):
                 if i != 2 and i != 3:
@@ -528,26 +328,20 @@ def generate_receipt_word(order_id):
                 for para in cell.paragraphs:
                     for run in para.runs:
                         run.font.size = Pt(8)
-        else:
+        elif rx1 and rx2 and rx1 > 0 and rx2 > 0:
             # Рама без выбранного багета — показываем по размерам (багет опционален)
-            frame_data_local = frames[frame_idx] if frames and frame_idx < len(frames) else {}
-            rx1 = Decimal(str(frame_data_local.get('x1', order.x1))) if frame_data_local.get('x1') else order.x1
-            rx2 = Decimal(str(frame_data_local.get('x2', order.x2))) if frame_data_local.get('x2') else order.x2
-            if not rx1 or not rx2 or rx1 <= 0 or rx2 <= 0:
-                rx1, rx2 = order.x1, order.x2
-            if rx1 and rx2 and rx1 > 0 and rx2 > 0:
-                has_frames = True
-                row = details_table.add_row()
-                row.cells[0].text = "1"
-                row.cells[1].text = "0.6"
-                row.cells[2].text = f"Рама {frame_idx + 1}"
-                row.cells[3].text = f"{format_number(rx1)}×{format_number(rx2)} см"
-                for i in (4, 5, 6):
-                    row.cells[i].text = ""
-                for cell in row.cells:
-                    for para in cell.paragraphs:
-                        for run in para.runs:
-                            run.font.size = Pt(8)
+            has_frames = True
+            row = details_table.add_row()
+            row.cells[0].text = "1"
+            row.cells[1].text = "0.6"
+            row.cells[2].text = f"Рама {frame['index']}"
+            row.cells[3].text = f"{format_number(rx1)}×{format_number(rx2)} см"
+            for i in (4, 5, 6):
+                row.cells[i].text = ""
+            for cell in row.cells:
+                for para in cell.paragraphs:
+                    for run in para.runs:
+                        run.font.size = Pt(8)
 
     # Пустой заказ (нет ни рамы, ни размеров) — нечего печатать
     if not has_frames:
@@ -616,18 +410,17 @@ def generate_receipt_word(order_id):
                     for run in para.runs:
                         run.font.size = Pt(8)
 
-    # Подытог по материалам (calculation['total_price'] = сумма материалов)
-    materials_total = Decimal(str(calculation.get('total_price', 0)))
+    # Подытог по материалам (на все копии)
+    materials_total = Decimal(str(quote.materials_total * copies))
     _add_special_row('ИТОГО МАТЕРИАЛОВ:', price=materials_total)
 
     # ---------- Раздел «Работы» ----------
     _add_special_row('РАБОТЫ')
 
     # Работы (входят в стоимость) — по данным справочника технологических операций
-    extras = OrderExtrasCalculator.for_order(order, frames)
-    _scale_extras_by_copies(extras, copies)
+    manual_complexity = quote.manual_complexity * copies
     works_total = Decimal('0')
-    for work in extras['works']['items']:
+    for work in calculation['works']['items']:
         works_total += Decimal(str(work['total']))
         row = details_table.add_row()
         row.cells[2].text = "РАБОТА:"
@@ -639,11 +432,11 @@ def generate_receipt_word(order_id):
                     run.font.size = Pt(8)
 
     # Ручная сложность
-    if extras.get('manual_complexity', 0) > 0:
-        works_total += Decimal(str(extras['manual_complexity']))
+    if manual_complexity > 0:
+        works_total += Decimal(str(manual_complexity))
         row = details_table.add_row()
         row.cells[2].text = "СЛОЖНОСТЬ:"
-        row.cells[6].text = f"{format_number(extras['manual_complexity'])} руб"
+        row.cells[6].text = f"{format_number(manual_complexity)} руб"
         for cell in row.cells:
             for para in cell.paragraphs:
                 for run in para.runs:
@@ -730,108 +523,11 @@ def generate_receipt_html(order_id):
     elif order.status in ['ready', 'issued']:
         fulfillment_date_str = order.updated_at.strftime('%d.%m.%Y')
 
-    frames = []
-    if order.frames_data:
-        try:
-            frames = json.loads(order.frames_data)
-        except (json.JSONDecodeError, TypeError):
-            pass
-
-    # Расчёт стоимости (дублируем логику из Word)
-    if frames and len(frames) > 0:
-        calculation = {'components': {}, 'total_price': Decimal('0')}
-        frame_sizes = []
-        for idx, frame_data in enumerate(frames):
-            if frame_data.get('baguette_id'):
-                fx1 = Decimal(str(frame_data.get('x1', order.x1))) if frame_data.get('x1') else order.x1
-                fx2 = Decimal(str(frame_data.get('x2', order.x2))) if frame_data.get('x2') else order.x2
-                if not fx1 or not fx2 or fx1 <= 0 or fx2 <= 0:
-                    fx1, fx2 = order.x1, order.x2
-                frame_sizes.append((fx1, fx2))
-                frame_calc = PriceCalculator.calculate_total_price(
-                    x1=fx1, x2=fx2,
-                    baguette_id=frame_data.get('baguette_id'),
-                    passepartout_id=frame_data.get('passepartout_id'),
-                    passepartout_length=Decimal(str(frame_data.get('passepartout_length'))) if frame_data.get('passepartout_length') else None,
-                    passepartout_width=Decimal(str(frame_data.get('passepartout_width'))) if frame_data.get('passepartout_width') else None,
-                    work_id=frame_data.get('work_id'),
-                )
-                frame_num = idx + 1
-                for key, value in frame_calc.get('components', {}).items():
-                    if key in ['baguette', 'passepartout', 'work']:
-                        component_key = f'{key}_frame{frame_num}'
-                        calculation['components'][component_key] = {
-                            **value, 'name': f"{value.get('name', key)} (Рама {frame_num})",
-                        }
-                        calculation['total_price'] += Decimal(str(value.get('total_price', 0)))
-        if not frame_sizes:
-            frame_sizes = [(order.x1, order.x2)]
-        # Подкладка/подрамник — по раме меньшего размера (на картину, один раз)
-        eff_x1, eff_x2 = min(frame_sizes, key=lambda s: s[0] * s[1])
-        total_glass_area = sum(PriceCalculator.calculate_glass_area(fx1, fx2) for fx1, fx2 in frame_sizes)
-        other_calc = PriceCalculator.calculate_total_price(
-            x1=eff_x1, x2=eff_x2,
-            glass_id=None,
-            backing_id=order.backing.id if order.backing else None,
-            backing_ids=_order_backing_ids(order, frames),
-            hardware_id=order.hardware.id if order.hardware else None,
-            hardware_quantity=order.hardware_quantity or 1,
-            podramnik_id=order.podramnik.id if order.podramnik else None,
-            package_id=order.package.id if order.package else None,
-            package_quantity=order.package_quantity or 1,
-            molding_id=order.molding.id if order.molding else None,
-            molding_consumption=order.molding_consumption,
-            trosik_id=order.trosik.id if order.trosik else None,
-            trosik_length=order.trosik_length,
-            podveski_id=order.podveski.id if order.podveski else None,
-            podveski_quantity=order.podveski_quantity,
-        )
-        for key, value in other_calc.get('components', {}).items():
-            if key not in ('glass', 'stretch'):
-                calculation['components'][key] = value
-                calculation['total_price'] += Decimal(str(value.get('total_price', 0)))
-        if order.glass and total_glass_area > 0:
-            glass = order.glass
-            calculation['components']['glass'] = {
-                'name': glass.name,
-                'area': float(total_glass_area),
-                'unit_price': float(glass.price_per_sqm),
-                'total_price': float(total_glass_area * glass.price_per_sqm)
-            }
-            calculation['total_price'] += Decimal(str(calculation['components']['glass']['total_price']))
-        # Независимые паспарту (отдельный список) — входят в цену, выводим их строками
-        _add_independent_passepartouts(calculation, order, frames)
-        # Натяжка — работа мастера (по периметру), выводится строкой «РАБОТА» из extras,
-        # как материал по площади здесь не считается.
-    else:
-        calculation = PriceCalculator.calculate_total_price(
-            x1=order.x1, x2=order.x2,
-            baguette_id=order.baguette.id if order.baguette else None,
-            glass_id=order.glass.id if order.glass else None,
-            backing_id=order.backing.id if order.backing else None,
-            backing_ids=_order_backing_ids(order, frames),
-            hardware_id=order.hardware.id if order.hardware else None,
-            hardware_quantity=order.hardware_quantity or 1,
-            podramnik_id=order.podramnik.id if order.podramnik else None,
-            package_id=order.package.id if order.package else None,
-            package_quantity=order.package_quantity or 1,
-            molding_id=order.molding.id if order.molding else None,
-            molding_consumption=order.molding_consumption,
-            trosik_id=order.trosik.id if order.trosik else None,
-            trosik_length=order.trosik_length,
-            podveski_id=order.podveski.id if order.podveski else None,
-            podveski_quantity=order.podveski_quantity,
-            stretch_id=order.stretch.id if order.stretch else None,
-            passepartout_id=order.passepartout.id if order.passepartout else None,
-            passepartout_length=order.passepartout_length,
-            passepartout_width=order.passepartout_width,
-        )
-
-    # Количество копий: масштабируем расход/стоимость материалов
-    copies = int(order.quantity or 1) or 1
-    _scale_calc_by_copies(calculation, copies)
-
-    frame_count = len(frames) if frames else 1
+    # Расчёт — тем же движком, что при создании заказа; материалы и работы уже на все копии
+    quote = QuoteEngine.for_order(order)
+    calculation = quote.calculation()
+    copies = quote.quantity
+
     components_map = {
         'glass': ('СТЕКЛО:', 'area', 'кв.м'),
         'backing': ('ПОДКЛАДКА:', None, None),
@@ -846,46 +542,31 @@ def generate_receipt_html(order_id):
         'work': ('РАБОТА:', None, None),
     }
 
-    from frames.models import Baguette
     detail_rows = []
     detail_rows.append({'section': True, 'col2': 'МАТЕРИАЛЫ'})
     has_frames = False
-    for frame_idx in range(frame_count):
-        if frames:
-            frame_data = frames[frame_idx]
-            baguette_id = frame_data.get('baguette_id')
-        else:
-            baguette_id = order.baguette.id if order.baguette else None
-        if baguette_id:
+    for frame in quote.frames:
+        rx1, rx2 = frame['x1'], frame['x2']
+        if frame['baguette_id']:
             has_frames = True
-            baguette = Baguette.objects.get(pk=baguette_id)
-            frame_data_local = frames[frame_idx] if frames and frame_idx < len(frames) else {}
-            rx1 = Decimal(str(frame_data_local.get('x1', order.x1))) if frame_data_local.get('x1') else order.x1
-            rx2 = Decimal(str(frame_data_local.get('x2', order.x2))) if frame_data_local.get('x2') else order.x2
-            if not rx1 or not rx2 or rx1 <= 0 or rx2 <= 0:
-                rx1, rx2 = order.x1, order.x2
-            # Ширина багета хранится в метрах — формула ждёт метры (периметр_м + 8×ширина_м)
-            baguette_quantity = PriceCalculator.calculate_baguette_quantity(rx1, rx2, baguette.width) * copies
-            baguette_price = baguette_quantity * baguette.price
+            baguette = frame['baguette']
+            if baguette is None:
+                raise ValueError(f"Багет с ID {frame['baguette_id']} не найден")
+            baguette_quantity = baguette['quantity'] * copies
+            baguette_price = baguette['total_price'] * copies
             detail_rows.append({
-                'cells': [str(copies), '0.6', f'Рама {frame_idx + 1}', f'{format_number(rx1)}×{format_number(rx2)} см',
-                          format_number(baguette.width), format_number(baguette.price), format_number(baguette_price)],
-                'desc': {'col2': f'Багет: {baguette.name}', 'col3': f'расход {format_number(baguette_quantity)} м'}
+                'cells': [str(copies), '0.6', f"Рама {frame['index']}", f'{format_number(rx1)}×{format_number(rx2)} см',
+                          format_number(baguette['width']), format_number(baguette['unit_price']), format_number(baguette_price)],
+                'desc': {'col2': f"Багет: {baguette['name']}", 'col3': f'расход {format_number(baguette_quantity)} м'}
             })
-        else:
+        elif rx1 and rx2 and rx1 > 0 and rx2 > 0:
             # Рама без выбранного багета — показываем по размерам (багет опционален)
-            frame_data_local = frames[frame_idx] if frames and frame_idx < len(frames) else {}
-            rx1 = Decimal(str(frame_data_local.get('x1', order.x1))) if frame_data_local.get('x1') else order.x1
-            rx2 = Decimal(str(frame_data_local.get('x2', order.x2))) if frame_data_local.get('x2') else order.x2
-            if not rx1 or not rx2 or rx1 <= 0 or rx2 <= 0:
-                rx1, rx2 = order.x1, order.x2
-            if rx1 and rx2 and rx1 > 0 and rx2 > 0:
-                has_frames = True
-                detail_rows.append({
-                    'cells': ['1', '0.6', f'Рама {frame_idx + 1}', f'{format_number(rx1)}×{format_number(rx2)} см',
-                              '', '', ''],
-                    'desc': None
-                })
+            has_frames = True
+            detail_rows.append({
+                'cells': ['1', '0.6', f"Рама {frame['index']}", f'{format_number(rx1)}×{format_number(rx2)} см',
+                          '', '', ''],
+                'desc': None
+            })
     if not has_frames:
         raise ValueError("Заказ пустой: нет ни рамы, ни размеров")
 
@@ -908,20 +589,19 @@ def generate_receipt_html(order_id):
             c = calculation['components'][key]
             detail_rows.append({'component': True, 'col2': 'ПОДКЛАДКА:', 'col3': c.get('name', ''), 'col6': format_number(c.get('total_price', 0))})
     # Подытог по материалам и переход к разделу «Работы»
-    materials_total = Decimal(str(calculation.get('total_price', 0)))
+    materials_total = Decimal(str(quote.materials_total * copies))
     detail_rows.append({'subtotal': True, 'col2': 'ИТОГО МАТЕРИАЛОВ:', 'col6': format_number(materials_total)})
     detail_rows.append({'section': True, 'col2': 'РАБОТЫ'})
 
     # Работы (входят в стоимость) — по данным справочника технологических операций
-    extras = OrderExtrasCalculator.for_order(order, frames)
-    _scale_extras_by_copies(extras, copies)
+    manual_complexity = quote.manual_complexity * copies
     works_total = Decimal('0')
-    for work in extras['works']['items']:
+    for work in calculation['works']['items']:
         works_total += Decimal(str(work['total']))
         detail_rows.append({'component': True, 'col2': 'РАБОТА:', 'col3': work['name'], 'col6': format_number(work['total'])})
-    if extras.get('manual_complexity', 0) > 0:
-        works_total += Decimal(str(extras['manual_complexity']))
-        detail_rows.append({'component': True, 'col2': 'СЛОЖНОСТЬ:', 'col6': format_number(extras['manual_complexity'])})
+    if manual_complexity > 0:
+        works_total += Decimal(str(manual_complexity))
+        detail_rows.append({'component': True, 'col2': 'СЛОЖНОСТЬ:', 'col6': format_number(manual_complexity)})
     detail_rows.append({'subtotal': True, 'col2': 'ИТОГО РАБОТ:', 'col6': format_number(works_total)})
     if (order.quantity or 1) > 1:
         detail_rows.append({'component': True, 'col2': 'КОЛИЧЕСТВО КОПИЙ:', 'col3': str(order.quantity)})